@@ -0,0 +1,91 @@
+"""Index size, postings scanned and ranking quality per analyzer configuration.
+
+Builds one index per analyzer (the original whitespace split, the default
+stopwords + stemming analyzer, and variants) and reports vocabulary size,
+total postings, the mean number of postings a query touches, recall@1/5/10
+and MRR@10 on the title-as-query workload of ``bench_ranking.py`` under both
+rankings, and per-query analysis cost with and without the retriever's cache.
+
+    python benchmarks/bench_analyzer.py
+    python benchmarks/bench_analyzer.py --json
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from benchmarks.bench_ranking import evaluate, labeled_queries  # noqa: E402
+from scripts.build_index import build_index  # noqa: E402
+from triage.analyzer import Analyzer, WhitespaceAnalyzer  # noqa: E402
+from triage.retriever_tfidf import TfidfRetriever  # noqa: E402
+
+ANALYZERS = {
+    "whitespace": WhitespaceAnalyzer(),
+    "stem": Analyzer(stopwords=False, stem=True),
+    "stop+stem": Analyzer(),
+    "stop+stem+bigrams": Analyzer(bigrams=True),
+}
+
+
+def postings_per_query(retriever: TfidfRetriever, queries) -> float:
+    index = retriever.index
+    touched = 0
+    for text, _ in queries:
+        for term_id in retriever.query_vector(text)[0]:
+            touched += index.term_offsets[term_id + 1] - index.term_offsets[term_id]
+    return touched / max(len(queries), 1)
+
+
+def analyze_us(retriever: TfidfRetriever, queries, cached: bool) -> float:
+    analyze = retriever._analyze if cached else retriever.analyzer.tokens
+    for text, _ in queries:
+        analyze(text)
+    t0 = time.perf_counter()
+    for text, _ in queries:
+        analyze(text)
+    return (time.perf_counter() - t0) / max(len(queries), 1) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=Path, default=BASE_DIR / "data" / "cases.cleaned.jsonl")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, analyzer in ANALYZERS.items():
+            index_path = Path(tmp) / f"{name}.idx"
+            build_index(args.cases, index_path, analyzer=analyzer)
+            base = TfidfRetriever(index_path, backend="python")
+            queries = labeled_queries(base, args.cases)
+            row = {
+                "analyzer": name,
+                "terms": base.index.num_terms,
+                "postings": base.index.term_offsets[base.index.num_terms],
+                "postings_per_query": round(postings_per_query(base, queries), 1),
+                "analyze_us": round(analyze_us(base, queries, cached=False), 2),
+                "analyze_cached_us": round(analyze_us(base, queries, cached=True), 2),
+            }
+            for ranking in ("tfidf", "bm25"):
+                scores = evaluate(TfidfRetriever(index_path, backend="python", ranking=ranking), queries)
+                for key in ("recall@1", "recall@5", "recall@10", "mrr@10", "mean_ms"):
+                    row[f"{ranking}_{key}"] = scores[key]
+            results.append(row)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    cols = list(results[0])
+    for r in results:
+        print(", ".join(f"{c}={r[c]}" for c in cols))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Event-loop responsiveness and throughput of ``AsyncPipeline`` under a load generator.
+
+A pure-asyncio load generator runs ``--clients`` concurrent clients, each
+issuing ``--requests`` queries drawn from the cases dataset with Zipf-like
+repetition (popular tickets recur), while a heartbeat task records how late the
+event loop wakes it. Compared: calling the synchronous ``Pipeline.run`` inside
+the coroutines, and ``AsyncPipeline`` at several concurrency limits.
+
+    python benchmarks/bench_async.py --clients 64 --requests 50
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from benchmarks.bench_rule_classifier import load_queries  # noqa: E402
+from triage.async_pipeline import AsyncPipeline  # noqa: E402
+from triage.pipeline import load_default_pipeline  # noqa: E402
+
+
+def workload(texts, clients: int, requests: int, seed: int):
+    rng = random.Random(seed)
+    weights = [1.0 / (rank + 1) for rank in range(len(texts))]
+    return [rng.choices(texts, weights, k=requests) for _ in range(clients)]
+
+
+async def drive(run, per_client):
+    """Run every client's queries; returns (seconds, per-request latencies, heartbeat lags)."""
+    lags, latencies = [], []
+
+    async def heartbeat(interval=0.001):
+        loop = asyncio.get_running_loop()
+        while True:
+            due = loop.time() + interval
+            await asyncio.sleep(interval)
+            lags.append(loop.time() - due)
+
+    async def client(queries):
+        for text in queries:
+            t0 = time.perf_counter()
+            await run(text)
+            latencies.append(time.perf_counter() - t0)
+
+    beat = asyncio.get_running_loop().create_task(heartbeat())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*(client(queries) for queries in per_client))
+    seconds = time.perf_counter() - start
+    beat.cancel()
+    return seconds, latencies, lags
+
+
+def pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--requests", type=int, default=30, help="Queries per client")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    pipeline = load_default_pipeline(BASE_DIR)
+    per_client = workload(load_queries(sys.maxsize), args.clients, args.requests, args.seed)
+    total = args.clients * args.requests
+
+    async def blocking(text):
+        return pipeline.run(text)
+
+    modes = [("sync run", None, blocking)]
+    for limit in args.concurrency:
+        apipe = AsyncPipeline(pipeline, max_concurrency=limit)
+        modes.append((f"async x{limit}", apipe, apipe.run))
+
+    results = []
+    for name, apipe, run in modes:
+        seconds, latencies, lags = asyncio.run(drive(run, per_client))
+        results.append(
+            {
+                "mode": name,
+                "requests": total,
+                "qps": round(total / seconds, 1),
+                "p50_ms": round(pct(latencies, 0.5) * 1e3, 2),
+                "p95_ms": round(pct(latencies, 0.95) * 1e3, 2),
+                "loop_lag_max_ms": round(max(lags, default=seconds) * 1e3, 2),
+                "computed": apipe.computed if apipe else total,
+            }
+        )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':>10} {'requests':>9} {'qps':>8} {'p50 ms':>8} {'p95 ms':>8} {'max lag ms':>11} {'computed':>9}")
+    for r in results:
+        print(
+            f"{r['mode']:>10} {r['requests']:>9} {r['qps']:>8.1f} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} "
+            f"{r['loop_lag_max_ms']:>11.2f} {r['computed']:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Cold-start wall time of one-shot ``src/cli.py`` calls.
+
+Each call runs in a fresh interpreter, as a user's shell would start it. Modes:
+a bare interpreter (the floor), ``--classify-only``, a TF-IDF and a BM25F query,
+and the TF-IDF query with NumPy, SciPy and multiprocessing imported up front, as
+the CLI did before its heavy imports were deferred.
+
+    python benchmarks/bench_cold_start.py --repeat 15
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from scripts.build_index import build_index  # noqa: E402
+
+CLI = str(BASE_DIR / "src" / "cli.py")
+QUERY = "Translation editor does not open for WooCommerce products"
+
+EAGER = (
+    "import runpy, sys\n"
+    "for name in ('numpy', 'scipy.sparse', 'multiprocessing'):\n"
+    "    try:\n"
+    "        __import__(name)\n"
+    "    except ImportError:\n"
+    "        pass\n"
+    f"sys.path.insert(0, {str(BASE_DIR / 'src')!r})\n"
+    f"sys.argv = [{CLI!r}] + sys.argv[1:]\n"
+    f"runpy.run_path({CLI!r}, run_name='__main__')\n"
+)
+
+MODES = {
+    "python -c pass": [sys.executable, "-c", "pass"],
+    "classify-only": [sys.executable, CLI, "--classify-only", QUERY],
+    "tfidf": [sys.executable, CLI, QUERY],
+    "bm25": [sys.executable, CLI, "--ranking", "bm25", QUERY],
+    "tfidf, eager imports": [sys.executable, "-c", EAGER, QUERY],
+}
+
+
+def wall_ms(cmd, repeat: int):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+        times.append((time.perf_counter() - t0) * 1e3)
+    return min(times), statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=9)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    if not (BASE_DIR / "artifacts" / "tfidf.idx").exists():
+        build_index(BASE_DIR / "data" / "cases.cleaned.jsonl", BASE_DIR / "artifacts" / "tfidf.idx")
+    for cmd in MODES.values():
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)  # warm the OS page cache and .pyc files
+    results = []
+    for mode, cmd in MODES.items():
+        best, median = wall_ms(cmd, args.repeat)
+        results.append({"mode": mode, "min_ms": round(best, 1), "median_ms": round(median, 1)})
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'mode':>22} {'min ms':>8} {'median ms':>10}")
+    for r in results:
+        print(f"{r['mode']:>22} {r['min_ms']:>8.1f} {r['median_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
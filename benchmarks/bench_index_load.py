@@ -0,0 +1,107 @@
+"""Index load time, resident memory and size: legacy pickle vs compact mmap format.
+
+Each measurement runs in a fresh interpreter so RSS reflects only that load.
+--replicate N repeats the cases dataset N times to model a larger corpus.
+
+    python benchmarks/bench_index_load.py --replicate 10
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from scripts.build_index import build_index, load_jsonl  # noqa: E402
+
+PROBE = r"""
+import json, sys, time
+sys.path.insert(0, {src!r})
+
+def rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+from triage.retriever_tfidf import TfidfRetriever
+before = rss_kb()
+t0 = time.perf_counter()
+r = TfidfRetriever({path!r})
+load_ms = (time.perf_counter() - t0) * 1e3
+after_load = rss_kb()
+t0 = time.perf_counter()
+r.search("Translation editor does not open for WooCommerce products")
+first_ms = (time.perf_counter() - t0) * 1e3
+print(json.dumps({{"load_ms": load_ms, "first_search_ms": first_ms,
+                  "rss_load_kb": after_load - before, "rss_after_search_kb": rss_kb() - before}}))
+"""
+
+
+def write_replicated(cases_path: Path, out_path: Path, times: int) -> int:
+    n = 0
+    with out_path.open("w", encoding="utf-8") as f:
+        for rep in range(times):
+            for case in load_jsonl(cases_path):
+                case["case_id"] = f"{case.get('case_id')}-{rep}"
+                f.write(json.dumps(case, ensure_ascii=False) + "\n")
+                n += 1
+    return n
+
+
+def probe(path: Path):
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(src=str(BASE_DIR / "src"), path=str(path))],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(out.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=Path, default=BASE_DIR / "data" / "cases.cleaned.jsonl")
+    parser.add_argument("--replicate", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        cases_path = args.cases
+        docs = sum(1 for _ in load_jsonl(cases_path))
+        if args.replicate > 1:
+            cases_path = tmp / "cases.jsonl"
+            docs = write_replicated(args.cases, cases_path, args.replicate)
+        for fmt, name in (("pickle", "tfidf.joblib"), ("compact", "tfidf.idx")):
+            path = tmp / name
+            build_index(cases_path, path, fmt=fmt)
+            size = path.stat().st_size
+            meta = Path(str(path) + ".meta")
+            if meta.exists():
+                size += meta.stat().st_size
+            results.append(dict(format=fmt, docs=docs, bytes_on_disk=size, **probe(path)))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'format':>8} {'docs':>7} {'disk MB':>8} {'load ms':>8} {'1st search ms':>14} {'RSS load MB':>12} {'RSS +search MB':>15}")
+    for r in results:
+        print(
+            f"{r['format']:>8} {r['docs']:>7} {r['bytes_on_disk'] / 2**20:>8.1f} {r['load_ms']:>8.1f} "
+            f"{r['first_search_ms']:>14.1f} {r['rss_load_kb'] / 1024:>12.1f} {r['rss_after_search_kb'] / 1024:>15.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""How ``match: word`` keywords shift classification on the cases dataset.
+
+Classifies every case's ``analysis_text`` with the shipped rules and with the
+same rules forced back to plain substring matching, then reports category
+counts under both, the category transitions, how often each word-mode keyword
+is among the winning category's signals under each mode, and the per-query cost.
+
+    python benchmarks/bench_keyword_match.py
+    python benchmarks/bench_keyword_match.py --json
+"""
+import argparse
+import json
+import sys
+from collections import Counter
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from benchmarks.bench_rule_classifier import load_queries, per_query_us  # noqa: E402
+from triage.pipeline import load_yaml  # noqa: E402
+from triage.rule_classifier import RuleClassifier  # noqa: E402
+
+
+def substring_only(rules_cfg):
+    cfg = json.loads(json.dumps(rules_cfg))
+    for rule in cfg["categories"].values():
+        for kw in rule.get("keywords", []):
+            kw.pop("match", None)
+    return cfg
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rules", type=Path, default=BASE_DIR / "configs" / "rules.yaml")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    rules_cfg = load_yaml(args.rules)
+    texts = load_queries(sys.maxsize)
+    substring, word = RuleClassifier(substring_only(rules_cfg)), RuleClassifier(rules_cfg)
+    before = [substring.classify(text) for text in texts]
+    after = [word.classify(text) for text in texts]
+
+    word_ids = {kw["id"] for r in rules_cfg["categories"].values() for kw in r.get("keywords", []) if kw.get("match") == "word"}
+    fired = {
+        kw_id: {
+            "substring": sum(any(s["id"] == kw_id for s in r["signals"]) for r in before),
+            "word": sum(any(s["id"] == kw_id for s in r["signals"]) for r in after),
+        }
+        for kw_id in sorted(word_ids)
+    }
+    transitions = Counter(f"{b['category']} -> {a['category']}" for b, a in zip(before, after) if b["category"] != a["category"])
+    result = {
+        "cases": len(texts),
+        "changed": sum(transitions.values()),
+        "categories_substring": dict(Counter(r["category"] for r in before).most_common()),
+        "categories_word": dict(Counter(r["category"] for r in after).most_common()),
+        "transitions": dict(transitions.most_common()),
+        "word_keywords_fired": fired,
+        "substring_us_per_query": round(per_query_us(substring.classify, texts, args.repeat), 1),
+        "word_us_per_query": round(per_query_us(word.classify, texts, args.repeat), 1),
+    }
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['changed']} of {result['cases']} cases change category")
+    for key in ("categories_substring", "categories_word", "transitions"):
+        print(f"{key}: " + ", ".join(f"{k}={v}" for k, v in result[key].items()))
+    for kw_id, counts in fired.items():
+        print(f"  {kw_id:<20} substring={counts['substring']:>5} word={counts['word']:>5}")
+    print(f"us/query: substring {result['substring_us_per_query']}, word {result['word_us_per_query']}")
+
+
+if __name__ == "__main__":
+    main()
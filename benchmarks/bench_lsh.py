@@ -0,0 +1,120 @@
+"""Approximate (LSH candidate) search vs exact search.
+
+For each ``--configs`` entry (``TABLESxBITS``) the index is built with SimHash
+LSH tables, and every titled case's title becomes a query, as in
+``bench_ranking.py``. Each query is searched exactly and in approximate mode
+with each ``--probes`` setting. Reports, per ranking, configuration and probe
+count: build time, the mean share of documents proposed as candidates, mean
+search latency for both modes and the speedup, recall@5 against the exact
+top-5, and recall@5 of the query's own case for both.
+
+    python benchmarks/bench_lsh.py
+    python benchmarks/bench_lsh.py --copies 8 --configs 16x6 32x6 16x8 --json
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from benchmarks.bench_partitions import write_copies  # noqa: E402
+from benchmarks.bench_ranking import labeled_queries  # noqa: E402
+from scripts.build_index import build_index  # noqa: E402
+from triage.lsh import SimHasher  # noqa: E402
+from triage.retriever_tfidf import TfidfRetriever  # noqa: E402
+
+CASES_PATH = BASE_DIR / "data" / "cases.cleaned.jsonl"
+TOP_K = 5
+
+
+def parse_config(value: str):
+    tables, _, bits = value.lower().partition("x")
+    return int(tables), int(bits)
+
+
+def timed(search, queries, repeat: int):
+    best, results = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        results = [search(text) for text in queries]
+        best = min(best, time.perf_counter() - t0)
+    return best / len(queries), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--configs", nargs="*", default=["16x6", "32x6", "16x8"], help="LSH tables x bits per table to build")
+    parser.add_argument("--probes", type=int, nargs="*", default=[0, 1, 2], help="Extra buckets probed per table")
+    parser.add_argument("--rankings", nargs="*", default=["tfidf", "bm25"])
+    parser.add_argument("--copies", type=int, default=1, help="Index the cases this many times over (no dedup when > 1)")
+    parser.add_argument("--backend", default="python", help="Backend of the exact search (default: python, like the candidate scoring)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        cases_path = write_copies(Path(tmp) / "cases.jsonl", args.copies) if args.copies > 1 else CASES_PATH
+        for config in args.configs:
+            tables, bits = parse_config(config)
+            index_path = Path(tmp) / f"tfidf-{tables}x{bits}.idx"
+            t0 = time.perf_counter()
+            build_index(cases_path, index_path, dedup=args.copies <= 1, lsh=SimHasher(tables, bits))
+            build_s = time.perf_counter() - t0
+
+            for ranking in args.rankings:
+                exact = TfidfRetriever(index_path, backend=args.backend, ranking=ranking)
+                labeled = labeled_queries(exact, CASES_PATH)
+                queries = [text for text, _ in labeled]
+                exact_s, expected = timed(lambda text: exact.citations(text, TOP_K), queries, args.repeat)
+                for probes in args.probes:
+                    approx = TfidfRetriever(index_path, ranking=ranking, approximate=True, lsh_probes=probes)
+                    approx_s, got = timed(lambda text: approx.citations(text, TOP_K), queries, args.repeat)
+                    recall = recall_exact = recall_approx = 0
+                    for (_, relevant), want, have in zip(labeled, expected, got):
+                        want_ids, have_ids = [c.case_id for c in want], [c.case_id for c in have]
+                        recall += len(set(want_ids) & set(have_ids)) / max(len(want_ids), 1)
+                        recall_exact += relevant in want_ids
+                        recall_approx += relevant in have_ids
+                    n = len(queries)
+                    results.append(
+                        {
+                            "ranking": ranking,
+                            "tables": tables,
+                            "bits": bits,
+                            "probes": probes,
+                            "docs": exact.index.num_docs,
+                            "queries": n,
+                            "build_s": round(build_s, 2),
+                            "candidates": round(approx.scorer.candidates_scored / args.repeat / n / exact.index.num_docs, 3),
+                            "exact_us": round(exact_s * 1e6, 1),
+                            "approx_us": round(approx_s * 1e6, 1),
+                            "speedup": round(exact_s / approx_s, 2),
+                            "recall@5": round(recall / n, 3),
+                            "own_recall@5_exact": round(recall_exact / n, 3),
+                            "own_recall@5_approx": round(recall_approx / n, 3),
+                        }
+                    )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(
+        f"{'ranking':>7} {'LSH':>6} {'probes':>6} {'docs':>6} {'build s':>8} {'cand.':>6} {'exact us':>9} {'approx us':>10} "
+        f"{'speedup':>8} {'recall@5':>9} {'own exact':>10} {'own approx':>11}"
+    )
+    for r in results:
+        print(
+            f"{r['ranking']:>7} {str(r['tables']) + 'x' + str(r['bits']):>6} {r['probes']:>6} {r['docs']:>6} {r['build_s']:>8.2f} "
+            f"{r['candidates']:>6.1%} {r['exact_us']:>9.1f} {r['approx_us']:>10.1f} {r['speedup']:>7.2f}x {r['recall@5']:>9.3f} "
+            f"{r['own_recall@5_exact']:>10.3f} {r['own_recall@5_approx']:>11.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Allocation and time cost of assembling and serializing pipeline outputs.
+
+With a warm result cache ``Pipeline.run`` does no classification or retrieval,
+so what remains is building the output objects; ``json()`` is the batch
+serialization path. Over the cases dataset replayed as queries it reports, per
+result: microseconds for a cached ``run`` and for ``json()``, bytes allocated at
+peak while doing both, bytes retained by a kept output, and generation-0
+garbage collections (a proxy for container allocation churn) per 1,000 results.
+
+    python benchmarks/bench_output.py --json
+"""
+import argparse
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from benchmarks.bench_rule_classifier import load_queries  # noqa: E402
+from triage.cache import ResultCache  # noqa: E402
+from triage.pipeline import load_default_pipeline  # noqa: E402
+
+
+def best_us(fn, items, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(items) * 1e6
+
+
+def gen0_collections(fn, items) -> float:
+    collections = [0]
+
+    def count(phase, info):
+        if phase == "start" and info["generation"] == 0:
+            collections[0] += 1
+
+    gc.collect()
+    gc.callbacks.append(count)
+    try:
+        for item in items:
+            fn(item)
+    finally:
+        gc.callbacks.remove(count)
+    return collections[0] * 1000 / len(items)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    texts = load_queries(sys.maxsize)
+    pipeline = load_default_pipeline(BASE_DIR, cache=ResultCache(len(texts) * 2))
+    outputs = [pipeline.run(text) for text in texts]  # warms the cache
+
+    def run_and_encode(text):
+        return pipeline.run(text).json()
+
+    tracemalloc.start()
+    peaks = 0
+    for text in texts:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        run_and_encode(text)
+        peaks += tracemalloc.get_traced_memory()[1] - base
+    base = tracemalloc.get_traced_memory()[0]
+    kept = [pipeline.run(text) for text in texts]
+    retained = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    del kept
+
+    result = {
+        "results": len(texts),
+        "run_cached_us": round(best_us(pipeline.run, texts, args.repeat), 2),
+        "json_us": round(best_us(lambda o: o.json(), outputs, args.repeat), 2),
+        "peak_bytes_per_result": round(peaks / len(texts)),
+        "retained_bytes_per_output": round(retained / len(texts)),
+        "gen0_gcs_per_1000": round(gen0_collections(run_and_encode, texts), 2),
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    for key, value in result.items():
+        print(f"{key:>26} {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Bulk triage throughput of run_batch_parallel at different worker counts.
+
+Replays the cases dataset (repeated to --queries texts) through the full
+pipeline and reports queries/sec per worker count.
+
+    python benchmarks/bench_parallel.py --workers 1 2 4 8 --queries 20000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from itertools import cycle, islice
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR / "src"))
+
+from triage.parallel import run_batch_parallel  # noqa: E402
+from triage.pipeline import load_default_pipeline  # noqa: E402
+
+
+def load_texts():
+    with (BASE_DIR / "data" / "cases.cleaned.jsonl").open("r", encoding="utf-8") as f:
+        return [json.loads(line).get("analysis_text", "") for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    pipeline = load_default_pipeline(BASE_DIR)
+    texts = load_texts()
+    results = []
+    for workers in args.workers:
+        stream = islice(cycle(texts), args.queries)
+        t0 = time.perf_counter()
+        count = sum(1 for _ in run_batch_parallel(stream, workers, pipeline=pipeline, chunk_size=args.chunk_size))
+        elapsed = time.perf_counter() - t0
+        results.append({"workers": workers, "queries": count, "seconds": round(elapsed, 3), "qps": round(count / elapsed, 1)})
+
+    if args.json:
+        print(json.dumps({"cpus": os.cpu_count(), "results": results}, indent=2))
+        return
+    print(f"cpus={os.cpu_count()}")
+    print(f"{'workers':>7} {'queries':>8} {'seconds':>8} {'qps':>9}")
+    for r in results:
+        print(f"{r['workers']:>7} {r['queries']:>8} {r['seconds']:>8} {r['qps']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Partition-first search vs searching every case.
+
+The index is built partitioned (each case classified with ``configs/rules.yaml``)
+and every titled case's title becomes a query, as in ``bench_ranking.py``. A
+query triaged with at least ``--confidence`` is searched in its category's
+partition first, widening to the full index when its top-5 do not all clear the
+score floor. Reports, per ranking and floor: the share of queries searched by
+partition and widened, mean search latency for both strategies and the saving
+(over all queries, and over just the partition-searched ones), top-5 citation
+overlap and top-1 agreement with the unpartitioned results, and
+recall@5 of the query's own case for both.
+
+    python benchmarks/bench_partitions.py
+    python benchmarks/bench_partitions.py --copies 8 --json
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from benchmarks.bench_ranking import labeled_queries  # noqa: E402
+from scripts.build_index import build_index, default_classifier, load_jsonl  # noqa: E402
+from triage.retriever_tfidf import PARTITION_FLOORS, TfidfRetriever  # noqa: E402
+
+CASES_PATH = BASE_DIR / "data" / "cases.cleaned.jsonl"
+TOP_K = 5
+
+
+def write_copies(path: Path, copies: int) -> Path:
+    """The cases ``copies`` times over, with distinct case ids, to scale the corpus."""
+    with path.open("w", encoding="utf-8") as f:
+        for copy in range(copies):
+            for case in load_jsonl(CASES_PATH):
+                if copy:
+                    case["case_id"] = f"{case.get('case_id')}~{copy}"
+                f.write(json.dumps(case, ensure_ascii=False) + "\n")
+    return path
+
+
+def timed(search, queries, repeat: int):
+    best, results = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        results = [search(text, partition) for text, partition in queries]
+        best = min(best, time.perf_counter() - t0)
+    return best / len(queries), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--confidence", type=float, default=0.5, help="Triage confidence needed to search a partition first")
+    parser.add_argument("--floors", type=float, nargs="*", default=None, help="Score floors to try (default: the ranking's default)")
+    parser.add_argument("--copies", type=int, default=1, help="Index the cases this many times over (no dedup when > 1)")
+    parser.add_argument("--backend", default="auto", help="Scoring backend (default: auto)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    classifier = default_classifier()
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        index_path = Path(tmp) / "tfidf.idx"
+        if args.copies > 1:
+            build_index(write_copies(Path(tmp) / "cases.jsonl", args.copies), index_path, dedup=False, classifier=classifier)
+        else:
+            build_index(CASES_PATH, index_path, classifier=classifier)
+
+        for ranking in ("tfidf", "bm25"):
+            full = TfidfRetriever(index_path, backend=args.backend, ranking=ranking)
+            labeled = labeled_queries(full, CASES_PATH)
+            queries = []
+            for text, _ in labeled:
+                triage = classifier.triage(text)
+                partition = ("category", triage.category) if triage.confidence >= args.confidence else None
+                queries.append((text, partition))
+            full_s, expected = timed(lambda text, _: full.citations(text, TOP_K), queries, args.repeat)
+            subset = [q for q in queries if q[1] is not None]
+            subset_full_s, _ = timed(lambda text, _: full.citations(text, TOP_K), subset, args.repeat)
+
+            for floor in args.floors if args.floors is not None else [PARTITION_FLOORS[ranking]]:
+                part = TfidfRetriever(index_path, backend=args.backend, ranking=ranking, partition_floor=floor)
+                part_s, got = timed(lambda text, p: part.citations(text, TOP_K, partition=p), queries, args.repeat)
+                searches, widened = part.partition_searches, part.partition_widened
+                subset_part_s, _ = timed(lambda text, p: part.citations(text, TOP_K, partition=p), subset, args.repeat)
+                overlap = top1 = recall_full = recall_part = 0
+                for (_, relevant), want, have in zip(labeled, expected, got):
+                    want_ids, have_ids = [c.case_id for c in want], [c.case_id for c in have]
+                    overlap += len(set(want_ids) & set(have_ids)) / max(len(want_ids), 1)
+                    top1 += want_ids[:1] == have_ids[:1]
+                    recall_full += relevant in want_ids
+                    recall_part += relevant in have_ids
+                n = len(queries)
+                results.append(
+                    {
+                        "ranking": ranking,
+                        "floor": floor,
+                        "docs": full.index.num_docs,
+                        "queries": n,
+                        "partitioned": round(searches / args.repeat / n, 3),
+                        "widened": round(widened / max(searches, 1), 3),
+                        "full_us": round(full_s * 1e6, 1),
+                        "partitioned_us": round(part_s * 1e6, 1),
+                        "saved": round(1 - part_s / full_s, 3),
+                        "saved_when_partitioned": round(1 - subset_part_s / subset_full_s, 3) if subset else 0.0,
+                        "overlap@5": round(overlap / n, 3),
+                        "top1_agree": round(top1 / n, 3),
+                        "recall@5_full": round(recall_full / n, 3),
+                        "recall@5_partitioned": round(recall_part / n, 3),
+                    }
+                )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(
+        f"{'ranking':>7} {'floor':>6} {'docs':>6} {'part.':>6} {'widened':>8} {'full us':>9} {'part. us':>9} "
+        f"{'saved':>6} {'(part.)':>7} {'overlap@5':>10} {'top1':>6} {'R@5 full':>9} {'R@5 part.':>10}"
+    )
+    for r in results:
+        print(
+            f"{r['ranking']:>7} {r['floor']:>6g} {r['docs']:>6} {r['partitioned']:>6.1%} {r['widened']:>8.1%} "
+            f"{r['full_us']:>9.1f} {r['partitioned_us']:>9.1f} {r['saved']:>6.1%} {r['saved_when_partitioned']:>7.1%} {r['overlap@5']:>10.3f} "
+            f"{r['top1_agree']:>6.3f} {r['recall@5_full']:>9.3f} {r['recall@5_partitioned']:>10.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Ranking quality and latency: TF-IDF cosine vs BM25F, exhaustive vs MaxScore.
+
+Every titled case in the dataset becomes a query (its title); the relevant
+document is the indexed case whose ``source_urls`` include the query case's
+URL. Reports recall@1/5/10, MRR@10, mean and p95 latency per query and, for
+BM25, the share of postings the MaxScore scorer actually read.
+
+    python benchmarks/bench_ranking.py
+    python benchmarks/bench_ranking.py --json
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from scripts.build_index import build_index, load_jsonl  # noqa: E402
+from triage.retriever_tfidf import TfidfRetriever  # noqa: E402
+from triage.scoring import available_backends  # noqa: E402
+
+KS = (1, 5, 10)
+
+
+def labeled_queries(retriever: TfidfRetriever, cases_path: Path):
+    doc_of_url = {}
+    for doc_id in range(retriever.index.num_docs):
+        for url in retriever.index.meta(doc_id).get("source_urls", ()):
+            doc_of_url.setdefault(url, retriever.index.meta(doc_id)["case_id"])
+    return [(c["title"], doc_of_url[c["topic_url"]]) for c in load_jsonl(cases_path) if c.get("title") and c.get("topic_url") in doc_of_url]
+
+
+def evaluate(retriever: TfidfRetriever, queries):
+    hits = {k: 0 for k in KS}
+    reciprocal = 0.0
+    samples = []
+    for text, relevant in queries:
+        t0 = time.perf_counter()
+        citations = retriever.search(text, top_k=max(KS))
+        samples.append(time.perf_counter() - t0)
+        ranked = [c["case_id"] for c in citations]
+        if relevant in ranked:
+            rank = ranked.index(relevant) + 1
+            reciprocal += 1.0 / rank
+            for k in KS:
+                hits[k] += rank <= k
+    samples.sort()
+    n = len(queries)
+    out = {f"recall@{k}": round(hits[k] / n, 4) for k in KS}
+    out["mrr@10"] = round(reciprocal / n, 4)
+    out["mean_ms"] = round(sum(samples) / n * 1e3, 3)
+    out["p95_ms"] = round(samples[int(0.95 * (n - 1))] * 1e3, 3)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=Path, default=BASE_DIR / "data" / "cases.cleaned.jsonl")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        index_path = Path(tmp) / "tfidf.idx"
+        build_index(args.cases, index_path)
+        queries = labeled_queries(TfidfRetriever(index_path, backend="python"), args.cases)
+        for ranking in ("tfidf", "bm25"):
+            for backend in available_backends(ranking):
+                retriever = TfidfRetriever(index_path, backend=backend, ranking=ranking)
+                row = {"ranking": ranking, "backend": backend, "queries": len(queries)}
+                row.update(evaluate(retriever, queries))
+                if backend == "maxscore":
+                    exhaustive = sum(
+                        len(retriever.index.impacts(t)[0]) for text, _ in queries for t in retriever.query_vector(text)[0]
+                    )
+                    row["postings_read"] = round(retriever.scorer.postings_scored / max(exhaustive, 1), 3)
+                results.append(row)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    cols = ["ranking", "backend", "recall@1", "recall@5", "recall@10", "mrr@10", "mean_ms", "p95_ms", "postings_read"]
+    print(" ".join(f"{c:>13}" for c in cols))
+    for r in results:
+        print(" ".join(f"{str(r.get(c, '')):>13}" for c in cols))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""Related-cases graph: build cost and lookup latency against searching.
+
+For the real cases corpus and synthetic corpora of ``--sizes`` cases the
+index is built, then the related-cases graph is added to it in a fresh
+process (``add_related_graph``), which reports the graph pass's time and
+peak RSS. Also reported: the graph's share of the index file, and mean
+latency of ``related(case_id)`` against searching the case's own text
+(``citations(analysis_text)``) for ``--queries`` cases.
+
+    python benchmarks/bench_related.py
+    python benchmarks/bench_related.py --sizes 10000 100000 --workers 4 --json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from benchmarks.synth import write_synthetic_cases  # noqa: E402
+from scripts.build_index import build_index, load_jsonl  # noqa: E402
+from triage.knn import resolve_backend  # noqa: E402
+from triage.retriever_tfidf import TfidfRetriever  # noqa: E402
+
+CASES_PATH = BASE_DIR / "data" / "cases.cleaned.jsonl"
+TOP_K = 5
+
+GRAPH_PROBE = r"""
+import json, resource, sys, time
+sys.path.insert(0, {base!r})
+sys.path.insert(0, {src!r})
+from pathlib import Path
+from scripts.build_index import add_related_graph
+t0 = time.perf_counter()
+add_related_graph(Path({index!r}), {k}, workers={workers}, backend={backend!r})
+elapsed = time.perf_counter() - t0
+peak = max(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN))
+print(json.dumps({{"seconds": elapsed, "peak_rss_kb": peak}}))
+"""
+
+
+def graph_in_subprocess(index_path: Path, k: int, workers: int, backend: str):
+    code = GRAPH_PROBE.format(
+        base=str(BASE_DIR), src=str(BASE_DIR / "src"), index=str(index_path), k=k, workers=workers, backend=backend
+    )
+    proc = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    rss_kb = result["peak_rss_kb"] / (1024 if sys.platform == "darwin" else 1)
+    return result["seconds"], rss_kb / 1024
+
+
+def mean_latency(fn, items):
+    t0 = time.perf_counter()
+    for item in items:
+        fn(item)
+    return (time.perf_counter() - t0) / len(items)
+
+
+def bench_corpus(name: str, cases_path: Path, workdir: Path, args) -> dict:
+    index_path = workdir / f"{name}.idx"
+    t0 = time.perf_counter()
+    build_index(cases_path, index_path, dedup=name == "cases")
+    build_s = time.perf_counter() - t0
+    plain_bytes = index_path.stat().st_size
+    graph_s, graph_rss_mb = graph_in_subprocess(index_path, args.k, args.workers, args.backend)
+
+    retriever = TfidfRetriever(index_path)
+    index = retriever.index
+    graph_bytes = sum(len(index.section(s)) * index.section(s).itemsize for s in ("knn_docs", "knn_scores", "case_id_order"))
+    texts = {}
+    for case in load_jsonl(cases_path):
+        texts.setdefault(case["case_id"], case.get("analysis_text", ""))
+    step = max(1, index.num_docs // args.queries)
+    case_ids = index.case_ids()[::step][: args.queries]
+    related_s = mean_latency(lambda case_id: retriever.related(case_id, TOP_K), case_ids)
+    search_s = mean_latency(lambda case_id: retriever.citations(texts[case_id], TOP_K + 1), case_ids)
+    return {
+        "corpus": name,
+        "docs": index.num_docs,
+        "k": args.k,
+        "backend": args.backend,
+        "workers": args.workers,
+        "build_s": round(build_s, 2),
+        "graph_s": round(graph_s, 2),
+        "graph_ms_per_doc": round(graph_s / index.num_docs * 1e3, 3),
+        "graph_peak_rss_mb": round(graph_rss_mb, 1),
+        "graph_mb": round(graph_bytes / 2**20, 2),
+        "graph_share": round(graph_bytes / (plain_bytes + graph_bytes), 3),
+        "related_us": round(related_s * 1e6, 1),
+        "search_us": round(search_s * 1e6, 1),
+        "speedup": round(search_s / related_s, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10000], help="Synthetic corpus sizes (the real corpus always runs)")
+    parser.add_argument("--k", type=int, default=10, help="Related cases stored per case")
+    parser.add_argument("--backend", default="auto", help="Graph backend: auto, maxscore or numpy")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--queries", type=int, default=200, help="Cases looked up and searched for the latencies")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+    args.backend = resolve_backend(args.backend)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        results.append(bench_corpus("cases", CASES_PATH, workdir, args))
+        for n in args.sizes:
+            cases_path = write_synthetic_cases(workdir / f"synth-{n}.jsonl", n)
+            results.append(bench_corpus(f"synth-{n}", cases_path, workdir, args))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(
+        f"{'corpus':>12} {'docs':>7} {'backend':>8} {'build s':>8} {'graph s':>8} {'ms/doc':>7} {'RSS MB':>7} "
+        f"{'graph MB':>9} {'share':>6} {'related us':>11} {'search us':>10} {'speedup':>8}"
+    )
+    for r in results:
+        print(
+            f"{r['corpus']:>12} {r['docs']:>7} {r['backend']:>8} {r['build_s']:>8.2f} {r['graph_s']:>8.2f} {r['graph_ms_per_doc']:>7.3f} "
+            f"{r['graph_peak_rss_mb']:>7.1f} {r['graph_mb']:>9.2f} {r['graph_share']:>6.1%} {r['related_us']:>11.1f} "
+            f"{r['search_us']:>10.1f} {r['speedup']:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
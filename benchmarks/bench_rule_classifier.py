@@ -0,0 +1,117 @@
+"""Per-query cost of RuleClassifier.classify as the number of rule signals grows.
+
+Compares the compiled classifier (one Aho–Corasick pass for keywords plus
+precompiled regexes) with the previous per-pattern scan on the cases dataset.
+
+    python benchmarks/bench_rule_classifier.py --sizes 150 500 1000 2000 5000
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR / "src"))
+
+from triage.pipeline import load_yaml  # noqa: E402
+from triage.rule_classifier import RuleClassifier, normalize_text  # noqa: E402
+
+
+def load_queries(limit: int):
+    queries = []
+    with (BASE_DIR / "data" / "cases.cleaned.jsonl").open("r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                queries.append(json.loads(line).get("analysis_text", ""))
+            if len(queries) >= limit:
+                break
+    return queries
+
+
+def synthesize_rules(base_cfg, size: int, queries, seed: int = 7):
+    """Pad the shipped rules with keyword signals drawn from corpus uni/bigrams."""
+    rng = random.Random(seed)
+    vocab = set()
+    for q in queries:
+        tokens = normalize_text(q).split()
+        vocab.update(tokens)
+        vocab.update(" ".join(tokens[i : i + 2]) for i in range(len(tokens) - 1))
+    vocab = sorted(vocab)
+
+    cfg = json.loads(json.dumps(base_cfg))
+    cats = [c for c in cfg["categories"] if c != "other"]
+    current = sum(len(r.get("keywords", [])) + len(r.get("regex", [])) for r in cfg["categories"].values())
+    i = 0
+    while current < size:
+        cat = cats[i % len(cats)]
+        pattern = rng.choice(vocab)
+        cfg["categories"][cat]["keywords"].append({"id": f"kw:synth{i}", "pattern": pattern, "weight": 0.1})
+        current += 1
+        i += 1
+    return cfg, current
+
+
+def naive_scores(cfg, query_text):
+    q = normalize_text(query_text)
+    out = []
+    for cat, rule in cfg.get("categories", {}).items():
+        score = 0.0
+        for kw in rule.get("keywords", []):
+            if kw.get("pattern", "") in q:
+                score += float(kw.get("weight", 0.0))
+        for rx in rule.get("regex", []):
+            pattern = rx.get("pattern", "")
+            if pattern and re.search(pattern, q, flags=re.I):
+                score += float(rx.get("weight", 0.0))
+        out.append((cat, score))
+    return out
+
+
+def per_query_us(fn, queries, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for q in queries:
+            fn(q)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(queries) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[150, 500, 1000, 2000, 5000])
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    base_cfg = load_yaml(BASE_DIR / "configs" / "rules.yaml")
+    queries = load_queries(args.queries)
+    results = []
+    for size in args.sizes:
+        cfg, signals = synthesize_rules(base_cfg, size, queries)
+        t0 = time.perf_counter()
+        classifier = RuleClassifier(cfg)
+        compile_ms = (time.perf_counter() - t0) * 1e3
+        results.append(
+            {
+                "signals": signals,
+                "compile_ms": round(compile_ms, 2),
+                "naive_us_per_query": round(per_query_us(lambda q: naive_scores(cfg, q), queries, args.repeat), 1),
+                "compiled_us_per_query": round(per_query_us(classifier.classify, queries, args.repeat), 1),
+            }
+        )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'signals':>8} {'compile ms':>11} {'naive us/q':>11} {'compiled us/q':>14}")
+    for r in results:
+        print(f"{r['signals']:>8} {r['compile_ms']:>11} {r['naive_us_per_query']:>11} {r['compiled_us_per_query']:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Retriever scoring backends: a loop over search() vs one search_batch() call.
+
+Replays the cases dataset and the Kimi samples (repeated to --queries texts)
+against an index and reports seconds and queries/sec for each available
+backend, checking that every backend returns the same citations.
+
+    python benchmarks/bench_search_batch.py --queries 10000
+    python benchmarks/bench_search_batch.py --cases /tmp/syn100k.jsonl --queries 1000
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from itertools import cycle, islice
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from scripts.build_index import build_index, load_jsonl  # noqa: E402
+from triage.retriever_tfidf import TfidfRetriever  # noqa: E402
+from triage.scoring import available_backends  # noqa: E402
+
+
+def load_texts():
+    texts = [c.get("analysis_text", "") for c in load_jsonl(BASE_DIR / "data" / "cases.cleaned.jsonl")]
+    texts += [s.get("text", "") for s in load_jsonl(BASE_DIR / "data" / "samples_for_kimi.jsonl")]
+    return texts
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=Path, default=BASE_DIR / "data" / "cases.cleaned.jsonl")
+    parser.add_argument("--queries", type=int, default=10000)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    texts = list(islice(cycle(load_texts()), args.queries))
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        index_path = Path(tmp) / "tfidf.idx"
+        build_index(args.cases, index_path)
+        expected = None
+        for backend in available_backends():
+            retriever = TfidfRetriever(index_path, backend=backend)
+            looped, loop_s = timed(lambda: [retriever.search(t) for t in texts])
+            batched, batch_s = timed(lambda: retriever.search_batch(texts))
+            expected = expected or looped
+            for mode, out, seconds in (("search", looped, loop_s), ("search_batch", batched, batch_s)):
+                results.append(
+                    {
+                        "backend": backend,
+                        "mode": mode,
+                        "queries": len(texts),
+                        "seconds": round(seconds, 3),
+                        "qps": round(len(texts) / seconds, 1),
+                        "same_citations": out == expected,
+                    }
+                )
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'backend':>8} {'mode':>13} {'queries':>8} {'seconds':>8} {'qps':>9} {'same':>5}")
+    for r in results:
+        print(f"{r['backend']:>8} {r['mode']:>13} {r['queries']:>8} {r['seconds']:>8} {r['qps']:>9} {str(r['same_citations']):>5}")
+
+
+if __name__ == "__main__":
+    main()
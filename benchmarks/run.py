@@ -0,0 +1,185 @@
+"""Benchmark suite and regression gate for the triage pipeline.
+
+For the real cases corpus and any number of synthetic corpora it measures
+index build time and peak memory, index size and load time, and per-query
+latency of classify, search and end-to-end run on each query workload
+(the cleaned cases and the Kimi samples). Results are written as JSON; with
+--baseline, any metric slower/larger than baseline * (1 + --threshold) fails
+the run with exit code 1.
+
+    python benchmarks/run.py --sizes 10000 100000 --out bench.json
+    python benchmarks/run.py --baseline bench.json --threshold 0.25
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from benchmarks.synth import write_synthetic_cases  # noqa: E402
+from scripts.build_index import load_jsonl  # noqa: E402
+from triage.action_plan import ActionPlanner  # noqa: E402
+from triage.index_store import meta_path_for  # noqa: E402
+from triage.pipeline import Pipeline, PipelineVersions, load_yaml  # noqa: E402
+from triage.retriever_tfidf import TfidfRetriever  # noqa: E402
+from triage.rule_classifier import RuleClassifier  # noqa: E402
+
+WORKLOADS = {
+    "cases": (BASE_DIR / "data" / "cases.cleaned.jsonl", "analysis_text"),
+    "samples": (BASE_DIR / "data" / "samples_for_kimi.jsonl", "text"),
+}
+
+BUILD_PROBE = r"""
+import json, resource, sys, time
+sys.path.insert(0, {base!r})
+sys.path.insert(0, {src!r})
+from scripts.build_index import build_index
+t0 = time.perf_counter()
+from pathlib import Path
+build_index(Path({cases!r}), Path({out!r}))
+elapsed = time.perf_counter() - t0
+print(json.dumps({{"seconds": elapsed, "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}}))
+"""
+
+
+def percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))]
+
+
+def load_workload(name: str, limit: int) -> List[str]:
+    path, field = WORKLOADS[name]
+    texts = []
+    for obj in load_jsonl(path):
+        texts.append(obj.get(field, ""))
+        if len(texts) >= limit:
+            break
+    return texts
+
+
+def time_calls(fn, texts: List[str]) -> Dict[str, float]:
+    samples = []
+    for text in texts:
+        t0 = time.perf_counter()
+        fn(text)
+        samples.append(time.perf_counter() - t0)
+    total = sum(samples)
+    return {
+        "p50_us": round(percentile(samples, 50) * 1e6, 1),
+        "p95_us": round(percentile(samples, 95) * 1e6, 1),
+        "mean_us": round(total / len(samples) * 1e6, 1) if samples else 0.0,
+    }
+
+
+def build_in_subprocess(cases: Path, out: Path) -> Dict[str, float]:
+    code = BUILD_PROBE.format(base=str(BASE_DIR), src=str(BASE_DIR / "src"), cases=str(cases), out=str(out))
+    proc = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    # ru_maxrss is KiB on Linux and bytes on macOS.
+    rss_kb = result["peak_rss_kb"] / (1024 if sys.platform == "darwin" else 1)
+    return {"build_s": round(result["seconds"], 3), "build_peak_rss_mb": round(rss_kb / 1024, 1)}
+
+
+def bench_corpus(name: str, cases_path: Path, workdir: Path, workloads: Dict[str, List[str]]) -> Dict:
+    index_path = workdir / f"{name}.idx"
+    result = {"docs": sum(1 for _ in load_jsonl(cases_path))}
+    result.update(build_in_subprocess(cases_path, index_path))
+    result["index_mb"] = round((index_path.stat().st_size + meta_path_for(index_path).stat().st_size) / 2**20, 2)
+
+    t0 = time.perf_counter()
+    retriever = TfidfRetriever(index_path)
+    result["load_ms"] = round((time.perf_counter() - t0) * 1e3, 3)
+
+    rules_cfg = load_yaml(BASE_DIR / "configs" / "rules.yaml")
+    classifier = RuleClassifier(rules_cfg)
+    planner = ActionPlanner(load_yaml(BASE_DIR / "configs" / "playbooks.yaml"))
+    pipeline = Pipeline(classifier, retriever, planner, PipelineVersions(rules_cfg.get("version", ""), retriever.index_version))
+
+    result["workloads"] = {}
+    for wl_name, texts in workloads.items():
+        result["workloads"][wl_name] = {
+            "queries": len(texts),
+            "classify": time_calls(classifier.classify, texts),
+            "search": time_calls(retriever.search, texts),
+            "run": time_calls(pipeline.run, texts),
+        }
+    return result
+
+
+def flatten(results: Dict) -> Dict[str, float]:
+    """Flatten lower-is-better metrics into ``corpus/metric`` keys for the regression gate."""
+    flat = {}
+    for corpus, r in results["corpora"].items():
+        for key in ("build_s", "build_peak_rss_mb", "index_mb", "load_ms"):
+            flat[f"{corpus}/{key}"] = r[key]
+        for wl, stages in r["workloads"].items():
+            for stage in ("classify", "search", "run"):
+                for stat in ("p50_us", "p95_us", "mean_us"):
+                    flat[f"{corpus}/{wl}/{stage}/{stat}"] = stages[stage][stat]
+    return flat
+
+
+def compare(current: Dict[str, float], baseline: Dict[str, float], threshold: float) -> List[str]:
+    regressions = []
+    for key, base in sorted(baseline.items()):
+        cur = current.get(key)
+        if cur is None or base <= 0:
+            continue
+        if cur > base * (1 + threshold):
+            regressions.append(f"{key}: {base} -> {cur} (+{(cur / base - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Triage pipeline benchmark suite")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10000], help="Synthetic corpus sizes (e.g. 10000 100000 1000000)")
+    parser.add_argument("--max-queries", type=int, default=300, help="Queries replayed per workload")
+    parser.add_argument("--out", type=Path, default=None, help="Write results JSON here (default: stdout)")
+    parser.add_argument("--baseline", type=Path, default=None, help="Results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative slowdown before failing (default: 0.25)")
+    args = parser.parse_args()
+
+    workloads = {name: load_workload(name, args.max_queries) for name in WORKLOADS}
+    results = {
+        "env": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "corpora": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        results["corpora"]["cases"] = bench_corpus("cases", WORKLOADS["cases"][0], tmp, workloads)
+        for size in args.sizes:
+            cases_path = write_synthetic_cases(tmp / f"synthetic.{size}.jsonl", size)
+            results["corpora"][f"synthetic{size}"] = bench_corpus(f"synthetic{size}", cases_path, tmp, workloads)
+            cases_path.unlink()
+    results["metrics"] = flatten(results)
+
+    text = json.dumps(results, indent=2)
+    if args.out:
+        args.out.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        regressions = compare(results["metrics"], baseline.get("metrics", {}), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed beyond {args.threshold:.0%}:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Deterministic synthetic case corpora shaped like data/cases.cleaned.jsonl.
+
+Words are drawn from the unigram distribution of the real cases and document
+lengths from the real length distribution, so postings-list skew and IDF
+spread resemble production data at any corpus size.
+"""
+import hashlib
+import json
+import random
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterator
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+CASES_PATH = BASE_DIR / "data" / "cases.cleaned.jsonl"
+
+
+def _load_model(cases_path: Path):
+    words = Counter()
+    lengths = []
+    forums = Counter()
+    with cases_path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            case = json.loads(line)
+            tokens = case.get("analysis_text", "").split()
+            words.update(tokens)
+            lengths.append(len(tokens))
+            forums[case.get("forum", "")] += 1
+    vocab, weights = zip(*words.items())
+    return list(vocab), list(weights), lengths, list(forums)
+
+
+def synthesize_cases(n: int, seed: int = 13, cases_path: Path = CASES_PATH) -> Iterator[Dict]:
+    vocab, weights, lengths, forums = _load_model(cases_path)
+    rng = random.Random(seed)
+    for i in range(n):
+        length = rng.choice(lengths)
+        title_len = min(length, rng.randint(4, 10))
+        tokens = rng.choices(vocab, weights=weights, k=length)
+        title = " ".join(tokens[:title_len])
+        problem = " ".join(tokens[title_len:])
+        topic = f"https://example.org/forums/topic/synthetic-{i // 3}/"
+        url = topic if i % 3 == 0 else f"{topic}#post-{i}"
+        yield {
+            "case_id": hashlib.sha1(f"{seed}:{i}".encode("utf-8")).hexdigest()[:16],
+            "source": "synthetic",
+            "topic_url": url,
+            "title": title,
+            "forum": rng.choice(forums),
+            "problem": problem,
+            "solution": " ".join(rng.choices(vocab, weights=weights, k=30)),
+            "analysis_text": " ".join(tokens),
+        }
+
+
+def write_synthetic_cases(path: Path, n: int, seed: int = 13) -> Path:
+    with path.open("w", encoding="utf-8") as f:
+        for case in synthesize_cases(n, seed):
+            f.write(json.dumps(case, ensure_ascii=False) + "\n")
+    return path
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    out = Path(sys.argv[2]) if len(sys.argv) > 2 else Path(f"synthetic.{count}.jsonl")
+    write_synthetic_cases(out, count)
+    print(f"Wrote {count} synthetic cases to {out}")
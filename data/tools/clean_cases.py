@@ -1,10 +1,16 @@
-import json, re, random, collections
+import argparse, collections, hashlib, json, multiprocessing, os, re
+from itertools import islice
 from pathlib import Path
 
 IN_PATH = Path("cases.jsonl")
 OUT_CLEAN = Path("cases.cleaned.jsonl")
 OUT_STATS = Path("stats.json")
 OUT_SAMPLE = Path("samples_for_kimi.jsonl")
+# 增量运行的状态：各摘要、计数和抽样进度，与 OUT_CLEAN 的行数对应
+OUT_STATE = Path("stats.state.json")
+
+# 各摘要最多保留的计数器数；只要求 top10/top30，留足余量让排名稳定
+SKETCH_CAPACITY = {"forums": 200, "tokens": 2000, "bigrams": 4000}
 
 TIME_TITLE_RE = re.compile(r"^\d+\s+(?:day|days|hour|hours|minute|minutes|week|weeks|month|months)\b", re.I)
 
@@ -38,83 +44,242 @@ def tokenize(s: str):
 def bigrams(tokens):
     return [tokens[i] + " " + tokens[i+1] for i in range(len(tokens)-1)]
 
-def main(sample_n=200, seed=42):
-    random.seed(seed)
+def clean_record(obj):
+    """返回 (清洗后的记录, 标题是否为时间噪声)"""
+    title = normalize_text(obj.get("title", ""))
+    problem = normalize_text(obj.get("problem", ""))
+    solution = normalize_text(obj.get("solution", ""))
+    forum = clean_forum(obj.get("forum", ""))
+
+    time_title = is_time_title(title)
+    if time_title:
+        title = ""  # 丢弃噪声标题
+
+    analysis_text = normalize_text(" ".join([title, problem]).strip())
+
+    return {
+        "case_id": obj.get("case_id"),
+        "source": obj.get("source"),
+        "topic_url": obj.get("topic_url"),
+        "title": title,
+        "forum": forum,
+        "problem": problem,
+        "solution": solution,
+        "analysis_text": analysis_text,
+        "captured_at": obj.get("captured_at"),
+    }, time_title
+
+class SpaceSaving:
+    """Space-Saving 高频项摘要：最多 capacity 个计数器，内存与数据量无关。
+
+    counts[x] 是 x 出现次数的上界，最多多算 errors[x]；不在摘要里的项出现次数不超过 floor。
+    两个摘要可以合并（Agarwal et al., Mergeable Summaries），所以每个分块各自精确计数、
+    截断成摘要，再按顺序合并；增量运行时也把上次的摘要和新数据合并。
+    """
+
+    def __init__(self, capacity, counts=None, errors=None, floor=0):
+        self.capacity = capacity
+        self.counts = counts or {}
+        self.errors = errors or {}
+        self.floor = floor
+
+    @classmethod
+    def from_counter(cls, counter, capacity):
+        """一个分块的精确计数，截断到 capacity"""
+        return cls(capacity)._keep(dict(counter), {}, 0)
+
+    def _error(self, item):
+        return self.errors.get(item, 0) if item in self.counts else self.floor
+
+    def merge(self, other):
+        keys = self.counts.keys() | other.counts.keys()
+        counts = {k: self.counts.get(k, self.floor) + other.counts.get(k, other.floor) for k in keys}
+        errors = {k: self._error(k) + other._error(k) for k in keys}
+        errors = {k: e for k, e in errors.items() if e}
+        return SpaceSaving(self.capacity)._keep(counts, errors, self.floor + other.floor)
+
+    def _keep(self, counts, errors, floor):
+        if len(counts) > self.capacity:
+            ranked = sorted(counts, key=lambda k: (-counts[k], k))
+            # 被丢掉的项以后只能按 floor 估计，所以 floor 不能小于它们的计数
+            floor = max(floor, counts[ranked[self.capacity]])
+            for k in ranked[self.capacity:]:
+                del counts[k]
+                errors.pop(k, None)
+        self.counts, self.errors, self.floor = counts, errors, floor
+        return self
+
+    def most_common(self, n):
+        """计数最高的 n 项，同分按字典序"""
+        return [[k, self.counts[k]] for k in sorted(self.counts, key=lambda k: (-self.counts[k], k))[:n]]
+
+    def to_json(self):
+        return {"capacity": self.capacity, "floor": self.floor, "counts": self.counts, "errors": self.errors}
+
+    @classmethod
+    def from_json(cls, d):
+        return cls(d["capacity"], dict(d["counts"]), dict(d["errors"]), d["floor"])
+
+class Reservoir:
+    """蓄水池抽样（Algorithm R）：流式地等概率保留 k 条，可以跨运行续抽。
 
-    total = 0
-    time_titles = 0
-    forums = collections.Counter()
-    tok = collections.Counter()
-    bi = collections.Counter()
+    第 n 条的随机数由 (seed, n) 哈希得到，所以同样的输入顺序总得到同样的样本，和分几次运行无关。
+    """
 
-    rows = []
-    with IN_PATH.open("r", encoding="utf-8") as f:
+    def __init__(self, k, seed=42, items=None, seen=0):
+        self.k, self.seed, self.items, self.seen = k, seed, list(items or []), seen
+
+    def offer(self, load):
+        """load() 只在这条被选中时才调用，省掉没被抽中的记录的解码"""
+        self.seen += 1
+        if len(self.items) < self.k:
+            self.items.append(load())
+            return
+        digest = hashlib.blake2b(f"{self.seed}:{self.seen}".encode(), digest_size=8).digest()
+        j = int.from_bytes(digest, "little") % self.seen
+        if j < self.k:
+            self.items[j] = load()
+
+_KNOWN = frozenset()
+
+def _init_worker(known):
+    global _KNOWN
+    _KNOWN = known
+
+def clean_chunk(lines):
+    """清洗一个分块：返回 (新记录的 JSON 行, 时间标题数, forums/tokens/bigrams 的摘要)"""
+    out, time_titles = [], 0
+    forums, tok, bi = collections.Counter(), collections.Counter(), collections.Counter()
+    for line in lines:
+        obj = json.loads(line)
+        if obj.get("case_id") in _KNOWN:
+            continue
+        clean, time_title = clean_record(obj)
+        out.append(json.dumps(clean, ensure_ascii=False))
+        time_titles += time_title
+        if clean["forum"]:
+            forums[clean["forum"]] += 1
+        # 高频主题统计：先用 analysis_text
+        tokens = tokenize(clean["analysis_text"])
+        tok.update(tokens)
+        bi.update(bigrams(tokens))
+    return out, time_titles, {
+        "forums": SpaceSaving.from_counter(forums, SKETCH_CAPACITY["forums"]),
+        "tokens": SpaceSaving.from_counter(tok, SKETCH_CAPACITY["tokens"]),
+        "bigrams": SpaceSaving.from_counter(bi, SKETCH_CAPACITY["bigrams"]),
+    }
+
+def read_chunks(path, chunk_size):
+    with path.open("r", encoding="utf-8") as f:
+        lines = (line for line in f if line.strip())
+        while True:
+            chunk = list(islice(lines, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+def map_chunks(chunks, workers, known):
+    """按顺序返回各分块的结果；多进程时最多 2*workers 个分块在途，输入不会被一次读完"""
+    if workers <= 1:
+        _init_worker(known)
+        yield from map(clean_chunk, chunks)
+        return
+    methods = multiprocessing.get_all_start_methods()
+    ctx = multiprocessing.get_context("fork" if "fork" in methods else None)
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(known,)) as pool:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(pool.apply_async(clean_chunk, (chunk,)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+def load_state(out_clean, out_state, sample_n, seed):
+    """上次的状态，以及上次输出里已有的 case_id；状态和输出对不上（或参数变了）时返回 None，整份重洗"""
+    if not out_clean.exists() or not out_state.exists():
+        return None, frozenset()
+    state = json.loads(out_state.read_text(encoding="utf-8"))
+    if (state.get("sample_n"), state.get("seed")) != (sample_n, seed):
+        return None, frozenset()
+    known, rows = set(), 0
+    with out_clean.open("r", encoding="utf-8") as f:
         for line in f:
-            obj = json.loads(line)
-            total += 1
-
-            title = normalize_text(obj.get("title", ""))
-            problem = normalize_text(obj.get("problem", ""))
-            solution = normalize_text(obj.get("solution", ""))
-            forum = clean_forum(obj.get("forum", ""))
-
-            if is_time_title(title):
-                time_titles += 1
-                title = ""  # 丢弃噪声标题
-
-            analysis_text = normalize_text(" ".join([title, problem]).strip())
-
-            clean = {
-                "case_id": obj.get("case_id"),
-                "source": obj.get("source"),
-                "topic_url": obj.get("topic_url"),
-                "title": title,
-                "forum": forum,
-                "problem": problem,
-                "solution": solution,
-                "analysis_text": analysis_text,
-                "captured_at": obj.get("captured_at"),
-            }
-            rows.append(clean)
-
-            if forum:
-                forums[forum] += 1
-
-            # 高频主题统计：先用 analysis_text
-            tokens = tokenize(analysis_text)
-            for t in tokens:
-                tok[t] += 1
-            for b in bigrams(tokens):
-                bi[b] += 1
-
-    # 写清洗结果
-    with OUT_CLEAN.open("w", encoding="utf-8") as f:
-        for r in rows:
-            f.write(json.dumps(r, ensure_ascii=False) + "\n")
-
-    # 抽样给 Kimi：分层思路更好，但先随机也能起步
-    sample = random.sample(rows, k=min(sample_n, len(rows)))
-    with OUT_SAMPLE.open("w", encoding="utf-8") as f:
-        for r in sample:
-            # 给 Kimi 的字段尽量精简：便于阅读与归纳
-            f.write(json.dumps({
-                "case_id": r["case_id"],
-                "topic_url": r["topic_url"],
-                "text": r["analysis_text"],
-                "solution": r["solution"]
-            }, ensure_ascii=False) + "\n")
+            if line.strip():
+                known.add(json.loads(line).get("case_id"))
+                rows += 1
+    if rows != state.get("rows"):
+        return None, frozenset()
+    return state, frozenset(known)
+
+def write_atomic(path, text):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+def sample_row(line):
+    r = json.loads(line)
+    # 给 Kimi 的字段尽量精简：便于阅读与归纳
+    return {"case_id": r["case_id"], "topic_url": r["topic_url"], "text": r["analysis_text"], "solution": r["solution"]}
+
+def main(sample_n=200, seed=42, in_path=IN_PATH, out_clean=OUT_CLEAN, out_stats=OUT_STATS, out_sample=OUT_SAMPLE,
+         out_state=OUT_STATE, workers=1, chunk_size=2000, full=False, log=print):
+    """流式清洗 in_path：跳过上次输出里已有的 case_id，新记录按输入顺序追加到 out_clean。
 
+    stats.json 的 top 列表来自可合并的 Space-Saving 摘要（sketch_floor 是计数可能多算的上限），
+    samples 是整份输出上的蓄水池抽样；二者都随增量运行续算。返回本次的统计。
+    """
+    in_path, out_clean, out_stats, out_sample, out_state = map(Path, (in_path, out_clean, out_stats, out_sample, out_state))
+    state, known = (None, frozenset()) if full else load_state(out_clean, out_state, sample_n, seed)
+    if state is None:
+        state = {"rows": 0, "total": 0, "time_title_rows": 0, "sample_seen": 0, "sample_n": sample_n, "seed": seed}
+        sketches = {name: SpaceSaving(cap) for name, cap in SKETCH_CAPACITY.items()}
+        previous_sample = []
+    else:
+        sketches = {name: SpaceSaving.from_json(state["sketches"][name]) for name in SKETCH_CAPACITY}
+        previous_sample = [json.loads(line) for line in out_sample.open("r", encoding="utf-8")] if out_sample.exists() else []
+    reservoir = Reservoir(sample_n, seed, previous_sample, state["sample_seen"])
+
+    written = 0
+    # 写清洗结果：每个分块清洗完就追加，不在内存里攒整份数据
+    with out_clean.open("a" if known else "w", encoding="utf-8") as f:
+        for out, time_titles, chunk_sketches in map_chunks(read_chunks(in_path, chunk_size), workers, known):
+            for line in out:
+                f.write(line + "\n")
+                # 抽样给 Kimi：只在被抽中时才解码
+                reservoir.offer(lambda line=line: sample_row(line))
+            f.flush()
+            written += len(out)
+            state["time_title_rows"] += time_titles
+            for name, sketch in chunk_sketches.items():
+                sketches[name] = sketches[name].merge(sketch)
+
+    state.update(rows=state["rows"] + written, total=state["total"] + written, sample_seen=reservoir.seen,
+                 sketches={name: s.to_json() for name, s in sketches.items()})
+    write_atomic(out_sample, "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in reservoir.items))
     stats = {
-        "total": total,
-        "time_title_rows": time_titles,
-        "forums_top10": forums.most_common(10),
-        "tokens_top30": tok.most_common(30),
-        "bigrams_top30": bi.most_common(30),
+        "total": state["total"],
+        "time_title_rows": state["time_title_rows"],
+        "forums_top10": sketches["forums"].most_common(10),
+        "tokens_top30": sketches["tokens"].most_common(30),
+        "bigrams_top30": sketches["bigrams"].most_common(30),
+        "sketch_floor": {name: s.floor for name, s in sketches.items()},
     }
-    OUT_STATS.write_text(json.dumps(stats, ensure_ascii=False, indent=2), encoding="utf-8")
+    write_atomic(out_stats, json.dumps(stats, ensure_ascii=False, indent=2))
+    # 状态最后写：中途失败时行数对不上，下次会整份重洗
+    write_atomic(out_state, json.dumps(state, ensure_ascii=False))
 
-    print("Wrote:", OUT_CLEAN, OUT_STATS, OUT_SAMPLE)
+    log(f"Wrote: {out_clean} (+{written}, skipped {len(known)} known) {out_stats} {out_sample}")
+    return {"written": written, "known": len(known), "total": state["total"]}
 
 if __name__ == "__main__":
-    main()
-
+    parser = argparse.ArgumentParser(description="Clean cases.jsonl into cases.cleaned.jsonl, stats.json and a review sample")
+    parser.add_argument("--in", dest="in_path", default=str(IN_PATH), help="Raw crawl output (default: cases.jsonl)")
+    parser.add_argument("--out", default=str(OUT_CLEAN), help="Cleaned JSONL; cases already in it are skipped")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Cleaning processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="Records per parallel chunk (default: 2000)")
+    parser.add_argument("--sample", type=int, default=200, help="Review sample size (default: 200)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--full", action="store_true", help="Re-clean everything instead of appending new cases")
+    args = parser.parse_args()
+    main(args.sample, args.seed, args.in_path, args.out, workers=args.workers, chunk_size=args.chunk_size, full=args.full)
@@ -1,29 +1,18 @@
-import re, json, time, hashlib
+import argparse, asyncio, gzip, hashlib, http.client, json, os, re, threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-
-import requests
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
 
 BASE = "https://wpml.org/forums/available-solutions/"
 HEADERS = {
     "User-Agent": "triage-research-bot/0.1 (contact: you@example.com)",
     "Accept-Language": "en-US,en;q=0.9",
+    "Accept-Encoding": "gzip",
 }
-
-SESSION = requests.Session()
-SESSION.headers.update(HEADERS)
-
-def fetch(url, retries=3, timeout=25):
-    last = None
-    for i in range(retries):
-        try:
-            r = SESSION.get(url, timeout=timeout)
-            r.raise_for_status()
-            return r.text
-        except Exception as e:
-            last = e
-            time.sleep(2 ** i)
-    raise last
+REDIRECTS = {301, 302, 303, 307, 308}
+MAX_REDIRECTS = 5
 
 def normalize_ws(s: str) -> str:
     return re.sub(r"\s+", " ", s).strip()
@@ -40,57 +29,145 @@ def strip_boilerplate(solution: str) -> str:
         out = re.sub(p, "", out, flags=re.IGNORECASE)
     return normalize_ws(out)
 
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr"}
+SKIP_TEXT_TAGS = {"script", "style"}
+PROBLEM, SOLUTION = 1, 2
+MAX_CLIMB = 5  # 从链接最多向上找 5 层容器，和旧版 range(6) 的行为一致
+
+class ListingParser(HTMLParser):
+    """单遍解析列表页。
+
+    所有去掉首尾空白的文本节点依次放进 ``texts``，每个元素对应其中一段
+    ``[start, end)``；元素关闭时把 Problem:/Solution: 标记合并给父元素。
+    topic 链接在祖先依次关闭时找容器：最近的（至多向上 5 层）同时含两个
+    标记的祖先，找不到就用第 6 层祖先。不再对每个链接 select_one 加逐层
+    get_text。
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.texts = []
+        # 每个打开的元素：[tag, 文本起点, 标记, 链接]；栈底是整个文档
+        self.stack = [["[document]", 0, 0, None]]
+        self.links = []
+        self.pending = []
+        self.skip = 0
+        # main / #primary / body 各自第一次出现的深度和是否仍打开
+        self.scopes = {}
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            return
+        attrs = dict(attrs)
+        depth = len(self.stack)
+        link = None
+        href = attrs.get("href") if tag == "a" else None
+        if href and "/forums/topic/" in href:
+            open_scopes = {name for name, (_, is_open) in self.scopes.items() if is_open}
+            link = {"href": href, "depth": depth, "next": depth, "start": len(self.texts), "end": None,
+                    "container": None, "scopes": open_scopes}
+            self.links.append(link)
+            self.pending.append(link)
+        for name, hit in (("main", tag == "main"), ("primary", attrs.get("id") == "primary"), ("body", tag == "body")):
+            if hit and name not in self.scopes:
+                self.scopes[name] = (depth, True)
+        if tag in SKIP_TEXT_TAGS:
+            self.skip += 1
+        self.stack.append([tag, len(self.texts), 0, link])
+
+    def handle_startendtag(self, tag, attrs):
+        if tag not in VOID_TAGS:
+            self.handle_starttag(tag, attrs)
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        # 和 BeautifulSoup 一样：弹到最近的同名元素，找不到就忽略
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i][0] == tag:
+                while len(self.stack) > i:
+                    self._close()
+                return
+
+    def handle_data(self, data):
+        if self.skip:
+            return
+        s = data.strip()
+        if not s:
+            return
+        self.texts.append(s)
+        if "Problem:" in s:
+            self.stack[-1][2] |= PROBLEM
+        if "Solution:" in s:
+            self.stack[-1][2] |= SOLUTION
+
+    def _close(self):
+        depth = len(self.stack) - 1
+        tag, start, markers, link = self.stack.pop()
+        end = len(self.texts)
+        if self.stack:
+            self.stack[-1][2] |= markers
+        if tag in SKIP_TEXT_TAGS:
+            self.skip -= 1
+        if link is not None:
+            link["end"] = end
+        for name, (scope_depth, is_open) in list(self.scopes.items()):
+            if is_open and scope_depth == depth:
+                self.scopes[name] = (scope_depth, False)
+        still = []
+        for l in self.pending:
+            if l["next"] != depth:
+                still.append(l)
+            elif markers == PROBLEM | SOLUTION or l["depth"] - depth > MAX_CLIMB:
+                l["container"] = (start, end)
+            else:
+                l["next"] = depth - 1
+                still.append(l)
+        self.pending = still
+
+    def close(self):
+        super().close()
+        while self.stack:
+            self._close()
+
+    def topic_links(self):
+        """每个 href 在主内容区（main，否则 #primary，否则 body）里的第一个链接。"""
+        scope = next((name for name in ("main", "primary", "body") if name in self.scopes), None)
+        seen = set()
+        out = []
+        for link in self.links:
+            if scope is not None and scope not in link["scopes"]:
+                continue
+            if link["href"] in seen:
+                continue
+            seen.add(link["href"])
+            out.append(link)
+        return out
+
+    def text(self, start, end, sep):
+        return sep.join(self.texts[start:end])
+
 def parse_page(html: str):
-    soup = BeautifulSoup(html, "html.parser")
-
-    # 入口：经验上 WPML 的列表正文在页面主内容区，且 topic 链接包含 /forums/topic/
-    main = soup.find("main") or soup.find(id="primary") or soup.body
-
-    topic_links = main.select('a[href*="/forums/topic/"]')
-    # 去重，保持顺序
-    seen = set()
-    topic_urls = []
-    for a in topic_links:
-        href = a.get("href")
-        if not href:
-            continue
-        if href in seen:
-            continue
-        seen.add(href)
-        topic_urls.append(href)
+    parser = ListingParser()
+    parser.feed(html)
+    parser.close()
 
     records = []
-    for url in topic_urls:
-        # 在列表页里，每个 topic 通常对应一个“块”，其中会出现 "Problem:" / "Solution:"
-        # 这里用“从链接向上找容器”的方式更抗模板变化
-        a = main.select_one(f'a[href="{url}"]')
-        if not a:
-            continue
-        container = a
-        for _ in range(6):
-            if not container:
-                break
-            text = container.get_text(" ", strip=True)
-            if "Problem:" in text and "Solution:" in text:
-                break
-            container = container.parent
-
-        if not container:
+    for link in parser.topic_links():
+        if link["container"] is None:
             continue
-
-        block_text = normalize_ws(container.get_text("\n", strip=True))
+        url = link["href"]
+        block_text = normalize_ws(parser.text(*link["container"], "\n"))
         # 解析 Problem/Solution（用文本分隔符，避免过度依赖 class）
         problem = ""
         solution = ""
         if "Problem:" in block_text and "Solution:" in block_text:
-            # 粗切
             after_problem = block_text.split("Problem:", 1)[1]
             if "Solution:" in after_problem:
                 problem_part, solution_part = after_problem.split("Solution:", 1)
                 problem = normalize_ws(problem_part)
                 solution = strip_boilerplate(solution_part)
 
-        title = normalize_ws(a.get_text(" ", strip=True))
+        title = normalize_ws(parser.text(link["start"], link["end"], " "))
         forum = ""
         m = re.search(r"Started by:.*?in:\s*(.+)", block_text)
         if m:
@@ -109,20 +186,238 @@ def parse_page(html: str):
         })
     return records
 
-def crawl(pages=20, sleep_s=1.2, out_path="cases.jsonl"):
-    with open(out_path, "w", encoding="utf-8") as f:
-        for p in range(1, pages + 1):
-            url = BASE if p == 1 else f"{BASE}page/{p}/"
-            html = fetch(url)
-            recs = parse_page(html)
+class PageCache:
+    """磁盘页面缓存：<sha1(url)>.html 存正文，.json 存 ETag/Last-Modified，供条件请求复用。"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return self.root / f"{key}.html", self.root / f"{key}.json"
+
+    def get(self, url):
+        body_path, meta_path = self._paths(url)
+        if not (body_path.exists() and meta_path.exists()):
+            return None
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        meta["body"] = body_path.read_text(encoding="utf-8")
+        return meta
 
-            for r in recs:
-                if r["problem"] and r["solution"]:
+    def put(self, url, body, etag=None, last_modified=None):
+        body_path, meta_path = self._paths(url)
+        meta = {"url": url, "etag": etag, "last_modified": last_modified,
+                "fetched_at": datetime.now(timezone.utc).isoformat()}
+        # 先写正文再写 meta：只有两者都在才算命中
+        for path, text in ((body_path, body), (meta_path, json.dumps(meta, ensure_ascii=False))):
+            tmp = path.with_name(path.name + ".tmp")
+            tmp.write_text(text, encoding="utf-8")
+            os.replace(tmp, path)
+
+class ConnectionPool:
+    """按 (scheme, host) 复用 keep-alive 连接；线程安全，供执行器里的阻塞请求使用。"""
+
+    def __init__(self, timeout=25):
+        self.timeout = timeout
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    def request(self, url, headers):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        with self.lock:
+            conns = self.idle.get(key)
+            conn = conns.pop() if conns else None
+        if conn is None:
+            cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+            conn = cls(parts.netloc, timeout=self.timeout)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        try:
+            conn.request("GET", path, headers=headers)
+            resp = conn.getresponse()
+            body = resp.read()
+        except Exception:
+            conn.close()
+            raise
+        if resp.will_close:
+            conn.close()
+        else:
+            with self.lock:
+                self.idle.setdefault(key, []).append(conn)
+        return resp.status, {k.lower(): v for k, v in resp.getheaders()}, body
+
+    def close(self):
+        with self.lock:
+            for conns in self.idle.values():
+                for conn in conns:
+                    conn.close()
+            self.idle.clear()
+
+class RateLimiter:
+    """同一 host 两次请求的开始时间至少相隔 interval 秒。"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.next_slot = {}
+
+    async def wait(self, host):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self.next_slot.get(host, now))
+        self.next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class HTTPStatusError(IOError):
+    pass
+
+class PermanentHTTPError(HTTPStatusError):
+    """4xx（429 除外）或重定向过多：重试也不会变，fetch 直接抛出。"""
+
+def decode_body(body, headers):
+    if headers.get("content-encoding", "").lower() == "gzip":
+        body = gzip.decompress(body)
+    m = re.search(r"charset=([\w-]+)", headers.get("content-type", ""))
+    return body.decode(m.group(1) if m else "utf-8", errors="replace")
+
+async def fetch(url, pool, limiter, executor, cache=None, retries=3, backoff=1.0):
+    """返回 (html, 是否来自缓存)。有缓存时带 If-None-Match/If-Modified-Since，304 直接用缓存。
+
+    跟随 3xx 的 Location（至多 MAX_REDIRECTS 跳，每跳都受限速）；缓存仍按原 url 记。
+    连接错误、5xx 和 429 会退避重试，其余 4xx 抛 PermanentHTTPError 不重试。
+    """
+    loop = asyncio.get_running_loop()
+    cached = cache.get(url) if cache is not None else None
+    headers = dict(HEADERS)
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+    last = None
+    for i in range(retries):
+        try:
+            target = url
+            for _ in range(MAX_REDIRECTS + 1):
+                await limiter.wait(urlsplit(target).netloc)
+                status, resp_headers, body = await loop.run_in_executor(executor, pool.request, target, headers)
+                if status not in REDIRECTS or "location" not in resp_headers:
+                    break
+                target = urljoin(target, resp_headers["location"])
+            else:
+                raise PermanentHTTPError(f"more than {MAX_REDIRECTS} redirects for {url}")
+            if status == 304 and cached:
+                return cached["body"], True
+            if 400 <= status < 500 and status != 429:
+                raise PermanentHTTPError(f"HTTP {status} for {target}")
+            if status >= 300:
+                raise HTTPStatusError(f"HTTP {status} for {target}")
+            html = decode_body(body, resp_headers)
+            if cache is not None:
+                cache.put(url, html, resp_headers.get("etag"), resp_headers.get("last-modified"))
+            return html, False
+        except PermanentHTTPError:
+            raise
+        except (OSError, http.client.HTTPException) as e:
+            last = e
+            if i + 1 < retries:
+                await asyncio.sleep(backoff * 2 ** i)
+    raise last
+
+def page_url(base, p):
+    return base if p == 1 else f"{base}page/{p}/"
+
+def load_case_ids(path):
+    path = Path(path)
+    if not path.exists():
+        return set()
+    ids = set()
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                ids.add(json.loads(line).get("case_id"))
+    return ids
+
+async def crawl_async(pages=50, out_path="cases.jsonl", base=BASE, concurrency=4, delay=1.0, cache_dir=None,
+                      checkpoint_path=None, resume=True, retries=3, backoff=1.0, timeout=25, log=print):
+    """抓取列表页 1..pages，把新的 case 追加到 out_path。
+
+    最多 concurrency 个页面同时在途（同一 host 受 delay 限速），结果按页序写出。
+    每写完一页就记录 checkpoint，中断后从下一页继续；一页里全是已抓过的
+    case_id 时提前停止（列表按时间倒序，后面都是旧的）。正常结束后删除 checkpoint。
+    """
+    out_path = Path(out_path)
+    checkpoint = Path(checkpoint_path) if checkpoint_path else out_path.with_name(out_path.name + ".checkpoint")
+    known = load_case_ids(out_path)
+    start = 1
+    if resume and checkpoint.exists():
+        state = json.loads(checkpoint.read_text(encoding="utf-8"))
+        if state.get("base") == base:
+            start = state.get("next_page", 1)
+
+    pool = ConnectionPool(timeout)
+    limiter = RateLimiter(delay)
+    cache = PageCache(cache_dir) if cache_dir else None
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    loop = asyncio.get_running_loop()
+
+    async def load(p):
+        html, cached = await fetch(page_url(base, p), pool, limiter, executor, cache, retries, backoff)
+        return await loop.run_in_executor(executor, parse_page, html), cached
+
+    stats = {"start_page": start, "pages": 0, "written": 0, "not_modified": 0, "stopped_at": None}
+    tasks = {}
+    scheduled = start
+    try:
+        with out_path.open("a", encoding="utf-8") as f:
+            for p in range(start, pages + 1):
+                while scheduled <= pages and len(tasks) < concurrency:
+                    tasks[scheduled] = asyncio.ensure_future(load(scheduled))
+                    scheduled += 1
+                recs, cached = await tasks.pop(p)
+                complete = [r for r in recs if r["problem"] and r["solution"]]
+                fresh = [r for r in complete if r["case_id"] not in known]
+                for r in fresh:
                     f.write(json.dumps(r, ensure_ascii=False) + "\n")
+                    known.add(r["case_id"])
+                stats["written"] += len(fresh)
+                f.flush()
+                checkpoint.write_text(json.dumps({"base": base, "next_page": p + 1}), encoding="utf-8")
+                stats["pages"] += 1
+                stats["not_modified"] += cached
+                log(f"page {p} -> {len(recs)} extracted, {len(fresh)} new" + (" (not modified)" if cached else ""))
+                if complete and not fresh:
+                    stats["stopped_at"] = p
+                    break
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        executor.shutdown(wait=True)
+        pool.close()
+    if checkpoint.exists():
+        checkpoint.unlink()
+    return stats
 
-            time.sleep(sleep_s)
-            print(f"page {p} -> {len(recs)} extracted")
+def crawl(pages=50, out_path="cases.jsonl", **kwargs):
+    return asyncio.run(crawl_async(pages, out_path, **kwargs))
 
-if __name__ == "__main__":
-    crawl(pages=50)  # 先抓 50 页（约 750 条）即可开始做频次归纳
+def main():
+    parser = argparse.ArgumentParser(description="Crawl WPML available-solutions listing pages into cases.jsonl")
+    parser.add_argument("--pages", type=int, default=50, help="Listing pages to crawl (default: 50, about 750 cases)")
+    parser.add_argument("--out", default="cases.jsonl", help="JSONL file new cases are appended to")
+    parser.add_argument("--base", default=BASE, help="Listing URL; page N is <base>page/N/")
+    parser.add_argument("--concurrency", type=int, default=4, help="Pages in flight at once (default: 4)")
+    parser.add_argument("--delay", type=float, default=1.0, help="Seconds between request starts per host (default: 1.0)")
+    parser.add_argument("--cache-dir", default=".page_cache", help="On-disk page cache for conditional requests ('' disables)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start again from page 1")
+    args = parser.parse_args()
+    stats = crawl(args.pages, args.out, base=args.base, concurrency=args.concurrency, delay=args.delay,
+                  cache_dir=args.cache_dir or None, resume=not args.restart)
+    print(f"{stats['written']} new cases from {stats['pages']} pages"
+          + (f", stopped at page {stats['stopped_at']}" if stats["stopped_at"] else ""))
 
+if __name__ == "__main__":
+    main()
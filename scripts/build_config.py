@@ -0,0 +1,31 @@
+import argparse
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR / "src"))
+
+from triage.config_bundle import compile_config, write_bundle  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate configs/ and compile them into one config bundle")
+    parser.add_argument("--configs", type=Path, default=BASE_DIR / "configs", help="Directory with taxonomy/rules/playbooks")
+    parser.add_argument("--out", type=Path, default=BASE_DIR / "artifacts" / "config.bundle", help="Output path for the bundle")
+    parser.add_argument("--check", action="store_true", help="Only validate; do not write the bundle")
+    args = parser.parse_args()
+
+    try:
+        bundle = compile_config(args.configs)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    if args.check:
+        print(f"Configs in {args.configs} are valid ({bundle.version})")
+        return
+    write_bundle(bundle, args.out)
+    print(f"Config bundle {bundle.version} written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,43 @@
 import argparse
 import json
 import math
+import os
 import pickle
 import sys
-from collections import Counter
+import time
+from array import array
+from collections import Counter, OrderedDict, deque
+from functools import partial
+from itertools import islice
 from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 sys.path.append(str(BASE_DIR / "src"))
 
-from triage.rule_classifier import normalize_text  # noqa: E402
+from triage.analyzer import DEFAULT_ANALYZER, Analyzer  # noqa: E402
+from triage.config_bundle import load_config  # noqa: E402
+from triage.dedup import DuplicateFinder, MinHasher, collapse_cases, fingerprint, pack_fingerprint, unpack_fingerprint  # noqa: E402
+from triage.index_store import (  # noqa: E402
+    CompactIndex,
+    ForwardIndex,
+    IndexWriter,
+    BM25_DEFAULTS,
+    Bm25Weighting,
+    MetaWriter,
+    PARTITION_FIELDS,
+    bm25_idf,
+    invert_vectors,
+    meta_path_for,
+    pack_strings,
+    partition_typecode,
+    write_index,
+    write_lsh_sections,
+)
+from triage.knn import KNN_BACKENDS, KNN_DEFAULTS, NO_NEIGHBOR, GraphBuilder, case_id_order, resolve_backend  # noqa: E402
+from triage.lsh import LSH_DEFAULTS, SimHasher  # noqa: E402
+from triage.parallel import imap_bounded, pool_context  # noqa: E402
+from triage.rule_classifier import RuleClassifier  # noqa: E402
 
 
 def load_jsonl(path: Path):
@@ -21,23 +49,758 @@ def load_jsonl(path: Path):
             yield json.loads(line)
 
 
-def build_index(cases_path: Path, out_path: Path):
+def case_tokens(case, analyzer: Analyzer = DEFAULT_ANALYZER) -> List[str]:
+    return analyzer.tokens(case.get("analysis_text", ""))
+
+
+def case_title_len(case, tokens: List[str], analyzer: Analyzer = DEFAULT_ANALYZER) -> int:
+    """``analysis_text`` is the title followed by the problem; the title's share of ``tokens``."""
+    return min(len(analyzer.tokens(case.get("title", ""))), len(tokens))
+
+
+def index_version_for(num_live: int, analyzer: Analyzer, revision: int = 0) -> str:
+    """``tfidf/<analyzer signature>@cases.cleaned.<live docs>[.r<revision>]``."""
+    name = f"tfidf/{analyzer.signature}" if analyzer.signature else "tfidf"
+    return f"{name}@cases.cleaned.{num_live}" + (f".r{revision}" if revision else "")
+
+
+def case_partition(case, classifier: RuleClassifier) -> Tuple[str, str]:
+    """The (category, forum) partition key: the rules' category for the case's ``analysis_text``, and its forum."""
+    return classifier.triage(case.get("analysis_text", "")).category, case.get("forum") or ""
+
+
+def default_classifier() -> RuleClassifier:
+    """The classifier the pipeline uses, from ``configs/``."""
+    return load_config(BASE_DIR / "configs").classifier
+
+
+def case_meta(case) -> Dict:
+    return {
+        "case_id": case.get("case_id"),
+        "source": case.get("source"),
+        "topic_url": case.get("topic_url"),
+        "title": case.get("title", ""),
+        "forum": case.get("forum", ""),
+        "problem": case.get("problem", ""),
+        "solution": case.get("solution", ""),
+        "source_urls": case.get("source_urls") or ([case["topic_url"]] if case.get("topic_url") else []),
+    }
+
+
+class Progress:
+    """Report docs/sec for a build pass to stderr at most once per second."""
+
+    def __init__(self, label: str, enabled: bool):
+        self.label = label
+        self.enabled = enabled
+        self.done = 0
+        self.start = self.last = time.perf_counter()
+
+    def update(self, n: int) -> None:
+        self.done += n
+        now = time.perf_counter()
+        if self.enabled and now - self.last >= 1.0:
+            self.last = now
+            print(f"{self.label}: {self.done} docs, {self.done / (now - self.start):.0f} docs/sec", file=sys.stderr)
+
+    def finish(self) -> None:
+        if self.enabled:
+            elapsed = time.perf_counter() - self.start
+            rate = self.done / elapsed if elapsed > 0 else 0.0
+            print(f"{self.label}: {self.done} docs in {elapsed:.2f}s, {rate:.0f} docs/sec", file=sys.stderr)
+
+
+def read_case_lines(path: Path) -> Iterator[str]:
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def representative_lines(path: Path, representatives: Dict[int, List[str]]) -> Iterator[str]:
+    """Yield only the cases that represent a duplicate group, with their ``source_urls``."""
+    for doc_id, line in enumerate(read_case_lines(path)):
+        urls = representatives.get(doc_id)
+        if urls is None:
+            continue
+        if len(urls) > 1:
+            line = json.dumps(dict(json.loads(line), source_urls=urls), ensure_ascii=False)
+        yield line
+
+
+class PartitionSpill:
+    """Spill case lines into one temp file per partition key, to be read back grouped.
+
+    Reading the buckets in key order numbers documents grouped by partition
+    while every later pass stays a sequential stream. Buckets hold the lines
+    as given, so they take as much disk as the cases indexed. At most
+    ``max_open`` bucket files are open at once; the least recently written is
+    closed and reopened for appending when its key comes up again.
+    """
+
+    def __init__(self, out_path: Path, max_open: int = 256):
+        self._prefix = str(out_path) + ".part"
+        self._paths: Dict[Tuple[str, str], Path] = {}
+        self._open: "OrderedDict[Tuple[str, str], object]" = OrderedDict()
+        self.max_open = max_open
+        self.counts: Counter = Counter()
+
+    def _file(self, key: Tuple[str, str]):
+        f = self._open.get(key)
+        if f is not None:
+            self._open.move_to_end(key)
+            return f
+        if len(self._open) >= self.max_open:
+            self._open.popitem(last=False)[1].close()
+        path = self._paths.get(key)
+        if path is None:
+            path = self._paths[key] = Path(f"{self._prefix}{len(self._paths)}.tmp")
+            f = path.open("w", encoding="utf-8")
+        else:
+            f = path.open("a", encoding="utf-8")
+        self._open[key] = f
+        return f
+
+    def add(self, lines: List[str], keys: List[Tuple[str, str]]) -> None:
+        for line, key in zip(lines, keys):
+            self._file(key).write(line + "\n")
+            self.counts[key] += 1
+
+    def keys(self) -> List[Tuple[str, str]]:
+        return sorted(self._paths)
+
+    def lines(self) -> Iterator[str]:
+        for f in self._open.values():
+            f.close()
+        self._open.clear()
+        for key in self.keys():
+            yield from read_case_lines(self._paths[key])
+
+    def close(self) -> None:
+        for f in self._open.values():
+            f.close()
+        self._open.clear()
+        for path in self._paths.values():
+            path.unlink()
+        self._paths = {}
+
+
+def chunked(items: Iterable, size: int) -> Iterator[List]:
+    items = iter(items)
+    while True:
+        chunk = list(islice(items, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_cases(lines: List[str]) -> Iterator[Dict]:
+    for line in lines:
+        yield json.loads(line)
+
+
+_HASHER = MinHasher()
+
+
+def _fingerprint_chunk(lines: List[str]) -> List[Tuple]:
+    return [fingerprint(case, _HASHER) for case in iter_cases(lines)]
+
+
+# The classifier assigning partitions in the DF pass; set like the weighting globals.
+_CLASSIFIER: Optional[RuleClassifier] = None
+
+
+def _init_partitions(classifier: Optional[RuleClassifier]) -> None:
+    global _CLASSIFIER
+    _CLASSIFIER = classifier
+
+
+def _df_chunk(analyzer: Analyzer, lines: List[str]) -> Tuple[Counter, int, int, int, List[Tuple[str, str]]]:
+    df = Counter()
+    n = title_tokens = all_tokens = 0
+    keys = []
+    for case in iter_cases(lines):
+        tokens = case_tokens(case, analyzer)
+        df.update(set(tokens))
+        n += 1
+        title_tokens += case_title_len(case, tokens, analyzer)
+        all_tokens += len(tokens)
+        if _CLASSIFIER is not None:
+            keys.append(case_partition(case, _CLASSIFIER))
+    return df, n, title_tokens, all_tokens, keys
+
+
+# Term ids, IDFs, BM25F weighting, LSH hasher and whether to fingerprint cases
+# for dedup in the weighting pass; set by the pool initializer (or directly when
+# building in-process).
+_TERM_IDS: Dict[str, int] = {}
+_IDF: Sequence[float] = ()
+_BM25_IDF: Sequence[float] = ()
+_BM25: Optional[Bm25Weighting] = None
+_LSH: Optional[SimHasher] = None
+_DEDUP = False
+
+
+def _init_weighting(
+    term_ids: Dict[str, int],
+    idf: Sequence[float],
+    bm25_idfs: Sequence[float],
+    bm25,
+    lsh: Optional[SimHasher] = None,
+    dedup: bool = False,
+) -> None:
+    global _TERM_IDS, _IDF, _BM25_IDF, _BM25, _LSH, _DEDUP
+    _TERM_IDS, _IDF, _BM25_IDF, _BM25, _LSH, _DEDUP = term_ids, idf, bm25_idfs, bm25, lsh, dedup
+
+
+def packed_fingerprint(case: Dict) -> List[int]:
+    """The ``dedup_fingerprints`` row of an indexed case (see ``pack_fingerprint``)."""
+    digest, signature, _, _ = fingerprint(case, _HASHER)
+    return pack_fingerprint(digest, signature, _HASHER.num_perm)
+
+
+def _weight_chunk(analyzer: Analyzer, lines: List[str]) -> List[Tuple]:
+    out = []
+    for case in iter_cases(lines):
+        tokens = case_tokens(case, analyzer)
+        title_len = case_title_len(case, tokens, analyzer)
+        title_counts = Counter(tokens[:title_len])
+        term_ids = array("I")
+        counts = array("I")
+        field_counts = array("I")
+        weights = array("d")
+        tf = Counter(tokens)
+        # Counter keeps first-occurrence order, matching ForwardIndex/write_index.
+        for term, count in tf.items():
+            term_id = _TERM_IDS[term]
+            term_ids.append(term_id)
+            counts.append(count)
+            field_counts.append(title_counts.get(term, 0))
+            weights.append((count / len(tokens)) * _IDF[term_id])
+        norm = math.sqrt(sum(v * v for v in weights)) or 1.0
+        impacts = _BM25.impacts([_BM25_IDF[t] for t in term_ids], counts, field_counts, len(tokens), title_len)
+        lsh_keys = _LSH.keys(tf, weights) if _LSH is not None else ()
+        meta = json.dumps(case_meta(case), ensure_ascii=False).encode("utf-8")
+        packed = packed_fingerprint(case) if _DEDUP else ()
+        out.append(
+            (term_ids, counts, field_counts, len(tokens), title_len, weights, impacts, norm, lsh_keys, case.get("case_id") or "", meta, packed)
+        )
+    return out
+
+
+def map_chunks(fn, chunks: Iterable, workers: int, initializer=None, initargs=()) -> Iterator:
+    """Apply ``fn`` to each chunk, in order, in-process or over a bounded process pool."""
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        yield from map(fn, chunks)
+        return
+    with pool_context().Pool(workers, initializer=initializer, initargs=initargs) as pool:
+        yield from imap_bounded(pool, fn, chunks, 2 * workers)
+
+
+# The open index and graph builder for the related-cases pass; set by the pool
+# initializer (or directly when building in-process).
+_GRAPH: Optional[Tuple[CompactIndex, GraphBuilder]] = None
+
+
+def _init_graph(index_path: Optional[Path], k: int = KNN_DEFAULTS["k"], backend: str = "auto") -> None:
+    global _GRAPH
+    if _GRAPH is not None:
+        _GRAPH[0].close()
+    _GRAPH = None
+    if index_path is not None:
+        index = CompactIndex(index_path)
+        _GRAPH = (index, GraphBuilder(index, k, backend))
+
+
+def _graph_block(span: Tuple[int, int]) -> Tuple[array, array]:
+    return _GRAPH[1].block(*span)
+
+
+def add_related_graph(
+    index_path: Path,
+    k: int = KNN_DEFAULTS["k"],
+    workers: int = 1,
+    block_size: int = 256,
+    backend: str = "auto",
+    progress: bool = False,
+) -> None:
+    """Compute every case's ``k`` most similar cases and add the graph to the index at ``index_path``.
+
+    Doc ids are split into blocks of ``block_size``, each scored by
+    ``GraphBuilder`` (exact TF-IDF cosine top-k, see ``triage.knn``) in one of
+    ``workers`` processes that each map the index. Memory is the graph itself
+    (``k`` entries per case) plus, per worker, one block's scores and the
+    normalized postings, never an N x N similarity matrix.
+    """
+    backend = resolve_backend(backend)
+    index = CompactIndex(index_path)
+    num_docs = index.num_docs
+    order = case_id_order(index.case_ids())
+    index.close()
+    knn_docs, knn_scores = array("I"), array("d")
+    bar = Progress("related pass", progress)
+    spans = ((lo, min(lo + block_size, num_docs)) for lo in range(0, num_docs, block_size))
+    for docs, scores in map_chunks(_graph_block, spans, workers, _init_graph, (index_path, k, backend)):
+        knn_docs.extend(docs)
+        knn_scores.extend(scores)
+        bar.update(len(docs) // k)
+    bar.finish()
+    _init_graph(None)
+    write_related_graph(index_path, k, knn_docs, knn_scores, order)
+
+
+def write_related_graph(index_path: Path, k: int, knn_docs: array, knn_scores: array, order: array) -> None:
+    writer, info = IndexWriter.reopen(index_path)
+    writer.add_array("knn_docs", "I", knn_docs)
+    writer.add_array("knn_scores", "d", knn_scores)
+    writer.add_array("case_id_order", "I", order)
+    writer.close(dict(info, knn={"k": k}))
+
+
+def remapped_graph(index: CompactIndex, kept: Sequence[int]) -> Tuple[array, array]:
+    """``index``'s graph rows for the documents ``kept`` (ascending old doc ids), renumbered."""
+    k = index.info["knn"]["k"]
+    new_ids = {old: new for new, old in enumerate(kept)}
+    knn_docs, knn_scores = array("I"), array("d")
+    for old in kept:
+        row = index.knn_docs[old * k : (old + 1) * k]
+        knn_docs.extend(d if d == NO_NEIGHBOR else new_ids[d] for d in row)
+        knn_scores.extend(index.knn_scores[old * k : (old + 1) * k])
+    return knn_docs, knn_scores
+
+
+def build_index(
+    cases_path: Path,
+    out_path: Path,
+    fmt: str = "compact",
+    workers: int = 1,
+    chunk_size: int = 1000,
+    progress: bool = False,
+    dedup: bool = True,
+    dedup_threshold: float = 0.8,
+    bm25: Optional[Dict] = None,
+    analyzer: Analyzer = DEFAULT_ANALYZER,
+    classifier: Optional[RuleClassifier] = None,
+    lsh: Optional[SimHasher] = None,
+    related: Optional[int] = None,
+    related_backend: str = "auto",
+):
+    """Build the index in two streaming passes over ``cases_path``.
+
+    With ``dedup``, a first pass fingerprints every case (content hash plus
+    MinHash signature of the problem text) and only one representative per
+    group of exact or near-duplicates (estimated Jaccard >= ``dedup_threshold``)
+    is indexed, carrying the group's ``source_urls``; pass 2 stores each
+    indexed case's digest and signature (``dedup_fingerprints``) for
+    ``update_index`` to match appended cases against.
+    Pass 1 merges per-chunk document-frequency ``Counter``s; pass 2 computes
+    weights and norms per document and writes forward sections sequentially and
+    postings (TF-IDF weights and BM25F impacts, see ``Bm25Weighting``; ``bm25``
+    overrides its parameters) by counting-sort scatter into file-backed,
+    memory-mapped sections.
+    Cases are tokenized with ``analyzer``, whose configuration is recorded in
+    the footer and ``index_version`` so the retriever analyzes queries the same
+    way. Tokenization in both passes is sharded over ``workers`` processes. The
+    passes themselves hold state that grows with the vocabulary (DF table, term
+    ids, per-term cursors), not with the number of cases; per-document sections
+    go straight to the memory-mapped output. What does grow with the number of
+    cases: with ``dedup``, the ``DuplicateFinder`` keeps each distinct case's
+    digest, MinHash signature and band entries and every case's URL (about
+    4 KB per case on synthetic corpora) until the representatives are chosen,
+    and the representatives (doc id -> source URLs) stay in memory through both
+    passes; the LSH tables and the related-cases graph below.
+    With a ``classifier`` the index is partitioned: pass 1 also classifies each
+    case and spills it to a per-(category, forum) bucket (see
+    ``PartitionSpill``), and pass 2 reads the buckets in key order.
+    With ``lsh`` pass 2 also computes each document's SimHash bucket keys from
+    its TF-IDF weights, and the per-table bucket arrays are sorted at the end;
+    these hold ``lsh.tables`` entries per document, so they take memory
+    proportional to the number of cases.
+    With ``related`` (k) a third pass adds the related-cases graph, each case's
+    ``k`` most similar cases, over ``workers`` processes; its ``k`` entries per
+    case are held in memory until they are written (see ``add_related_graph``).
+    """
+    if fmt == "pickle":
+        build_pickle_index(cases_path, out_path, dedup_threshold if dedup else None, analyzer)
+        return
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    info = {}
+    if dedup:
+        finder = DuplicateFinder(threshold=dedup_threshold, num_perm=_HASHER.num_perm)
+        bar = Progress("dedup pass", progress)
+        for prints in map_chunks(_fingerprint_chunk, chunked(read_case_lines(cases_path), chunk_size), workers):
+            for fp in prints:
+                finder.add(*fp)
+            bar.update(len(prints))
+        bar.finish()
+        representatives = finder.representatives()
+        info["dedup"] = {"threshold": dedup_threshold, "input_docs": finder.num_docs}
+        del finder
+        case_lines = partial(representative_lines, cases_path, representatives)
+    else:
+        case_lines = partial(read_case_lines, cases_path)
+
+    # Pass 1: document frequencies (and partition keys).
+    df_counter = Counter()
+    num_docs = title_tokens = all_tokens = 0
+    spill = PartitionSpill(out_path) if classifier is not None else None
+    pending = deque()
+
+    def remember(chunks):
+        # Results arrive in chunk order, so the oldest pending chunk is the one they belong to.
+        for chunk in chunks:
+            pending.append(chunk)
+            yield chunk
+
+    bar = Progress("df pass", progress)
+    chunks = remember(chunked(case_lines(), chunk_size))
+    for part, n, title_n, all_n, keys in map_chunks(
+        partial(_df_chunk, analyzer), chunks, workers, _init_partitions, (classifier,)
+    ):
+        lines = pending.popleft()
+        if spill is not None:
+            spill.add(lines, keys)
+        df_counter.update(part)
+        num_docs += n
+        title_tokens += title_n
+        all_tokens += all_n
+        bar.update(n)
+    bar.finish()
+    _init_partitions(None)
+    if spill is not None:
+        case_lines = spill.lines
+
+    vocab = sorted(df_counter, key=lambda t: t.encode("utf-8"))
+    term_ids = {term: i for i, term in enumerate(vocab)}
+    df = array("I", (df_counter[t] for t in vocab))
+    del df_counter
+    idf = array("d", (math.log((num_docs + 1) / (d + 1)) + 1 for d in df))
+    bm25_idfs = array("d", (bm25_idf(d, num_docs) for d in df))
+    avg_title = title_tokens / num_docs if num_docs else 0.0
+    avg_problem = (all_tokens - title_tokens) / num_docs if num_docs else 0.0
+    weighting = Bm25Weighting(bm25, avg_title, avg_problem)
+    term_offsets = array("Q", [0])
+    for d in df:
+        term_offsets.append(term_offsets[-1] + d)
+    total = term_offsets[-1]
+
+    writer = IndexWriter(out_path)
+    vocab_blob, vocab_offsets = pack_strings(vocab)
+    writer.add_bytes("vocab_blob", vocab_blob)
+    writer.add_array("vocab_offsets", "Q", vocab_offsets)
+    del vocab, vocab_blob, vocab_offsets
+    writer.add_array("df", "I", df)
+    writer.add_array("idf", "d", idf)
+    writer.add_array("term_offsets", "Q", term_offsets)
+    for name, typecode, count in (
+        ("post_docs", "I", total),
+        ("post_weights", "d", total),
+        ("doc_norms", "d", num_docs),
+        ("doc_offsets", "Q", num_docs + 1),
+        ("doc_terms", "I", total),
+        ("doc_counts", "I", total),
+        ("doc_lengths", "I", num_docs),
+        ("live", "B", num_docs),
+        ("case_id_offsets", "Q", num_docs + 1),
+        ("meta_offsets", "Q", num_docs + 1),
+        ("doc_title_counts", "I", total),
+        ("doc_title_lengths", "I", num_docs),
+        ("bm25_impacts", "d", total),
+    ):
+        writer.reserve_array(name, typecode, count)
+    views = writer.map_reserved()
+
+    # Pass 2: weights, norms, forward index, postings scatter, metadata.
+    post_docs, post_weights, post_impacts = views["post_docs"], views["post_weights"], views["bm25_impacts"]
+    max_impacts = array("d", bytes(8 * len(df)))
+    cursor = array("Q", term_offsets[:-1])
+    lsh_keys = array("I")
+    doc_id = 0
+    term_pos = 0
+    case_pos = 0
+    meta_pos = 0
+    case_blob_path = out_path.with_name(out_path.name + ".case_ids.tmp")
+    prints_path = out_path.with_name(out_path.name + ".fingerprints.tmp")
+    bar = Progress("weight pass", progress)
+    with meta_path_for(out_path).open("wb") as meta_f, case_blob_path.open("wb") as case_f, prints_path.open("wb") as prints_f:
+        chunks = chunked(case_lines(), chunk_size)
+        initargs = (term_ids, idf, bm25_idfs, weighting, lsh, dedup)
+        for docs in map_chunks(partial(_weight_chunk, analyzer), chunks, workers, _init_weighting, initargs):
+            for ids, counts, title_counts, length, title_len, weights, impacts, norm, keys, case_id, meta, packed in docs:
+                end = term_pos + len(ids)
+                views["doc_terms"][term_pos:end] = ids
+                views["doc_counts"][term_pos:end] = counts
+                views["doc_title_counts"][term_pos:end] = title_counts
+                for term_id, weight, impact in zip(ids, weights, impacts):
+                    pos = cursor[term_id]
+                    post_docs[pos] = doc_id
+                    post_weights[pos] = weight
+                    post_impacts[pos] = impact
+                    cursor[term_id] = pos + 1
+                    if impact > max_impacts[term_id]:
+                        max_impacts[term_id] = impact
+                term_pos = end
+                views["doc_offsets"][doc_id + 1] = term_pos
+                views["doc_lengths"][doc_id] = length
+                views["doc_title_lengths"][doc_id] = title_len
+                views["doc_norms"][doc_id] = norm
+                views["live"][doc_id] = 1
+                lsh_keys.extend(keys)
+                encoded = case_id.encode("utf-8")
+                case_f.write(encoded)
+                case_pos += len(encoded)
+                views["case_id_offsets"][doc_id + 1] = case_pos
+                meta_f.write(meta)
+                meta_pos += len(meta)
+                prints_f.write(array("Q", packed).tobytes())
+                views["meta_offsets"][doc_id + 1] = meta_pos
+                doc_id += 1
+            bar.update(len(docs))
+    bar.finish()
+    _init_weighting({}, (), (), None)
+    del views, post_docs, post_weights, post_impacts
+
+    writer.unmap()
+    writer.add_array("bm25_max_impacts", "d", max_impacts)
+    writer.add_file("case_id_blob", "B", case_blob_path)
+    case_blob_path.unlink()
+    if lsh is not None:
+        write_lsh_sections(writer, lsh_keys, lsh)
+        info["lsh"] = lsh.config()
+    del lsh_keys
+    if spill is not None:
+        keys = spill.keys()
+        info["partitions"] = {"rules_version": classifier.rules_version}
+        for pos, field in enumerate(PARTITION_FIELDS):
+            names = sorted({key[pos] for key in keys})
+            typecode = partition_typecode(names)
+            code_of = {name: code for code, name in enumerate(names)}
+            codes = array(typecode)
+            for key in keys:
+                codes.extend(array(typecode, [code_of[key[pos]]]) * spill.counts[key])
+            writer.add_array(f"doc_{field}", typecode, codes)
+            info["partitions"][field] = names
+        spill.close()
+    if dedup:
+        writer.add_file("dedup_fingerprints", "Q", prints_path)
+        info["dedup"]["num_perm"] = _HASHER.num_perm
+    prints_path.unlink()
+    writer.close(
+        dict(
+            info,
+            index_version=index_version_for(num_docs, analyzer),
+            revision=0,
+            analyzer=analyzer.config(),
+            num_docs=num_docs,
+            num_live=num_docs,
+            num_terms=len(idf),
+            bm25=weighting.info(),
+        )
+    )
+    if related:
+        add_related_graph(out_path, related, workers, backend=related_backend, progress=progress)
+
+
+def stored_fingerprints(index: CompactIndex) -> Sequence[int]:
+    """The packed ``dedup_fingerprints`` rows of ``index``, one per document.
+
+    Indexes built before the rows were stored get them from their metadata
+    once; the update writes them for the next one.
+    """
+    if index.dedup_fingerprints is not None:
+        return index.dedup_fingerprints
+    prints = array("Q")
+    for doc_id in range(index.num_docs):
+        prints.extend(packed_fingerprint(index.meta(doc_id)))
+    return prints
+
+
+def update_index(
+    index_path: Path,
+    append_path: Path = None,
+    delete_ids: Sequence[str] = (),
+    compact: bool = False,
+    classifier: Optional[RuleClassifier] = None,
+    workers: int = 1,
+    related_backend: str = "auto",
+) -> Dict:
+    """Apply appends/deletes (and optionally compaction) to an existing compact index.
+
+    Only the appended cases are read and tokenized; document frequencies are
+    adjusted from the stored forward index and every derived section (IDF,
+    weights, norms, postings) is recomputed from it, so rankings match a fresh
+    build of the same live cases. Appended cases are tokenized with the
+    analyzer recorded in the index. Deleted documents stay as tombstones until
+    ``compact`` drops them and any terms they alone used.
+    In a partitioned index appended cases are classified with ``classifier``
+    (default: the one from ``configs/``; stored documents keep their
+    categories) and documents are renumbered to keep partitions grouped.
+    Appending raises ``ValueError`` if the classifier's ``rules_version`` is not
+    the one the index's partitions were built with.
+    LSH signatures, if the index has them, are recomputed with its parameters,
+    and so is the related-cases graph, with its ``k``, over ``workers``
+    processes: an append or delete changes the IDF of every term and with it
+    every similarity, so the whole graph is rebuilt, which costs as much as
+    ``--related`` on a full build. Compaction alone keeps the live documents
+    and their weights, so their stored rows are only renumbered.
+    An index built with dedup keeps folding duplicates: appended cases are
+    fingerprinted and matched against the live stored cases (whose digests and
+    MinHash signatures the index stores in ``dedup_fingerprints``, so stored
+    cases are not re-read) and each other; a duplicate is not indexed but adds
+    its URL to the ``source_urls`` of the document already holding its problem.
+    The new index names a new metadata file in its footer; both are written
+    next to the index and published by a single rename of the ``.idx``, so
+    readers see either the old pair or the new one. The old metadata file is
+    removed by the next update.
+    """
+    index = CompactIndex(index_path)
+    fwd = ForwardIndex.from_index(index)
+    revision = int(index.info.get("revision", 0))
+    analyzer = Analyzer.from_config(index.info.get("analyzer"))
+    if fwd.partitions is not None and classifier is None:
+        classifier = default_classifier()
+    if append_path is not None and fwd.partitions is not None:
+        stored_rules = index.info["partitions"].get("rules_version", "")
+        if classifier.rules_version != stored_rules:
+            index.close()
+            raise ValueError(
+                f"the index's partitions were classified with rules version {stored_rules!r}, not "
+                f"{classifier.rules_version!r}; rebuild the index to append cases with the current rules"
+            )
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    dedup = index.info.get("dedup")
+
+    deleted = sum(fwd.delete(case_id) for case_id in delete_ids)
+    appended_meta: List[Dict] = []
+    # Extra source URLs for documents that absorbed appended duplicates, by doc id.
+    folded_urls: Dict[int, List[str]] = {}
+    folded = 0
+    # Packed fingerprint rows of the stored documents and of the appended ones.
+    prints = stored_fingerprints(index) if dedup else None
+    width = 1 + _HASHER.num_perm
+    appended_prints: List[List[int]] = []
+    if append_path is not None:
+        finder, owners = None, []
+        if dedup:
+            finder = DuplicateFinder(threshold=dedup["threshold"], num_perm=_HASHER.num_perm)
+            for doc_id in range(index.num_docs):
+                if fwd.live[doc_id]:
+                    finder.add(*unpack_fingerprint(prints[doc_id * width : (doc_id + 1) * width]))
+                    owners.append(doc_id)
+        for case in load_jsonl(append_path):
+            if finder is not None:
+                digest, signature, url, canonical = fingerprint(case, _HASHER)
+                group = finder.add(digest, signature, url, canonical)
+                if group != finder.num_docs - 1:
+                    # A duplicate: fold it into the document that founded its group.
+                    owner = owners[group]
+                    owners.append(owner)
+                    folded_urls.setdefault(owner, []).append(case.get("topic_url") or "")
+                    folded += 1
+                    continue
+                owners.append(fwd.num_docs)
+                appended_prints.append(pack_fingerprint(digest, signature, _HASHER.num_perm))
+            tokens = case_tokens(case, analyzer)
+            key = case_partition(case, classifier) if fwd.partitions is not None else ("", "")
+            fwd.add(case.get("case_id"), tokens, case_title_len(case, tokens, analyzer), key)
+            appended_meta.append(case_meta(case))
+    appended = len(appended_meta)
+    if compact:
+        fwd, kept = fwd.compacted()
+    else:
+        kept = list(range(fwd.num_docs))
+    if fwd.partitions is not None:
+        order = fwd.grouped_order()
+        fwd = fwd.reordered(order)
+        kept = [kept[i] for i in order]
+    # The live metadata file may be mapped by readers: write a fresh file under
+    # the other of two names rather than overwrite it in place. Files the live
+    # index does not name are left by the update before it (kept for readers
+    # still opening that index) or by an interrupted one, and are removed.
+    old_meta_path = index.meta_path
+    names = [meta_path_for(index_path)] + [index_path.with_name(f"{index_path.name}.{n}.meta") for n in (1, 2)]
+    meta_path = names[2] if old_meta_path == names[1] else names[1]
+    for stale in names:
+        if stale != old_meta_path and stale.exists():
+            stale.unlink()
+    meta_writer = MetaWriter(meta_path)
+    for doc_id in kept:
+        if doc_id < index.num_docs and doc_id not in folded_urls:
+            meta_writer.add_raw(index.meta_raw(doc_id))
+            continue
+        meta = index.meta(doc_id) if doc_id < index.num_docs else appended_meta[doc_id - index.num_docs]
+        urls = list(meta.get("source_urls") or [])
+        for url in folded_urls.get(doc_id, ()):
+            if url and url not in urls:
+                urls.append(url)
+        meta["source_urls"] = urls
+        meta_writer.add_raw(json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+    meta_writer.close()
+
+    if appended or deleted:
+        revision += 1
+    num_live = fwd.num_live
+    index_version = index_version_for(num_live, analyzer, revision)
+    info = {"index_version": index_version, "revision": revision}
+    if analyzer.config():
+        info["analyzer"] = analyzer.config()
+    if fwd.partitions is not None:
+        info["partitions"] = {"rules_version": index.info["partitions"].get("rules_version", "")}
+    if index.info.get("lsh"):
+        info["lsh"] = index.info["lsh"]
+    if dedup:
+        info["dedup"] = dict(dedup, input_docs=dedup.get("input_docs", 0) + appended + folded, num_perm=_HASHER.num_perm)
+    info["meta_file"] = meta_path.name
+    # Keep the BM25F parameters the index was built with; averages are recomputed.
+    bm25 = {k: v for k, v in index.info.get("bm25", {}).items() if k in BM25_DEFAULTS}
+    write_index(tmp_path, fwd, meta_writer.offsets, info=info, bm25=bm25)
+    if dedup:
+        kept_prints = array("Q")
+        for doc_id in kept:
+            if doc_id < index.num_docs:
+                kept_prints.extend(prints[doc_id * width : (doc_id + 1) * width])
+            else:
+                kept_prints.extend(appended_prints[doc_id - index.num_docs])
+        del prints
+        writer, written = IndexWriter.reopen(tmp_path)
+        writer.add_array("dedup_fingerprints", "Q", kept_prints)
+        writer.close(written)
+    if index.info.get("knn"):
+        k = index.info["knn"]["k"]
+        if appended or deleted or kept != sorted(kept):
+            add_related_graph(tmp_path, k, workers, backend=related_backend)
+        else:
+            knn_docs, knn_scores = remapped_graph(index, kept)
+            written = CompactIndex(tmp_path)
+            order = case_id_order(written.case_ids())
+            written.close()
+            write_related_graph(tmp_path, k, knn_docs, knn_scores, order)
+    index.close()
+    # One rename publishes the new index together with the metadata file it names.
+    os.replace(tmp_path, index_path)
+    return {
+        "appended": appended,
+        "folded": folded,
+        "deleted": deleted,
+        "docs": fwd.num_docs,
+        "live": num_live,
+        "index_version": index_version,
+    }
+
+
+def build_pickle_index(
+    cases_path: Path, out_path: Path, dedup_threshold: float = None, analyzer: Analyzer = DEFAULT_ANALYZER
+):
     cases = list(load_jsonl(cases_path))
-    texts = [normalize_text(c.get("analysis_text", "")) for c in cases]
-    meta = [
-        {
-            "case_id": c.get("case_id"),
-            "source": c.get("source"),
-            "topic_url": c.get("topic_url"),
-            "title": c.get("title", ""),
-            "forum": c.get("forum", ""),
-            "problem": c.get("problem", ""),
-            "solution": c.get("solution", ""),
-        }
-        for c in cases
-    ]
-
-    doc_tokens = [t.split() for t in texts]
+    if dedup_threshold is not None:
+        cases = collapse_cases(cases, threshold=dedup_threshold)
+    meta = [case_meta(c) for c in cases]
+
+    doc_tokens = [case_tokens(c, analyzer) for c in cases]
     df_counter = Counter()
     for tokens in doc_tokens:
         df_counter.update(set(tokens))
@@ -65,14 +828,15 @@ def build_index(cases_path: Path, out_path: Path):
                 "idf": idf,
                 "doc_vectors": doc_vectors,
                 "doc_norms": doc_norms,
+                "postings": invert_vectors(doc_vectors),
                 "meta": meta,
-                "index_version": f"tfidf@cases.cleaned.{len(cases)}",
+                "index_version": index_version_for(len(cases), analyzer),
+                "analyzer": analyzer.config(),
             },
             f,
         )
 
 
-
 def main():
     parser = argparse.ArgumentParser(description="Build TF-IDF index for WPML triage")
     parser.add_argument(
@@ -84,12 +848,139 @@ def main():
     parser.add_argument(
         "--out",
         type=Path,
-        default=BASE_DIR / "artifacts" / "tfidf.joblib",
-        help="Output path for the index joblib",
+        default=BASE_DIR / "artifacts" / "tfidf.idx",
+        help="Output path for the index",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["compact", "pickle"],
+        default="compact",
+        help="compact: memory-mappable arrays + .meta side file (default); pickle: legacy single-file pickle",
+    )
+    parser.add_argument(
+        "--append",
+        type=Path,
+        default=None,
+        help="Add the cases in this JSONL file to the existing index at --out "
+        "(an index built with --related has its whole graph recomputed, over --workers processes)",
+    )
+    parser.add_argument(
+        "--delete",
+        action="append",
+        default=[],
+        metavar="CASE_ID",
+        help="Remove a case from the existing index (repeatable; recomputes a --related graph like --append)",
+    )
+    parser.add_argument("--compact", action="store_true", help="Drop deleted documents and unused terms from the existing index")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to tokenize and weight cases (default: 1)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Cases per work unit (default: 1000)")
+    parser.add_argument("--progress", action="store_true", help="Report docs/sec for each build pass on stderr")
+    parser.add_argument(
+        "--bm25",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help=f"Override a BM25F parameter ({', '.join(BM25_DEFAULTS)}; repeatable)",
+    )
+    parser.add_argument("--keep-stopwords", action="store_true", help="Index stopwords instead of dropping them")
+    parser.add_argument("--no-stem", action="store_true", help="Index words as written instead of light-stemming them")
+    parser.add_argument("--bigrams", action="store_true", help="Also index adjacent-word bigrams")
+    parser.add_argument("--no-dedup", action="store_true", help="Index every case instead of folding duplicates of the same problem")
+    parser.add_argument(
+        "--no-partitions",
+        action="store_true",
+        help="Do not classify cases into category/forum partitions (partitioned search then falls back to full search)",
+    )
+    parser.add_argument("--lsh", action="store_true", help="Also store SimHash LSH tables for approximate retrieval")
+    parser.add_argument(
+        "--lsh-tables",
+        type=int,
+        default=LSH_DEFAULTS["tables"],
+        help=f"LSH hash tables; more raise recall and candidates scored (default: {LSH_DEFAULTS['tables']})",
+    )
+    parser.add_argument(
+        "--lsh-bits",
+        type=int,
+        default=LSH_DEFAULTS["bits"],
+        help=f"Signature bits per LSH table; more make buckets smaller and search faster (default: {LSH_DEFAULTS['bits']})",
+    )
+    parser.add_argument(
+        "--related",
+        type=int,
+        default=0,
+        metavar="K",
+        help=f"Also store each case's K most similar cases for TfidfRetriever.related (e.g. {KNN_DEFAULTS['k']}; default: off)",
+    )
+    parser.add_argument(
+        "--related-backend",
+        choices=("auto",) + KNN_BACKENDS,
+        default="auto",
+        help="Related-cases scoring: numpy (SciPy block products) or maxscore (pure Python); same results (default: auto)",
+    )
+    parser.add_argument(
+        "--dedup-threshold",
+        type=float,
+        default=0.8,
+        help="Estimated Jaccard similarity at which cases count as near-duplicates (default: 0.8)",
     )
     args = parser.parse_args()
+    bm25 = {}
+    for item in args.bm25:
+        key, _, value = item.partition("=")
+        if key not in BM25_DEFAULTS:
+            parser.error(f"unknown BM25 parameter {key!r}")
+        bm25[key] = float(value)
 
-    build_index(args.cases, args.out)
+    if args.append or args.delete or args.compact:
+        if args.format != "compact":
+            parser.error("--append/--delete/--compact only apply to compact indexes")
+        try:
+            stats = update_index(
+                args.out,
+                args.append,
+                args.delete,
+                args.compact,
+                workers=args.workers,
+                related_backend=args.related_backend,
+            )
+        except ValueError as e:
+            parser.error(str(e))
+        print(
+            f"Index {args.out} updated: +{stats['appended']} -{stats['deleted']} docs "
+            f"({stats['folded']} duplicates folded), "
+            f"{stats['live']}/{stats['docs']} live, version {stats['index_version']}"
+        )
+        return
+
+    lsh = None
+    if args.lsh:
+        if args.format != "compact":
+            parser.error("--lsh only applies to compact indexes")
+        try:
+            lsh = SimHasher(args.lsh_tables, args.lsh_bits)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.related:
+        if args.format != "compact":
+            parser.error("--related only applies to compact indexes")
+        if args.related < 0:
+            parser.error("--related needs K >= 1")
+    build_index(
+        args.cases,
+        args.out,
+        args.format,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        progress=args.progress,
+        dedup=not args.no_dedup,
+        dedup_threshold=args.dedup_threshold,
+        bm25=bm25,
+        analyzer=Analyzer(stopwords=not args.keep_stopwords, stem=not args.no_stem, bigrams=args.bigrams),
+        classifier=None if args.no_partitions or args.format == "pickle" else default_classifier(),
+        lsh=lsh,
+        related=args.related or None,
+        related_backend=args.related_backend,
+    )
     print(f"Index built at {args.out} from {args.cases}")
 
 
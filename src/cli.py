@@ -1,20 +1,131 @@
 import argparse
 import json
+import sys
 from pathlib import Path
+from time import perf_counter
+from typing import Iterator, TextIO
 
+from triage.cache import ResultCache
 from triage.pipeline import load_default_pipeline
+from triage.timing import StageTimer
+
+
+def read_queries(f: TextIO) -> Iterator[str]:
+    """Yield query texts from JSONL: either {"text": ...} objects or bare JSON strings."""
+    for lineno, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        obj = json.loads(line)
+        if isinstance(obj, str):
+            yield obj
+        elif isinstance(obj, dict) and isinstance(obj.get("text"), str):
+            yield obj["text"]
+        else:
+            raise ValueError(f"line {lineno}: expected a JSON string or an object with a 'text' field")
+
+
+def run_batch(
+    pipeline, input_path: Path, output_path: Path, chunk_size: int, workers: int = 1, base_dir: Path = None, pipeline_kwargs=None
+) -> int:
+    # Bulk mode only: multiprocessing is not worth importing for a one-shot call.
+    from triage.parallel import run_batch_parallel
+
+    count = 0
+    with input_path.open("r", encoding="utf-8") as fin:
+        out = output_path.open("w", encoding="utf-8") if output_path else sys.stdout
+        try:
+            if workers <= 1:
+                # In-process outputs are encoded straight into the file; worker results arrive as text.
+                timer = pipeline.timer
+                for output in pipeline.run_batch(read_queries(fin), chunk_size=chunk_size):
+                    t0 = perf_counter()
+                    output.write(out)
+                    out.write("\n")
+                    if timer is not None:
+                        timer.record({"serialize": perf_counter() - t0})
+                    count += 1
+                return count
+            lines = run_batch_parallel(
+                read_queries(fin), workers, pipeline=pipeline, base_dir=base_dir, chunk_size=chunk_size, pipeline_kwargs=pipeline_kwargs
+            )
+            for line in lines:
+                out.write(line + "\n")
+                count += 1
+        finally:
+            if out is not sys.stdout:
+                out.close()
+    return count
 
 
 def main():
     parser = argparse.ArgumentParser(description="WPML support triage CLI")
     parser.add_argument("text", nargs="?", help="User query text")
     parser.add_argument("--base", type=Path, default=None, help="Base directory for configs and artifacts")
+    parser.add_argument("--input", type=Path, default=None, help="JSONL file of queries to triage in bulk")
+    parser.add_argument("--output", type=Path, default=None, help="JSONL file for bulk results (default: stdout)")
+    parser.add_argument("--chunk-size", type=int, default=256, help="Queries processed per chunk in bulk mode")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes for bulk mode (default: 1)")
+    parser.add_argument("--cache-size", type=int, default=0, help="LRU result cache entries for bulk mode (default: off)")
+    parser.add_argument("--timings", action="store_true", help="Add meta.timings per result and print stage latency percentiles")
+    parser.add_argument("--max-per-topic", type=int, default=None, help="Cite at most this many cases from one forum thread")
+    parser.add_argument("--ranking", choices=["tfidf", "bm25"], default="tfidf", help="Citation ranking: TF-IDF cosine (default) or BM25F over title/problem")
+    parser.add_argument(
+        "--partition-confidence",
+        type=float,
+        default=None,
+        metavar="CONF",
+        help="Search the predicted category's partition first when triage confidence is at least CONF (needs a partitioned index)",
+    )
+    parser.add_argument(
+        "--partition-floor",
+        type=float,
+        default=None,
+        help="Score every partition citation must reach before the search widens to all cases (default: per ranking)",
+    )
+    parser.add_argument(
+        "--approximate",
+        action="store_true",
+        help="Score only LSH bucket candidates instead of every matching case (needs an index built with --lsh)",
+    )
+    parser.add_argument("--lsh-probes", type=int, default=0, metavar="N", help="Extra LSH buckets probed per table with --approximate (default: 0)")
+    parser.add_argument("--classify-only", action="store_true", help="Classify and plan without opening the index (no citations)")
     args = parser.parse_args()
 
-    if not args.text:
+    if args.input and args.text:
+        parser.error("Provide either query text or --input, not both")
+    if not args.text and not args.input:
         parser.error("Please provide query text")
 
-    pipeline = load_default_pipeline(args.base)
+    cache = ResultCache(args.cache_size) if args.input and args.cache_size > 0 else None
+    timer = StageTimer() if args.timings else None
+    # NumPy/SciPy take longer to import than a single query takes to score, so a
+    # one-shot call uses a pure-Python backend; all backends rank identically.
+    backend = "auto" if args.input else ("maxscore" if args.ranking == "bm25" else "python")
+    # Workers that cannot fork load their own pipeline with these same settings.
+    options = dict(
+        cache=cache,
+        timer=timer,
+        max_per_topic=args.max_per_topic,
+        ranking=args.ranking,
+        backend=backend,
+        classify_only=args.classify_only,
+        partition_confidence=args.partition_confidence,
+        partition_floor=args.partition_floor,
+        approximate=args.approximate,
+        lsh_probes=args.lsh_probes,
+    )
+    pipeline = load_default_pipeline(args.base, **options)
+    if args.input:
+        count = run_batch(pipeline, args.input, args.output, args.chunk_size, args.workers, args.base, options)
+        print(f"Triaged {count} queries", file=sys.stderr)
+        # Workers send their counts back with each chunk, so these cover every process.
+        if cache is not None:
+            print(f"Cache: {json.dumps(cache.stats())}", file=sys.stderr)
+        if timer is not None:
+            print(f"Timings: {json.dumps(timer.summary(), indent=2)}", file=sys.stderr)
+        return
+
     output = pipeline.run(args.text)
     print(json.dumps(output.dict(), ensure_ascii=False, indent=2, default=str))
 
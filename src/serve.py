@@ -0,0 +1,84 @@
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+from triage.cache import ResultCache
+from triage.config_bundle import BundleWatcher
+from triage.pipeline import load_default_pipeline
+from triage.timing import StageTimer
+from triage.server import TriageServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WPML support triage HTTP service")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on (default: 8080)")
+    parser.add_argument("--base", type=Path, default=None, help="Base directory for configs and artifacts")
+    parser.add_argument("--cache-size", type=int, default=0, help="LRU result cache entries (default: off)")
+    parser.add_argument("--cache-ttl", type=float, default=None, help="Seconds a cached result stays valid (default: no expiry)")
+    parser.add_argument("--timings", action="store_true", help="Record per-stage latencies (meta.timings, GET /stats)")
+    parser.add_argument("--max-per-topic", type=int, default=None, help="Cite at most this many cases from one forum thread")
+    parser.add_argument("--ranking", choices=["tfidf", "bm25"], default="tfidf", help="Citation ranking: TF-IDF cosine (default) or BM25F over title/problem")
+    parser.add_argument(
+        "--partition-confidence",
+        type=float,
+        default=None,
+        metavar="CONF",
+        help="Search the predicted category's partition first when triage confidence is at least CONF (needs a partitioned index)",
+    )
+    parser.add_argument(
+        "--partition-floor",
+        type=float,
+        default=None,
+        help="Score every partition citation must reach before the search widens to all cases (default: per ranking)",
+    )
+    parser.add_argument(
+        "--approximate",
+        action="store_true",
+        help="Score only LSH bucket candidates instead of every matching case (needs an index built with --lsh)",
+    )
+    parser.add_argument("--lsh-probes", type=int, default=0, metavar="N", help="Extra LSH buckets probed per table with --approximate (default: 0)")
+    parser.add_argument(
+        "--watch-config",
+        type=float,
+        default=None,
+        metavar="SECONDS",
+        help="Poll artifacts/config.bundle at this interval and hot-swap rules/playbooks when its version changes",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    cache = ResultCache(args.cache_size, ttl=args.cache_ttl) if args.cache_size > 0 else None
+    timer = StageTimer() if args.timings else None
+    pipeline = load_default_pipeline(
+        args.base,
+        cache=cache,
+        timer=timer,
+        max_per_topic=args.max_per_topic,
+        ranking=args.ranking,
+        partition_confidence=args.partition_confidence,
+        partition_floor=args.partition_floor,
+        approximate=args.approximate,
+        lsh_probes=args.lsh_probes,
+    )
+    server = TriageServer((args.host, args.port), pipeline)
+    watcher = None
+    if args.watch_config:
+        base_dir = args.base or Path(__file__).resolve().parents[1]
+        bundle_path = base_dir / "artifacts" / "config.bundle"
+        watcher = BundleWatcher(bundle_path, pipeline.swap_config, pipeline.config_version, args.watch_config).start()
+    host, port = server.server_address[:2]
+    print(f"Serving triage on http://{host}:{port} (POST /triage, POST /triage/batch)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
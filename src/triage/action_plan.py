@@ -1,5 +1,7 @@
 from typing import Dict, List
 
+from .schema import ActionPlan
+
 
 class ActionPlanner:
     def __init__(self, playbooks_cfg: Dict):
@@ -10,11 +12,12 @@ class ActionPlanner:
         self.playbooks_version = playbooks_cfg.get("version", "")
 
     def generate(self, category: str, confidence: float) -> Dict[str, List[str]]:
+        return self.plan(category, confidence).dict()
+
+    def plan(self, category: str, confidence: float) -> ActionPlan:
+        """``generate`` as an ``ActionPlan``; its lists are the playbook's own, so treat them as read-only."""
         if confidence < self.low_conf:
             tpl = self.default
         else:
             tpl = self.by_category.get(category, self.default)
-        return {
-            "next_questions": tpl.get("next_questions", []),
-            "diagnostic_steps": tpl.get("diagnostic_steps", []),
-        }
+        return ActionPlan(next_questions=tpl.get("next_questions", []), diagnostic_steps=tpl.get("diagnostic_steps", []))
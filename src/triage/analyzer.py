@@ -0,0 +1,132 @@
+import re
+from typing import Dict, List, Optional
+
+from .rule_classifier import normalize_text
+
+# Bumped whenever a rule below changes, so indexes built with the old rules are
+# recognized as incompatible.
+ANALYZER_VERSION = 1
+
+# Runs of letters/digits, keeping inner ``.``, ``-``, ``_`` and apostrophes so
+# versions ("4.6.2"), file names ("wp-config.php") and hooks ("wpml_loaded")
+# stay whole while surrounding punctuation ("editor," / "(cache)") is dropped.
+# A possessive ``'s`` is stripped afterwards.
+_TOKEN_RE = re.compile(r"\w+(?:['.\-]\w+)*")
+
+# English function words; negations ("no", "not", "don't") are kept because they
+# change what a support question is about.
+STOPWORDS = frozenset(
+    """
+    a about above after again against all am an and any are as at be because been before being below
+    between both but by can could did do does doing down during each few for from further had has
+    have having he her here hers herself him himself his how i i'm i've if in into is it it's its itself
+    just me more most my myself of off on once only or other our ours ourselves out over own
+    same she should so some such than that that's the their theirs them themselves then there these they
+    this those through to too under until up very was we were what when where which while who whom why
+    will with would you your yours yourself yourselves
+    """.split()
+)
+
+
+def _has_vowel(s: str) -> bool:
+    return any(c in "aeiouy" for c in s)
+
+
+def light_stem(token: str) -> str:
+    """Conflate plural, ``-ing``/``-ed`` and final-``e`` forms ("updates", "updated",
+    "updating" → "updat"). Tokens containing digits or punctuation are left alone."""
+    if len(token) <= 3 or not token.isalpha():
+        return token
+    if token.endswith("ies") and not token.endswith(("aies", "eies")):
+        token = token[:-3] + "y"
+    elif token.endswith("es") and not token.endswith(("aes", "ees", "oes")):
+        token = token[:-1]
+    elif token.endswith("s") and not token.endswith(("us", "ss")):
+        token = token[:-1]
+    for suffix in ("ing", "ed"):
+        stem = token[: -len(suffix)]
+        if token.endswith(suffix) and len(stem) >= 3 and _has_vowel(stem):
+            if len(stem) > 3 and stem[-1] == stem[-2] and stem[-1] not in "lsz":
+                stem = stem[:-1]
+            return stem
+    if len(token) > 3 and token.endswith("e") and not token.endswith("ee"):
+        token = token[:-1]
+    return token
+
+
+class Analyzer:
+    """Text → index terms, shared by the index builder and the retriever.
+
+    Lowercases and tokenizes on word boundaries, optionally drops stopwords and
+    light-stems, and with ``bigrams`` follows each term with the bigram it closes
+    (``"string translation"`` → ``string, translat, "string translat"``). Terms are
+    emitted left to right, so the terms of a prefix of a text are a prefix of the
+    text's terms — the builder relies on this to size the title field.
+    """
+
+    def __init__(self, stopwords: bool = True, stem: bool = True, bigrams: bool = False):
+        self.stopwords = stopwords
+        self.stem = stem
+        self.bigrams = bigrams
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict]) -> "Analyzer":
+        """The analyzer an index was built with; indexes without one used ``WhitespaceAnalyzer``."""
+        if not config:
+            return WhitespaceAnalyzer()
+        if config.get("version") != ANALYZER_VERSION:
+            raise ValueError(f"index was built with analyzer version {config.get('version')}, expected {ANALYZER_VERSION}")
+        return cls(stopwords=config["stopwords"], stem=config["stem"], bigrams=config["bigrams"])
+
+    def config(self) -> Dict:
+        return {"version": ANALYZER_VERSION, "stopwords": self.stopwords, "stem": self.stem, "bigrams": self.bigrams}
+
+    @property
+    def signature(self) -> str:
+        """Short form of ``config()`` for ``index_version``, e.g. ``a1-stop-stem``."""
+        flags = [name for name, on in (("stop", self.stopwords), ("stem", self.stem), ("bi", self.bigrams)) if on]
+        return "-".join([f"a{ANALYZER_VERSION}"] + flags)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Analyzer) and self.config() == other.config()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.signature})"
+
+    def tokens(self, text: str) -> List[str]:
+        words = _TOKEN_RE.findall((text or "").lower().replace("’", "'"))
+        words = [w[:-2] if w.endswith("'s") else w for w in words]
+        if self.stopwords:
+            words = [w for w in words if w not in STOPWORDS]
+        if self.stem:
+            words = [light_stem(w) for w in words]
+        if not self.bigrams:
+            return words
+        out: List[str] = []
+        prev = None
+        for w in words:
+            out.append(w)
+            if prev is not None:
+                out.append(f"{prev} {w}")
+            prev = w
+        return out
+
+
+class WhitespaceAnalyzer(Analyzer):
+    """The original tokenization, ``normalize_text(text).split()``, kept for indexes built with it."""
+
+    def __init__(self):
+        super().__init__(stopwords=False, stem=False, bigrams=False)
+
+    def config(self) -> Dict:
+        return {}
+
+    @property
+    def signature(self) -> str:
+        return ""
+
+    def tokens(self, text: str) -> List[str]:
+        return normalize_text(text).split()
+
+
+DEFAULT_ANALYZER = Analyzer()
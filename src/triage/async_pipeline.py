@@ -0,0 +1,103 @@
+import asyncio
+from collections import deque
+from concurrent.futures import Executor
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+
+from .pipeline import Pipeline
+from .schema import PipelineOutput
+
+
+class AsyncPipeline:
+    """Runs a ``Pipeline`` from asyncio code without blocking the event loop.
+
+    Each run executes ``pipeline.run`` on ``executor`` (the loop's default thread
+    pool when None). At most ``max_concurrency`` runs execute at once; further
+    callers wait for a slot, so a burst queues instead of piling onto the pool.
+    Concurrent calls with the same text under the same configuration share one
+    computation and receive the same ``PipelineOutput`` object, which callers
+    should treat as read-only.
+    """
+
+    def __init__(self, pipeline: Pipeline, executor: Optional[Executor] = None, max_concurrency: int = 8):
+        if max_concurrency <= 0:
+            raise ValueError("max_concurrency must be positive")
+        self.pipeline = pipeline
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self._inflight: Dict[Tuple[str, str], "asyncio.Task[PipelineOutput]"] = {}
+        # Semaphores belong to one event loop; keep one per loop that uses us.
+        self._slots: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+        self.computed = 0
+        self.coalesced = 0
+
+    def _semaphore(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        slots = self._slots.get(loop)
+        if slots is None:
+            self._slots = {l: s for l, s in self._slots.items() if not l.is_closed()}
+            slots = self._slots[loop] = asyncio.Semaphore(self.max_concurrency)
+        return slots
+
+    async def _compute(self, query_text: str) -> PipelineOutput:
+        loop = asyncio.get_running_loop()
+        async with self._semaphore(loop):
+            self.computed += 1
+            return await loop.run_in_executor(self.executor, self.pipeline.run, query_text)
+
+    def _finished(self, key: Tuple[str, str], task: "asyncio.Task[PipelineOutput]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here so an abandoned failure is not logged as unhandled
+
+    async def run(self, query_text: str) -> PipelineOutput:
+        """``pipeline.run(query_text)``, joining an identical run already in flight."""
+        key = (query_text, self.pipeline.config_version)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._compute(query_text))
+            task.add_done_callback(lambda t: self._finished(key, t))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+        # Shielded: a cancelled caller must not cancel the run others are waiting on.
+        return await asyncio.shield(task)
+
+    async def stream(self, texts: Union[Iterable[str], AsyncIterable[str]]) -> AsyncIterator[PipelineOutput]:
+        """Triage ``texts`` concurrently, yielding outputs in input order.
+
+        At most ``2 * max_concurrency`` queries are pulled ahead of the consumer,
+        so input (sync or async) is read lazily and memory stays bounded.
+        """
+        window: "deque[asyncio.Task[PipelineOutput]]" = deque()
+        loop = asyncio.get_running_loop()
+        try:
+            async for text in _aiter(texts):
+                window.append(loop.create_task(self.run(text)))
+                if len(window) >= 2 * self.max_concurrency:
+                    yield await window.popleft()
+            while window:
+                yield await window.popleft()
+        finally:
+            for task in window:
+                task.cancel()
+
+    async def run_many(self, texts: Union[Iterable[str], AsyncIterable[str]]) -> List[PipelineOutput]:
+        """All outputs of ``stream(texts)``, in input order."""
+        return [output async for output in self.stream(texts)]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": len(self._inflight),
+            "computed": self.computed,
+            "coalesced": self.coalesced,
+        }
+
+
+async def _aiter(texts: Union[Iterable[str], AsyncIterable[str]]) -> AsyncIterator[str]:
+    if hasattr(texts, "__aiter__"):
+        async for text in texts:
+            yield text
+    else:
+        for text in texts:
+            yield text
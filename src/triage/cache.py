@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+# Counters that add up across caches, e.g. one per worker process.
+COUNTERS = ("hits", "misses", "evictions", "expirations", "invalidations")
+
+
+class ResultCache:
+    """Thread-safe bounded LRU cache with an optional per-entry TTL.
+
+    Entries are bound to a versions tuple (e.g. rules and index versions);
+    ``bind_versions`` drops everything as soon as that tuple changes.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        if max_size <= 0:
+            raise ValueError("max_size must be positive")
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._versions: Optional[Tuple] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __reduce__(self):
+        # A copy sent to another process (e.g. a spawned worker) starts empty with the same limits.
+        return type(self), (self.max_size, self.ttl, self._clock)
+
+    def bind_versions(self, versions: Tuple) -> None:
+        with self._lock:
+            if versions != self._versions:
+                if self._versions is not None:
+                    self.invalidations += 1
+                self._data.clear()
+                self._versions = versions
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            stored_at, value = entry
+            if self.ttl is not None and self._clock() - stored_at > self.ttl:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (self._clock(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def take_counters(self) -> Dict[str, int]:
+        """The counters since the last call, reset to zero (to ship a worker's counts to its parent)."""
+        with self._lock:
+            counts = {name: getattr(self, name) for name in COUNTERS}
+            for name in COUNTERS:
+                setattr(self, name, 0)
+        return counts
+
+    def add_counters(self, counts: Dict[str, int]) -> None:
+        with self._lock:
+            for name in COUNTERS:
+                setattr(self, name, getattr(self, name) + counts.get(name, 0))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,235 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .action_plan import ActionPlanner
+from .rule_classifier import MATCH_MODES, RuleClassifier
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT = 1
+CONFIG_NAMES = ("taxonomy", "rules", "playbooks")
+
+
+@dataclass
+class ConfigBundle:
+    """Validated taxonomy, rules and playbooks with a ready classifier and planner."""
+
+    version: str
+    rules_version: str
+    playbooks_version: str
+    taxonomy_version: str
+    sources: Dict[str, str]
+    classifier: RuleClassifier
+    planner: ActionPlanner
+
+
+def source_digests(configs_dir: Path) -> Dict[str, str]:
+    """Content hash of every YAML/JSON config file present, keyed by file name."""
+    digests = {}
+    for name in CONFIG_NAMES:
+        for suffix in (".yaml", ".json"):
+            path = configs_dir / f"{name}{suffix}"
+            if path.exists():
+                digests[path.name] = hashlib.blake2b(path.read_bytes(), digest_size=16).hexdigest()
+    return digests
+
+
+def load_sources(configs_dir: Path) -> Tuple[Dict[str, Dict], List[str]]:
+    """Parse each config, preferring YAML; also report JSON fallbacks that drifted from it."""
+    try:
+        import yaml  # type: ignore
+    except ImportError:
+        yaml = None
+    configs: Dict[str, Dict] = {}
+    problems: List[str] = []
+    for name in CONFIG_NAMES:
+        yaml_path, json_path = configs_dir / f"{name}.yaml", configs_dir / f"{name}.json"
+        from_json = None
+        if json_path.exists():
+            with json_path.open("r", encoding="utf-8") as f:
+                from_json = json.load(f)
+        if yaml is not None and yaml_path.exists():
+            with yaml_path.open("r", encoding="utf-8") as f:
+                configs[name] = yaml.safe_load(f)
+            if from_json is not None and from_json != configs[name]:
+                problems.append(f"{json_path.name} differs from {yaml_path.name}")
+        elif from_json is not None:
+            configs[name] = from_json
+        else:
+            raise FileNotFoundError(f"no {yaml_path.name} (with PyYAML installed) or {json_path.name} in {configs_dir}")
+    return configs, problems
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_configs(taxonomy: Dict, rules: Dict, playbooks: Dict) -> List[str]:
+    """Check the three configs against each other; returns a list of problems."""
+    problems = []
+    for name, cfg in (("taxonomy", taxonomy), ("rules", rules), ("playbooks", playbooks)):
+        if not isinstance(cfg, dict):
+            return [f"{name}: expected a mapping"]
+        if not cfg.get("version"):
+            problems.append(f"{name}: missing version")
+
+    ids = [c.get("id") for c in taxonomy.get("categories") or [] if isinstance(c, dict)]
+    if not ids:
+        problems.append("taxonomy: no categories")
+    if len(set(ids)) != len(ids):
+        problems.append("taxonomy: duplicate category ids")
+    known = set(ids)
+
+    for key in ("min_score", "min_confidence"):
+        if not _is_number((rules.get("thresholds") or {}).get(key, 0.0)):
+            problems.append(f"rules: thresholds.{key} must be a number")
+    for cat, rule in (rules.get("categories") or {}).items():
+        if cat not in known:
+            problems.append(f"rules: category {cat!r} is not in the taxonomy")
+        for kw in (rule or {}).get("keywords") or []:
+            where = f"rules: {cat} keyword {kw.get('id', '')!r}"
+            if not isinstance(kw.get("pattern"), str) or not kw.get("pattern"):
+                problems.append(f"{where}: pattern must be a non-empty string")
+            if not _is_number(kw.get("weight", 0.0)):
+                problems.append(f"{where}: weight must be a number")
+            if kw.get("match", "substring") not in MATCH_MODES:
+                problems.append(f"{where}: match must be one of {', '.join(MATCH_MODES)}")
+        for rx in (rule or {}).get("regex") or []:
+            where = f"rules: {cat} regex {rx.get('id', '')!r}"
+            if not _is_number(rx.get("weight", 0.0)):
+                problems.append(f"{where}: weight must be a number")
+            try:
+                re.compile(rx.get("pattern", ""), flags=re.I)
+            except (re.error, TypeError) as e:
+                problems.append(f"{where}: {e}")
+
+    if not _is_number(playbooks.get("low_confidence_threshold", 0.0)):
+        problems.append("playbooks: low_confidence_threshold must be a number")
+    templates = [("default", playbooks.get("default") or {})]
+    for cat, tpl in (playbooks.get("by_category") or {}).items():
+        if cat not in known:
+            problems.append(f"playbooks: category {cat!r} is not in the taxonomy")
+        templates.append((cat, tpl or {}))
+    for cat, tpl in templates:
+        for key in ("next_questions", "diagnostic_steps"):
+            items = tpl.get(key, [])
+            if not isinstance(items, list) or not all(isinstance(i, str) for i in items):
+                problems.append(f"playbooks: {cat}.{key} must be a list of strings")
+    return problems
+
+
+def compile_config(configs_dir: Path) -> ConfigBundle:
+    """Load, cross-validate and compile ``configs_dir``; raises ``ValueError`` listing every problem."""
+    configs_dir = Path(configs_dir)
+    sources = source_digests(configs_dir)
+    configs, problems = load_sources(configs_dir)
+    problems += validate_configs(configs["taxonomy"], configs["rules"], configs["playbooks"])
+    if problems:
+        raise ValueError(f"invalid configs in {configs_dir}:\n  " + "\n  ".join(problems))
+    versions = [configs[name]["version"] for name in ("rules", "playbooks", "taxonomy")]
+    return ConfigBundle(
+        version="+".join(versions),
+        rules_version=versions[0],
+        playbooks_version=versions[1],
+        taxonomy_version=versions[2],
+        sources=sources,
+        classifier=RuleClassifier(configs["rules"]),
+        planner=ActionPlanner(configs["playbooks"]),
+    )
+
+
+def write_bundle(bundle: ConfigBundle, path: Path) -> None:
+    """Write atomically, so a watcher never sees a partial bundle."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("wb") as f:
+        pickle.dump({"format": BUNDLE_FORMAT, "bundle": bundle}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_bundle(path: Path) -> ConfigBundle:
+    with Path(path).open("rb") as f:
+        payload = pickle.load(f)
+    if not isinstance(payload, dict) or payload.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"{path} is not a config bundle in format {BUNDLE_FORMAT}")
+    return payload["bundle"]
+
+
+def load_config(configs_dir: Path, bundle_path: Optional[Path] = None) -> ConfigBundle:
+    """The compiled bundle when it matches ``configs_dir``, else a fresh in-memory compile."""
+    if bundle_path is not None and Path(bundle_path).exists():
+        try:
+            bundle = load_bundle(bundle_path)
+        except (OSError, ValueError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+            logger.warning("ignoring unreadable config bundle %s: %s", bundle_path, e)
+        else:
+            if bundle.sources == source_digests(Path(configs_dir)):
+                return bundle
+            logger.warning("config bundle %s is stale; compiling %s (run scripts/build_config.py)", bundle_path, configs_dir)
+    return compile_config(configs_dir)
+
+
+class BundleWatcher:
+    """Polls a bundle file and passes each newly written ``version`` to ``on_change``.
+
+    Bundles are replaced atomically by ``write_bundle``, so a changed file is
+    always complete; one that fails to load is logged and the current
+    configuration stays in place.
+    """
+
+    def __init__(self, path: Path, on_change: Callable[[ConfigBundle], None], version: str = "", interval: float = 1.0):
+        self.path = Path(path)
+        self.on_change = on_change
+        self.version = version
+        self.interval = interval
+        self._stamp = self._stat()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _stat(self):
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def check(self) -> bool:
+        """Reload if the file changed; True when ``on_change`` received a new version."""
+        stamp = self._stat()
+        if stamp is None or stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        try:
+            bundle = load_bundle(self.path)
+        except (OSError, ValueError, pickle.UnpicklingError, EOFError, AttributeError) as e:
+            logger.warning("keeping config %s; could not load %s: %s", self.version, self.path, e)
+            return False
+        if bundle.version == self.version:
+            return False
+        logger.info("config %s -> %s", self.version, bundle.version)
+        self.version = bundle.version
+        self.on_change(bundle)
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self) -> "BundleWatcher":
+        self._thread = threading.Thread(target=self._run, name="config-bundle-watcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
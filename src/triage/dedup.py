@@ -0,0 +1,189 @@
+import hashlib
+import random
+import zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+from .rule_classifier import normalize_text
+
+# Mersenne prime 2**61 - 1 for the universal hash family used by MinHash.
+_PRIME = (1 << 61) - 1
+
+
+def topic_key(url: Optional[str]) -> str:
+    """Identify the forum thread behind a URL by dropping ``?paged=...`` and ``#post-...``."""
+    if not url:
+        return ""
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+
+
+def is_canonical(case: Dict) -> bool:
+    """A titled case whose URL points at the thread itself, not at a post or page in it."""
+    url = case.get("topic_url") or ""
+    return bool(case.get("title")) and url == topic_key(url)
+
+
+def dedup_text(case: Dict) -> str:
+    """Text compared for duplicates: the problem summary, which variants of a thread share."""
+    return normalize_text(case.get("problem") or case.get("analysis_text", ""))
+
+
+def content_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class MinHasher:
+    """One-permutation MinHash signatures over word shingles.
+
+    Each shingle is hashed once with a seeded universal hash; its value goes to one
+    of ``num_perm`` bins, which keep their minimum. Empty bins borrow the next
+    non-empty bin's value, offset by the distance (rotation densification), so the
+    signature costs one pass over the shingles instead of one per permutation.
+    Signatures are deterministic across processes and runs.
+    """
+
+    def __init__(self, num_perm: int = 32, shingle_size: int = 3, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.randrange(1, _PRIME)
+        self._b = rng.randrange(0, _PRIME)
+
+    def shingles(self, text: str) -> List[int]:
+        words = text.split()
+        k = self.shingle_size
+        grams = [" ".join(words[i : i + k]) for i in range(max(len(words) - k + 1, 1))] if words else []
+        return list({zlib.crc32(g.encode("utf-8")) for g in grams})
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        hashes = self.shingles(text)
+        if not hashes:
+            return ()
+        n, a, b = self.num_perm, self._a, self._b
+        bins: List[Optional[int]] = [None] * n
+        for h in hashes:
+            value, slot = divmod((a * h + b) % _PRIME, n)
+            current = bins[slot]
+            if current is None or value < current:
+                bins[slot] = value
+        filled = [(i, v) for i, v in enumerate(bins) if v is not None]
+        if len(filled) < n:
+            for i in range(n):
+                if bins[i] is None:
+                    # The next filled bin, circularly, shifted past the value range.
+                    j, v = next(((j, v) for j, v in filled if j > i), filled[0])
+                    bins[i] = v + ((j - i) % n) * _PRIME
+        return tuple(bins)
+
+
+def estimate_jaccard(a: Sequence[int], b: Sequence[int]) -> float:
+    if not a or len(a) != len(b):
+        return 0.0
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+def fingerprint(case: Dict, hasher: MinHasher) -> Tuple[str, Tuple[int, ...], str, bool]:
+    """Everything ``DuplicateFinder.add`` needs about a case; cheap to ship between processes."""
+    text = dedup_text(case)
+    return content_hash(text), hasher.signature(text), case.get("topic_url") or "", is_canonical(case)
+
+
+# An empty signature (no words) is stored as a row of EMPTY_BIN.
+EMPTY_BIN = (1 << 64) - 1
+
+
+def pack_fingerprint(digest: str, signature: Tuple[int, ...], num_perm: int) -> List[int]:
+    """``1 + num_perm`` unsigned 64-bit ints storing a case's digest and signature.
+
+    A densified bin ``v + k * _PRIME`` (``v < _PRIME / num_perm``, ``k < num_perm``)
+    is stored as ``v + k * width`` with ``width = ceil(_PRIME / num_perm)``, which
+    keeps every bin below 2**62.
+    """
+    if not signature:
+        return [int(digest, 16)] + [EMPTY_BIN] * num_perm
+    width = -(-_PRIME // num_perm)
+    return [int(digest, 16)] + [v % _PRIME + v // _PRIME * width for v in signature]
+
+
+def unpack_fingerprint(row: Sequence[int]) -> Tuple[str, Tuple[int, ...]]:
+    """The ``(digest, signature)`` stored by ``pack_fingerprint``."""
+    digest = format(row[0], "016x")
+    if row[1] == EMPTY_BIN:
+        return digest, ()
+    width = -(-_PRIME // (len(row) - 1))
+    return digest, tuple(x % width + x // width * _PRIME for x in row[1:])
+
+
+class DuplicateFinder:
+    """Groups documents added in order by exact content hash, then by MinHash LSH.
+
+    Signatures are split into ``bands`` bands; a document sharing any band with an
+    earlier group's founder is compared against it and joins the first group whose
+    estimated Jaccard similarity reaches ``threshold``. Only group founders are kept,
+    so memory grows with the number of distinct documents.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 32, bands: int = 8):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.rows = num_perm // bands
+        self._exact: Dict[str, int] = {}
+        self._buckets: Dict[Tuple, List[int]] = {}
+        self._founders: Dict[int, Tuple[int, ...]] = {}
+        self._members: Dict[int, List[Tuple[int, str, bool]]] = {}
+        self.num_docs = 0
+
+    def _bands(self, signature: Tuple[int, ...]):
+        rows = self.rows
+        for start in range(0, len(signature), rows):
+            yield (start, signature[start : start + rows])
+
+    def add(self, digest: str, signature: Tuple[int, ...], url: str = "", canonical: bool = False) -> int:
+        """Record the next document and return the id of the group it joined."""
+        doc_id = self.num_docs
+        self.num_docs += 1
+        group = self._exact.get(digest)
+        if group is None and signature:
+            candidates = sorted({g for band in self._bands(signature) for g in self._buckets.get(band, ())})
+            for candidate in candidates:
+                if estimate_jaccard(signature, self._founders[candidate]) >= self.threshold:
+                    group = candidate
+                    break
+        if group is None:
+            group = doc_id
+            self._founders[group] = signature
+            self._members[group] = []
+            if signature:
+                for band in self._bands(signature):
+                    self._buckets.setdefault(band, []).append(group)
+        self._exact.setdefault(digest, group)
+        self._members[group].append((doc_id, url, canonical))
+        return group
+
+    def representatives(self) -> Dict[int, List[str]]:
+        """Map each group's representative doc id to its source URLs, in doc id order.
+
+        The representative is the group's first canonical case (titled, thread URL),
+        or its first case; its URL is listed first, then the other distinct URLs.
+        """
+        out: Dict[int, List[str]] = {}
+        for members in self._members.values():
+            rep_id, rep_url, _ = next((m for m in members if m[2]), members[0])
+            urls = [rep_url] if rep_url else []
+            for _, url, _ in members:
+                if url and url not in urls:
+                    urls.append(url)
+            out[rep_id] = urls
+        return dict(sorted(out.items()))
+
+
+def collapse_cases(cases: Iterable[Dict], threshold: float = 0.8, hasher: Optional[MinHasher] = None) -> List[Dict]:
+    """Fold duplicate cases into their representatives, each carrying ``source_urls``."""
+    cases = list(cases)
+    hasher = hasher or MinHasher()
+    finder = DuplicateFinder(threshold=threshold, num_perm=hasher.num_perm)
+    for case in cases:
+        finder.add(*fingerprint(case, hasher))
+    return [dict(cases[doc_id], source_urls=urls) for doc_id, urls in finder.representatives().items()]
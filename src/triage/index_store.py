@@ -0,0 +1,777 @@
+"""Compact, memory-mappable on-disk format for the retrieval index.
+
+An index is two files:
+
+* ``<name>.idx`` — the magic header, then named, 8-byte aligned array sections
+  (vocabulary, IDF, CSR postings, document norms, metadata offsets, ...), then a
+  JSON footer describing each section and a fixed-size trailer pointing at it.
+* ``<name>.idx.meta`` — the citation metadata records as concatenated UTF-8 JSON,
+  addressed through the ``meta_offsets`` section, so a record is decoded only
+  when a citation for it is rendered. Incremental updates write a new
+  ``<name>.idx.<n>.meta`` instead and name it in the footer
+  (``info["meta_file"]``), so renaming the new ``.idx`` into place switches
+  both files at once.
+
+Both files are opened with ``mmap`` and sections are exposed as zero-copy
+``memoryview`` casts, so loading is near-instant and concurrent processes
+share the same page-cache pages.
+
+Indexes built with a rule classifier are also *partitioned*: every document
+carries the category the rules assign it and its forum, and documents are
+numbered grouped by (category, forum), so a category is one contiguous run of
+doc ids (a forum at most one run per category) and a partition's share of any
+postings list is found by binary search.
+
+Indexes built with LSH signatures (``info["lsh"]`` holds the ``SimHasher``
+parameters) also store each document's bucket key per table (``lsh_keys``)
+and, per table, the documents sorted by key (``lsh_table_keys``,
+``lsh_table_docs``), so a bucket is found by binary search; see ``triage.lsh``.
+
+Indexes built with a related-cases graph (``info["knn"]`` holds ``k``) store
+each document's ``k`` nearest cases (``knn_docs``, ``knn_scores``) and the doc
+ids sorted by case id (``case_id_order``); see ``triage.knn``.
+"""
+import json
+import math
+import mmap
+import struct
+import sys
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .lsh import SimHasher, bucket_tables
+
+MAGIC = b"TRIAGEIX"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sI4x")
+_TRAILER = struct.Struct("<QQ8s")
+_ALIGN = 8
+
+# BM25F parameters used when a build does not override them: term-frequency
+# saturation ``k1`` plus per-field length normalization ``b_*`` and weight ``w_*``
+# for the title and problem fields of ``analysis_text``.
+BM25_DEFAULTS = {"k1": 1.2, "b_title": 0.75, "b_problem": 0.75, "w_title": 2.0, "w_problem": 1.0}
+
+# Partition fields of partitioned indexes, in the order of the (category, forum)
+# key documents are grouped by.
+PARTITION_FIELDS = ("category", "forum")
+
+
+def partition_typecode(names: Sequence[str]) -> str:
+    """Typecode of a ``doc_<field>`` section: 16-bit codes unless there are more names than fit."""
+    return "H" if len(names) <= 0x10000 else "I"
+
+
+def invert_vectors(doc_vectors: List[Dict[str, float]]) -> Dict[str, List[Tuple[int, float]]]:
+    """Invert per-document vectors into term -> [(doc_id, weight), ...] in doc order."""
+    postings: Dict[str, List[Tuple[int, float]]] = {}
+    for doc_id, vec in enumerate(doc_vectors):
+        for term, weight in vec.items():
+            postings.setdefault(term, []).append((doc_id, weight))
+    return postings
+
+
+def bm25_idf(df: int, num_live: int) -> float:
+    """Robertson-Sparck Jones IDF (always positive); 0 for terms no live document uses."""
+    return math.log(1 + (num_live - df + 0.5) / (df + 0.5)) if df else 0.0
+
+
+class Bm25Weighting:
+    """Per-posting BM25F impacts, so query-time BM25 is a sum of stored values.
+
+    A document's ``analysis_text`` is its title followed by its problem text;
+    each field's term frequency is normalized by that field's length relative
+    to the corpus average, the fields are combined with their weights, and the
+    result is saturated with ``k1`` and scaled by the term's IDF.
+    """
+
+    def __init__(self, params: Dict, avg_title_len: float, avg_problem_len: float):
+        self.params = dict(BM25_DEFAULTS, **(params or {}))
+        self.avg_title_len = avg_title_len
+        self.avg_problem_len = avg_problem_len
+
+    @staticmethod
+    def _norm(b: float, length: int, avg: float) -> float:
+        return 1 - b + b * length / avg if avg else 1.0
+
+    def impacts(self, idfs: Sequence[float], counts: Sequence[int], title_counts: Sequence[int], length: int, title_len: int) -> List[float]:
+        p = self.params
+        k1 = p["k1"]
+        w_title = p["w_title"] / self._norm(p["b_title"], title_len, self.avg_title_len)
+        w_problem = p["w_problem"] / self._norm(p["b_problem"], length - title_len, self.avg_problem_len)
+        out = []
+        for idf, count, title_count in zip(idfs, counts, title_counts):
+            tf = w_title * title_count + w_problem * (count - title_count)
+            out.append(idf * tf * (k1 + 1) / (k1 + tf))
+        return out
+
+    def info(self) -> Dict:
+        return dict(self.params, avg_title_len=self.avg_title_len, avg_problem_len=self.avg_problem_len)
+
+
+def meta_path_for(index_path: Path, info: Optional[Dict] = None) -> Path:
+    """The metadata file of the index at ``index_path``: the one its footer ``info`` names, else ``<name>.meta``."""
+    index_path = Path(index_path)
+    if info and info.get("meta_file"):
+        return index_path.with_name(info["meta_file"])
+    return Path(str(index_path) + ".meta")
+
+
+def is_compact_index(path: Path) -> bool:
+    with Path(path).open("rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class IndexWriter:
+    """Stream named array sections into a compact index file."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = self.path.open("w+b")
+        self._f.write(_HEADER.pack(MAGIC, FORMAT_VERSION))
+        self._sections: Dict[str, List] = {}
+        self._reserved: List[str] = []
+        self._mm: Optional[mmap.mmap] = None
+        self._views: List[memoryview] = []
+
+    def _align(self) -> None:
+        pad = -self._f.tell() % _ALIGN
+        if pad:
+            self._f.write(b"\0" * pad)
+
+    def add_array(self, name: str, typecode: str, values: Iterable) -> None:
+        arr = values if isinstance(values, array) and values.typecode == typecode else array(typecode, values)
+        self._align()
+        offset = self._f.tell()
+        arr.tofile(self._f)
+        self._sections[name] = [offset, typecode, len(arr)]
+
+    def add_bytes(self, name: str, data: bytes) -> None:
+        self._align()
+        offset = self._f.tell()
+        self._f.write(data)
+        self._sections[name] = [offset, "B", len(data)]
+
+    def add_file(self, name: str, typecode: str, src: Path) -> None:
+        """Copy a raw array file written elsewhere (e.g. streamed to a temp file) in as a section."""
+        self._align()
+        offset = self._f.tell()
+        with Path(src).open("rb") as f:
+            while True:
+                block = f.read(1 << 20)
+                if not block:
+                    break
+                self._f.write(block)
+        size = self._f.tell() - offset
+        self._sections[name] = [offset, typecode, size // array(typecode).itemsize]
+
+    def reserve_array(self, name: str, typecode: str, count: int) -> None:
+        """Allocate a zero-filled section to be filled in place through ``map_reserved``."""
+        self._align()
+        offset = self._f.tell()
+        end = offset + count * array(typecode).itemsize
+        self._f.truncate(end)
+        self._f.seek(end)
+        self._sections[name] = [offset, typecode, count]
+        self._reserved.append(name)
+
+    def map_reserved(self) -> Dict[str, memoryview]:
+        """Writable views over every reserved section, backed by the file itself."""
+        self._f.flush()
+        self._mm = mmap.mmap(self._f.fileno(), self._f.tell())
+        view = memoryview(self._mm)
+        self._views = [view]
+        out = {}
+        for name in self._reserved:
+            offset, typecode, count = self._sections[name]
+            out[name] = view[offset : offset + count * array(typecode).itemsize].cast(typecode)
+            self._views.append(out[name])
+        return out
+
+    def unmap(self) -> None:
+        """Flush and drop the writable mapping; callers must not use the views afterwards."""
+        if self._mm is None:
+            return
+        for v in reversed(self._views):
+            v.release()
+        self._views = []
+        self._mm.flush()
+        self._mm.close()
+        self._mm = None
+        self._f.seek(0, 2)
+
+    @classmethod
+    def reopen(cls, path: Path) -> Tuple["IndexWriter", Dict]:
+        """Reopen a finished index to add sections after its last one; also returns its ``info``.
+
+        The footer is dropped until ``close`` writes a new one, so the file is
+        not a valid index in between.
+        """
+        self = cls.__new__(cls)
+        self.path = Path(path)
+        self._f = self.path.open("r+b")
+        self._f.seek(-_TRAILER.size, 2)
+        footer_offset, footer_len, _ = _TRAILER.unpack(self._f.read(_TRAILER.size))
+        self._f.seek(footer_offset)
+        footer = json.loads(self._f.read(footer_len))
+        self._f.seek(footer_offset)
+        self._f.truncate()
+        self._sections = footer["sections"]
+        self._reserved = []
+        self._mm = None
+        self._views = []
+        return self, footer.get("info", {})
+
+    def close(self, info: Dict) -> None:
+        self.unmap()
+        footer = json.dumps(
+            {"format": FORMAT_VERSION, "byteorder": sys.byteorder, "sections": self._sections, "info": info},
+            ensure_ascii=False,
+        ).encode("utf-8")
+        self._align()
+        footer_offset = self._f.tell()
+        self._f.write(footer)
+        self._f.write(_TRAILER.pack(footer_offset, len(footer), MAGIC))
+        self._f.close()
+
+
+class MetaWriter:
+    """Append metadata records as JSON and remember their byte offsets."""
+
+    def __init__(self, path: Path):
+        self._f = Path(path).open("wb")
+        self.offsets = array("Q", [0])
+
+    def add(self, record: Dict) -> None:
+        self.add_raw(json.dumps(record, ensure_ascii=False).encode("utf-8"))
+
+    def add_raw(self, data: bytes) -> None:
+        self._f.write(data)
+        self.offsets.append(self._f.tell())
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class ForwardIndex:
+    """Build-side document -> (term, count) view from which every index section is derived.
+
+    Documents are only ever appended or tombstoned, so an existing index can be
+    updated without re-reading or re-tokenizing the corpus it was built from.
+    Term ids here are insertion-ordered; ``write_index`` remaps them to the
+    sorted on-disk vocabulary. A ``partitioned`` forward index also records each
+    document's (category, forum) key; ``grouped_order`` and ``reordered`` put
+    documents in the grouped order partitioned indexes are written in.
+    """
+
+    def __init__(self, partitioned: bool = False):
+        self.vocab: List[str] = []
+        self.term_ids: Dict[str, int] = {}
+        self.df = array("I")
+        self.doc_offsets = array("Q", [0])
+        self.doc_terms = array("I")
+        self.doc_counts = array("I")
+        self.doc_lengths = array("I")
+        # Title-field share of each (doc, term) count and of each document's length.
+        self.doc_title_counts = array("I")
+        self.doc_title_lengths = array("I")
+        self.live = bytearray()
+        self.case_ids: List[str] = []
+        self.partitions: Optional[List[Tuple[str, str]]] = [] if partitioned else None
+        self._docs_by_case: Optional[Dict[str, List[int]]] = None
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_lengths)
+
+    @property
+    def num_live(self) -> int:
+        return sum(self.live)
+
+    def add(self, case_id: str, tokens: List[str], title_len: int = 0, partition: Tuple[str, str] = ("", "")) -> int:
+        """Append a document; its first ``title_len`` tokens are the title field.
+
+        ``partition`` is its (category, forum) key, kept only when partitioned.
+        """
+        doc_id = self.num_docs
+        title_counts = Counter(tokens[:title_len])
+        # Counter keeps first-occurrence order, which fixes the norm summation order.
+        for term, count in Counter(tokens).items():
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                term_id = len(self.vocab)
+                self.vocab.append(term)
+                self.term_ids[term] = term_id
+                self.df.append(0)
+            self.df[term_id] += 1
+            self.doc_terms.append(term_id)
+            self.doc_counts.append(count)
+            self.doc_title_counts.append(title_counts.get(term, 0))
+        self.doc_offsets.append(len(self.doc_terms))
+        self.doc_lengths.append(len(tokens))
+        self.doc_title_lengths.append(min(title_len, len(tokens)))
+        self.live.append(1)
+        self.case_ids.append(case_id or "")
+        if self.partitions is not None:
+            self.partitions.append(tuple(partition))
+        if self._docs_by_case is not None:
+            self._docs_by_case.setdefault(case_id or "", []).append(doc_id)
+        return doc_id
+
+    def doc(self, doc_id: int) -> Tuple[Sequence[int], Sequence[int]]:
+        start, end = self.doc_offsets[doc_id], self.doc_offsets[doc_id + 1]
+        return self.doc_terms[start:end], self.doc_counts[start:end]
+
+    def delete(self, case_id: str) -> int:
+        """Tombstone every live document with ``case_id``; returns how many were removed."""
+        if self._docs_by_case is None:
+            self._docs_by_case = {}
+            for doc_id, cid in enumerate(self.case_ids):
+                self._docs_by_case.setdefault(cid, []).append(doc_id)
+        removed = 0
+        for doc_id in self._docs_by_case.get(case_id, ()):
+            if not self.live[doc_id]:
+                continue
+            self.live[doc_id] = 0
+            for term_id in self.doc(doc_id)[0]:
+                self.df[term_id] -= 1
+            removed += 1
+        return removed
+
+    def grouped_order(self) -> List[int]:
+        """Doc ids sorted by partition key, keeping doc order within a partition."""
+        if self.partitions is None:
+            return list(range(self.num_docs))
+        return sorted(range(self.num_docs), key=self.partitions.__getitem__)
+
+    def reordered(self, order: Sequence[int]) -> "ForwardIndex":
+        """A copy with the documents in ``order`` (a permutation of doc ids) and the same term ids."""
+        out = ForwardIndex(self.partitions is not None)
+        out.vocab, out.term_ids, out.df = list(self.vocab), dict(self.term_ids), array("I", self.df)
+        for doc_id in order:
+            start, end = self.doc_offsets[doc_id], self.doc_offsets[doc_id + 1]
+            out.doc_terms.extend(self.doc_terms[start:end])
+            out.doc_counts.extend(self.doc_counts[start:end])
+            out.doc_title_counts.extend(self.doc_title_counts[start:end])
+            out.doc_offsets.append(len(out.doc_terms))
+            out.doc_lengths.append(self.doc_lengths[doc_id])
+            out.doc_title_lengths.append(self.doc_title_lengths[doc_id])
+            out.live.append(self.live[doc_id])
+            out.case_ids.append(self.case_ids[doc_id])
+            if out.partitions is not None:
+                out.partitions.append(self.partitions[doc_id])
+        return out
+
+    def compacted(self) -> Tuple["ForwardIndex", List[int]]:
+        """Return a copy without tombstoned documents or unused terms, plus the kept old doc ids."""
+        out = ForwardIndex(self.partitions is not None)
+        kept = [d for d in range(self.num_docs) if self.live[d]]
+        for doc_id in kept:
+            terms, counts = self.doc(doc_id)
+            start, end = self.doc_offsets[doc_id], self.doc_offsets[doc_id + 1]
+            out.doc_title_counts.extend(self.doc_title_counts[start:end])
+            for term_id, count in zip(terms, counts):
+                term = self.vocab[term_id]
+                new_id = out.term_ids.get(term)
+                if new_id is None:
+                    new_id = len(out.vocab)
+                    out.vocab.append(term)
+                    out.term_ids[term] = new_id
+                    out.df.append(0)
+                out.df[new_id] += 1
+                out.doc_terms.append(new_id)
+                out.doc_counts.append(count)
+            out.doc_offsets.append(len(out.doc_terms))
+            out.doc_lengths.append(self.doc_lengths[doc_id])
+            out.doc_title_lengths.append(self.doc_title_lengths[doc_id])
+            out.live.append(1)
+            out.case_ids.append(self.case_ids[doc_id])
+            if out.partitions is not None:
+                out.partitions.append(self.partitions[doc_id])
+        return out, kept
+
+    @classmethod
+    def from_index(cls, index: "CompactIndex") -> "ForwardIndex":
+        if index.doc_offsets is None:
+            raise ValueError(f"{index.path} has no forward index; rebuild it with scripts/build_index.py")
+        fwd = cls(bool(index.partition_names))
+        fwd.vocab = index.vocab()
+        fwd.term_ids = {term: i for i, term in enumerate(fwd.vocab)}
+        fwd.df = array("I", index.df)
+        fwd.doc_offsets = array("Q", index.doc_offsets)
+        fwd.doc_terms = array("I", index.doc_terms)
+        fwd.doc_counts = array("I", index.doc_counts)
+        fwd.doc_lengths = array("I", index.doc_lengths)
+        if index.doc_title_counts is not None:
+            fwd.doc_title_counts = array("I", index.doc_title_counts)
+            fwd.doc_title_lengths = array("I", index.doc_title_lengths)
+        else:
+            # Indexes written before field statistics: treat every token as problem text.
+            fwd.doc_title_counts = array("I", bytes(4 * len(fwd.doc_terms)))
+            fwd.doc_title_lengths = array("I", bytes(4 * fwd.num_docs))
+        fwd.live = bytearray(index.live)
+        fwd.case_ids = index.case_ids()
+        if fwd.partitions is not None:
+            categories, forums = (index.partition_names[field] for field in PARTITION_FIELDS)
+            fwd.partitions = [(categories[c], forums[f]) for c, f in zip(index.doc_category, index.doc_forum)]
+        return fwd
+
+
+def pack_strings(strings: Iterable[str]) -> Tuple[bytes, array]:
+    blob = bytearray()
+    offsets = array("Q", [0])
+    for s in strings:
+        blob += s.encode("utf-8")
+        offsets.append(len(blob))
+    return bytes(blob), offsets
+
+
+def unpack_strings(blob: memoryview, offsets: memoryview) -> List[str]:
+    data = bytes(blob)
+    return [data[offsets[i] : offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+def corpus_field_lengths(fwd: "ForwardIndex") -> Tuple[float, float]:
+    """Average title and problem lengths over live documents."""
+    num_live = fwd.num_live
+    if not num_live:
+        return 0.0, 0.0
+    title = sum(n for n, alive in zip(fwd.doc_title_lengths, fwd.live) if alive)
+    total = sum(n for n, alive in zip(fwd.doc_lengths, fwd.live) if alive)
+    return title / num_live, (total - title) / num_live
+
+
+def write_index(path: Path, fwd: ForwardIndex, meta_offsets: Sequence[int], info: Dict, bm25: Optional[Dict] = None) -> None:
+    """Derive IDF, weights, norms, BM25F impacts and CSR postings from ``fwd`` and write them to ``path``.
+
+    The metadata side file must already have been written (see ``MetaWriter``);
+    ``meta_offsets`` addresses its records in doc order. ``bm25`` overrides
+    entries of ``BM25_DEFAULTS``. A partitioned ``fwd`` must already be in
+    ``grouped_order``; its partition names are added to ``info["partitions"]``.
+    With ``info["lsh"]`` (``SimHasher`` parameters) the LSH sections are
+    derived from the recomputed TF-IDF weights as well.
+    """
+    num_live = fwd.num_live
+    order = sorted(range(len(fwd.vocab)), key=lambda i: fwd.vocab[i].encode("utf-8"))
+    remap = array("I", bytes(4 * len(order)))
+    for new_id, old_id in enumerate(order):
+        remap[old_id] = new_id
+    df = array("I", (fwd.df[i] for i in order))
+    # Terms only referenced by tombstoned documents keep a slot but an IDF of 0.
+    idf = array("d", (math.log((num_live + 1) / (d + 1)) + 1 if d else 0.0 for d in df))
+    bm25_idfs = array("d", (bm25_idf(d, num_live) for d in df))
+    weighting = Bm25Weighting(bm25, *corpus_field_lengths(fwd))
+
+    term_offsets = array("Q", [0])
+    for d in df:
+        term_offsets.append(term_offsets[-1] + d)
+    total = term_offsets[-1]
+    post_docs = array("I", bytes(4 * total))
+    post_weights = array("d", bytes(8 * total))
+    post_impacts = array("d", bytes(8 * total))
+    max_impacts = array("d", bytes(8 * len(order)))
+    cursor = array("Q", term_offsets[:-1])
+    doc_terms = array("I", (remap[t] for t in fwd.doc_terms))
+    doc_norms = array("d")
+    hasher = SimHasher.from_config(info["lsh"]) if info.get("lsh") else None
+    lsh_keys = array("I")
+    for doc_id in range(fwd.num_docs):
+        start, end = fwd.doc_offsets[doc_id], fwd.doc_offsets[doc_id + 1]
+        length = fwd.doc_lengths[doc_id]
+        if not fwd.live[doc_id] or not length:
+            doc_norms.append(1.0)
+            if hasher is not None:
+                lsh_keys.extend(hasher.keys((), ()))
+            continue
+        terms = doc_terms[start:end]
+        impacts = weighting.impacts(
+            [bm25_idfs[t] for t in terms],
+            fwd.doc_counts[start:end],
+            fwd.doc_title_counts[start:end],
+            length,
+            fwd.doc_title_lengths[doc_id],
+        )
+        weights = []
+        for i, term_id, impact in zip(range(start, end), terms, impacts):
+            weight = (fwd.doc_counts[i] / length) * idf[term_id]
+            weights.append(weight)
+            pos = cursor[term_id]
+            post_docs[pos] = doc_id
+            post_weights[pos] = weight
+            post_impacts[pos] = impact
+            cursor[term_id] = pos + 1
+            if impact > max_impacts[term_id]:
+                max_impacts[term_id] = impact
+        doc_norms.append(math.sqrt(sum(v * v for v in weights)) or 1.0)
+        if hasher is not None:
+            lsh_keys.extend(hasher.keys((fwd.vocab[t] for t in fwd.doc_terms[start:end]), weights))
+
+    vocab_blob, vocab_offsets = pack_strings(fwd.vocab[i] for i in order)
+    case_blob, case_offsets = pack_strings(fwd.case_ids)
+    writer = IndexWriter(path)
+    writer.add_bytes("vocab_blob", vocab_blob)
+    writer.add_array("vocab_offsets", "Q", vocab_offsets)
+    writer.add_array("df", "I", df)
+    writer.add_array("idf", "d", idf)
+    writer.add_array("term_offsets", "Q", term_offsets)
+    writer.add_array("post_docs", "I", post_docs)
+    writer.add_array("post_weights", "d", post_weights)
+    writer.add_array("doc_norms", "d", doc_norms)
+    writer.add_array("doc_offsets", "Q", fwd.doc_offsets)
+    writer.add_array("doc_terms", "I", doc_terms)
+    writer.add_array("doc_counts", "I", fwd.doc_counts)
+    writer.add_array("doc_lengths", "I", fwd.doc_lengths)
+    writer.add_bytes("live", bytes(fwd.live))
+    writer.add_bytes("case_id_blob", case_blob)
+    writer.add_array("case_id_offsets", "Q", case_offsets)
+    writer.add_array("meta_offsets", "Q", meta_offsets)
+    writer.add_array("doc_title_counts", "I", fwd.doc_title_counts)
+    writer.add_array("doc_title_lengths", "I", fwd.doc_title_lengths)
+    writer.add_array("bm25_impacts", "d", post_impacts)
+    writer.add_array("bm25_max_impacts", "d", max_impacts)
+    if hasher is not None:
+        write_lsh_sections(writer, lsh_keys, hasher)
+    info = dict(info, num_docs=fwd.num_docs, num_live=num_live, num_terms=len(order), bm25=weighting.info())
+    if hasher is not None:
+        info["lsh"] = hasher.config()
+    if fwd.partitions is not None:
+        partitions = dict(info.get("partitions") or {})
+        for pos, field in enumerate(PARTITION_FIELDS):
+            names = sorted({key[pos] for key in fwd.partitions})
+            codes = {name: code for code, name in enumerate(names)}
+            writer.add_array(f"doc_{field}", partition_typecode(names), (codes[key[pos]] for key in fwd.partitions))
+            partitions[field] = names
+        info["partitions"] = partitions
+    writer.close(info)
+
+
+def write_lsh_sections(writer: IndexWriter, keys: array, hasher: SimHasher) -> None:
+    """Add the per-document keys and the per-table bucket arrays (see ``bucket_tables``)."""
+    writer.add_array("lsh_keys", "I", keys)
+    table_keys, table_docs = bucket_tables(keys, hasher.tables)
+    writer.add_array("lsh_table_keys", "I", table_keys)
+    writer.add_array("lsh_table_docs", "I", table_docs)
+
+
+class CompactIndex:
+    """Read-only, memory-mapped view over an index written by ``write_index``."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = _HEADER.unpack_from(self._mm, 0)
+        footer_offset, footer_len, tail_magic = _TRAILER.unpack_from(self._mm, len(self._mm) - _TRAILER.size)
+        if magic != MAGIC or tail_magic != MAGIC:
+            raise ValueError(f"{self.path} is not a compact triage index")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{self.path} has index format {version}, expected {FORMAT_VERSION}")
+        footer = json.loads(self._mm[footer_offset : footer_offset + footer_len])
+        if footer.get("byteorder") != sys.byteorder:
+            raise ValueError(f"{self.path} was written on a {footer.get('byteorder')}-endian machine")
+        self.sections: Dict[str, List] = footer["sections"]
+        self.info: Dict = footer.get("info", {})
+        self._view = memoryview(self._mm)
+
+        self.vocab_blob = self.section("vocab_blob")
+        self.vocab_offsets = self.section("vocab_offsets")
+        self.idf = self.section("idf")
+        self.term_offsets = self.section("term_offsets")
+        self.post_docs = self.section("post_docs")
+        self.post_weights = self.section("post_weights")
+        self.doc_norms = self.section("doc_norms")
+        self.meta_offsets = self.section("meta_offsets")
+        self.df = self.section("df")
+        self.doc_offsets = self.section("doc_offsets")
+        self.doc_terms = self.section("doc_terms")
+        self.doc_counts = self.section("doc_counts")
+        self.doc_lengths = self.section("doc_lengths")
+        # One byte per document, 0 for tombstones left by incremental deletes.
+        self.live = self.section("live")
+        # BM25F statistics; None in indexes written before they were added.
+        self.doc_title_counts = self.section("doc_title_counts")
+        self.doc_title_lengths = self.section("doc_title_lengths")
+        self.bm25_impacts = self.section("bm25_impacts")
+        self.bm25_max_impacts = self.section("bm25_max_impacts")
+        # Per-document partition codes into ``partition_names``; None if unpartitioned.
+        self.doc_category = self.section("doc_category")
+        self.doc_forum = self.section("doc_forum")
+        partitions = self.info.get("partitions") or {}
+        self.partition_names: Dict[str, List[str]] = {f: partitions[f] for f in PARTITION_FIELDS if f in partitions}
+        self._partition_runs: Dict[str, Dict[str, List[Tuple[int, int]]]] = {}
+        # LSH bucket tables (``SimHasher`` parameters in ``info["lsh"]``); None if built without.
+        self.lsh_keys = self.section("lsh_keys")
+        self.lsh_table_keys = self.section("lsh_table_keys")
+        self.lsh_table_docs = self.section("lsh_table_docs")
+        # Related-cases graph (``k`` per document, see ``triage.knn``); None if built without.
+        self.knn_docs = self.section("knn_docs")
+        self.knn_scores = self.section("knn_scores")
+        self.case_id_order = self.section("case_id_order")
+        # Packed dedup fingerprints (``1 + info["dedup"]["num_perm"]`` per document,
+        # see ``triage.dedup.pack_fingerprint``); None if built without dedup.
+        self.dedup_fingerprints = self.section("dedup_fingerprints")
+        self.num_docs = len(self.doc_norms)
+        self.num_terms = len(self.idf)
+        self.index_version = self.info.get("index_version", "")
+
+        self.meta_path = meta_path = meta_path_for(self.path, self.info)
+        with meta_path.open("rb") as f:
+            # mmap cannot map an empty file.
+            self._meta_mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if meta_path.stat().st_size else b""
+
+    def close(self) -> None:
+        """Release the mappings; views obtained from this index become invalid."""
+        for name in list(vars(self)):
+            if isinstance(getattr(self, name), memoryview):
+                getattr(self, name).release()
+        try:
+            self._mm.close()
+            if isinstance(self._meta_mm, mmap.mmap):
+                self._meta_mm.close()
+        except BufferError:
+            # A caller still holds a view; the mapping is released once it is collected.
+            pass
+
+    def section(self, name: str) -> Optional[memoryview]:
+        spec = self.sections.get(name)
+        if spec is None:
+            return None
+        offset, typecode, count = spec
+        size = array(typecode).itemsize
+        return self._view[offset : offset + count * size].cast(typecode)
+
+    def term_id(self, term: str) -> int:
+        """Binary-search the sorted vocabulary; -1 if ``term`` is not indexed."""
+        key = term.encode("utf-8")
+        blob, offsets = self.vocab_blob, self.vocab_offsets
+        lo, hi = 0, self.num_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            probe = bytes(blob[offsets[mid] : offsets[mid + 1]])
+            if probe < key:
+                lo = mid + 1
+            elif probe > key:
+                hi = mid
+            else:
+                return mid
+        return -1
+
+    def term(self, term_id: int) -> str:
+        """The vocabulary entry with id ``term_id``."""
+        return bytes(self.vocab_blob[self.vocab_offsets[term_id] : self.vocab_offsets[term_id + 1]]).decode("utf-8")
+
+    def postings(self, term_id: int) -> Tuple[memoryview, memoryview]:
+        start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+        return self.post_docs[start:end], self.post_weights[start:end]
+
+    def impacts(self, term_id: int) -> Tuple[memoryview, memoryview]:
+        """The term's postings with BM25F impacts in place of TF-IDF weights."""
+        start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+        return self.post_docs[start:end], self.bm25_impacts[start:end]
+
+    def partition(self, field: str, name: str) -> Optional[List[Tuple[int, int]]]:
+        """The ``[lo, hi)`` doc id runs of partition ``name`` of ``field`` ("category" or "forum").
+
+        None if the index has no such partition. Runs of a field are derived
+        from its per-document codes on first use.
+        """
+        if field not in self.partition_names:
+            return None
+        runs = self._partition_runs.get(field)
+        if runs is None:
+            names = self.partition_names[field]
+            runs = self._partition_runs[field] = {}
+            codes = self.section(f"doc_{field}")
+            start = 0
+            for doc_id in range(1, self.num_docs + 1):
+                if doc_id == self.num_docs or codes[doc_id] != codes[start]:
+                    runs.setdefault(names[codes[start]], []).append((start, doc_id))
+                    start = doc_id
+        return runs.get(name)
+
+    def case_id(self, doc_id: int) -> str:
+        offsets = self.section("case_id_offsets")
+        return bytes(self.section("case_id_blob")[offsets[doc_id] : offsets[doc_id + 1]]).decode("utf-8")
+
+    def doc_id(self, case_id: str) -> int:
+        """Binary-search ``case_id_order`` for a live document with ``case_id``; -1 if there is none."""
+        if self.case_id_order is None:
+            raise ValueError(f"{self.path} has no case id lookup; rebuild it with scripts/build_index.py --related")
+        key = case_id.encode("utf-8")
+        order = self.case_id_order
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.case_id(order[mid]).encode("utf-8") < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        while lo < len(order) and self.case_id(order[lo]) == case_id:
+            if self.live[order[lo]]:
+                return order[lo]
+            lo += 1
+        return -1
+
+    def meta(self, doc_id: int) -> Dict:
+        return json.loads(self.meta_raw(doc_id))
+
+    def meta_raw(self, doc_id: int) -> bytes:
+        start, end = self.meta_offsets[doc_id], self.meta_offsets[doc_id + 1]
+        return self._meta_mm[start:end]
+
+    def vocab(self) -> List[str]:
+        return unpack_strings(self.vocab_blob, self.vocab_offsets)
+
+    def case_ids(self) -> List[str]:
+        return unpack_strings(self.section("case_id_blob"), self.section("case_id_offsets"))
+
+
+class InMemoryIndex:
+    """The same read interface as ``CompactIndex`` over a legacy pickled index dict."""
+
+    def __init__(self, index: Dict):
+        self.info = {"index_version": index.get("index_version", "")}
+        if index.get("analyzer"):
+            self.info["analyzer"] = index["analyzer"]
+        self.index_version = self.info["index_version"]
+        idf = index.get("idf", {})
+        self._term_ids = {term: i for i, term in enumerate(idf)}
+        self.idf = list(idf.values())
+        self.doc_norms = index.get("doc_norms", [])
+        self._meta = index.get("meta", [])
+        self.num_docs = len(self.doc_norms)
+        self.num_terms = len(self.idf)
+        self.live = None  # legacy pickles have no tombstones
+        self.partition_names: Dict[str, List[str]] = {}
+
+        # Indexes pickled before postings were stored are inverted at load time.
+        postings = index.get("postings") or invert_vectors(index.get("doc_vectors", []))
+        self._postings = [
+            ([d for d, _ in postings.get(term, ())], [w for _, w in postings.get(term, ())]) for term in idf
+        ]
+
+    def term_id(self, term: str) -> int:
+        return self._term_ids.get(term, -1)
+
+    def postings(self, term_id: int) -> Tuple[List[int], List[float]]:
+        return self._postings[term_id]
+
+    def partition(self, field: str, name: str) -> None:
+        return None
+
+    def meta(self, doc_id: int) -> Dict:
+        return self._meta[doc_id]
+
+
+def open_index(path: Path):
+    """Open a compact index, or fall back to a legacy pickled index."""
+    path = Path(path)
+    if is_compact_index(path):
+        return CompactIndex(path)
+    import pickle
+
+    with path.open("rb") as f:
+        return InMemoryIndex(pickle.load(f))
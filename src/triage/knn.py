@@ -0,0 +1,131 @@
+"""Precomputed related-cases graph: each case's top-k most similar cases.
+
+Similarity is the TF-IDF cosine between two cases' ``analysis_text`` vectors,
+the same weights the retriever ranks queries with. ``CosineView`` exposes the
+index's postings with every weight divided by its document's norm, so a case
+used as a query (its own weights over its norm) scores every other case by a
+plain dot product. Each case is then an ordinary top-``k + 1`` search:
+
+* ``maxscore`` runs ``MaxScoreScorer`` over the view: a case's terms are taken
+  in descending order of their largest possible contribution, and once the
+  remaining terms cannot lift an unseen case into the top-k, common terms only
+  update existing candidates. Most pairs of cases share some frequent term, so
+  this is what keeps the build well below the N² of scoring every pair, while
+  staying exact.
+* ``numpy`` scores a block of cases at once as one sparse matrix product
+  against the view's term x document matrix (SciPy; ``NumpyScorer``).
+
+Both return exactly the exhaustive ranking. Blocks of consecutive doc ids are
+independent, so a build fans them out over worker processes (see
+``scripts/build_index.py``). The graph is stored as two doc-major sections of
+``k`` entries per document, ``knn_docs`` (``NO_NEIGHBOR`` past the last
+neighbour) and ``knn_scores``, plus ``case_id_order``, the doc ids sorted by
+case id, so ``neighbors`` finds a case by binary search and reads its ``k``
+entries directly.
+"""
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .scoring import MaxScoreScorer, NumpyScorer, _installed
+
+KNN_DEFAULTS = {"k": 10}
+# Marks the unused tail of a case's row: it has fewer than k cases sharing a term with it.
+NO_NEIGHBOR = 0xFFFFFFFF
+KNN_BACKENDS = ("maxscore", "numpy")
+
+
+class CosineView:
+    """An index's TF-IDF postings with each weight divided by its document's norm.
+
+    Scorers read it like ``Bm25View``: norms of 1 and per-term maxima in
+    ``max_impacts`` for MaxScore. The normalized weights are one array the size
+    of the postings.
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.num_docs = index.num_docs
+        self.num_terms = index.num_terms
+        self.live = index.live
+        self.doc_norms = array("d", [1.0]) * index.num_docs
+        self.term_offsets = index.term_offsets
+        self.post_docs = index.post_docs
+        norms = index.doc_norms
+        self.post_weights = array("d", (w / norms[d] for d, w in zip(index.post_docs, index.post_weights)))
+        self.max_impacts = array("d", bytes(8 * self.num_terms))
+        for term_id in range(self.num_terms):
+            start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            if end > start:
+                self.max_impacts[term_id] = max(self.post_weights[start:end])
+
+    def postings(self, term_id: int):
+        start, end = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+        return self.post_docs[start:end], self.post_weights[start:end]
+
+    def query(self, doc_id: int) -> Dict[int, float]:
+        """The document's normalized weights keyed by term id, largest possible contribution first."""
+        index = self.index
+        start, end = index.doc_offsets[doc_id], index.doc_offsets[doc_id + 1]
+        length, norm = index.doc_lengths[doc_id], index.doc_norms[doc_id]
+        terms = []
+        for term_id, count in zip(index.doc_terms[start:end], index.doc_counts[start:end]):
+            weight = (count / length) * index.idf[term_id] / norm
+            if weight:
+                terms.append((term_id, weight))
+        # As the retriever orders BM25 queries for MaxScore; ties by term id.
+        terms.sort(key=lambda x: (-x[1] * self.max_impacts[x[0]], x[0]))
+        return dict(terms)
+
+
+def resolve_backend(backend: str = "auto") -> str:
+    """``auto`` picks NumPy when it is installed (SciPy makes blocks one product), else MaxScore."""
+    if backend == "auto":
+        return "numpy" if _installed("numpy") else "maxscore"
+    if backend not in KNN_BACKENDS:
+        raise ValueError(f"unknown related-cases backend {backend!r}; expected one of {list(KNN_BACKENDS)}")
+    if backend == "numpy" and not _installed("numpy"):
+        raise ValueError("the numpy related-cases backend requires NumPy")
+    return backend
+
+
+class GraphBuilder:
+    """Top-``k`` neighbour rows for blocks of documents of one index."""
+
+    def __init__(self, index, k: int = KNN_DEFAULTS["k"], backend: str = "auto", view: Optional[CosineView] = None):
+        if k < 1:
+            raise ValueError(f"related cases need k >= 1, not {k}")
+        self.k = k
+        self.view = view if view is not None else CosineView(index)
+        self.backend = resolve_backend(backend)
+        self.scorer = MaxScoreScorer(self.view) if self.backend == "maxscore" else NumpyScorer(self.view)
+
+    def block(self, lo: int, hi: int) -> Tuple[array, array]:
+        """``knn_docs`` and ``knn_scores`` rows for doc ids ``[lo, hi)``."""
+        k, view = self.k, self.view
+        live = view.live
+        docs, scores = array("I"), array("d")
+        wanted = [d for d in range(lo, hi) if live is None or live[d]]
+        queries = [(view.query(d), 1.0) for d in wanted]
+        rankings = dict(zip(wanted, self.scorer.rank_batch(queries, k + 1)))
+        for doc_id in range(lo, hi):
+            row = [(d, s) for d, s in rankings.get(doc_id, ()) if d != doc_id and s > 0][:k]
+            docs.extend(d for d, _ in row)
+            scores.extend(s for _, s in row)
+            missing = k - len(row)
+            docs.extend([NO_NEIGHBOR] * missing)
+            scores.extend([0.0] * missing)
+        return docs, scores
+
+
+def case_id_order(case_ids: Sequence[str]) -> array:
+    """Doc ids sorted by case id (UTF-8 bytes, then doc id), for binary search."""
+    return array("I", sorted(range(len(case_ids)), key=lambda d: (case_ids[d].encode("utf-8"), d)))
+
+
+def neighbors(index, doc_id: int, k: int) -> List[Tuple[int, float]]:
+    """Up to ``k`` stored ``(doc id, cosine)`` neighbours of ``doc_id``, most similar first."""
+    stored = index.info["knn"]["k"]
+    start = doc_id * stored
+    docs = index.knn_docs[start : start + min(k, stored)]
+    scores = index.knn_scores[start : start + min(k, stored)]
+    return [(d, s) for d, s in zip(docs, scores) if d != NO_NEIGHBOR]
@@ -0,0 +1,155 @@
+"""Random-hyperplane (SimHash) signatures for approximate retrieval.
+
+Every term hashes (BLAKE2b, keyed by ``seed``) to one pseudo-random sign per
+hyperplane. A weighted vector's signature bit is 1 where the weighted sum of
+its terms' signs is positive, so two vectors agree on a bit with probability
+``1 - angle / pi``. The signature is cut into ``tables`` keys of ``bits`` bits;
+each table buckets documents by key, and a query's candidates are the
+documents sharing a bucket with it in any table. Multi-probe also visits the
+buckets one bit away along the query's least certain bits, which buys recall
+without more tables.
+
+More tables raise recall and the candidate count; more bits per table make
+buckets smaller, trading recall for speed.
+
+Weights are quantized to 1..255 relative to the vector's largest weight, and
+the per-bit sums are accumulated for all bits at once in one big integer
+holding a counter lane per bit, so hashing a document costs one multiply-add
+per term rather than one per term and bit.
+"""
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from hashlib import blake2b
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+_LANE = 32  # bits per counter lane (an "I" array item); sums stay below 2**32 for any realistic document
+# _SPREAD[byte]: the byte's 8 bits moved to the low bit of 8 consecutive lanes.
+_SPREAD = [sum(((v >> i) & 1) << (_LANE * i) for i in range(8)) for v in range(256)]
+
+LSH_DEFAULTS = {"tables": 16, "bits": 6, "seed": 0}
+
+
+class SimHasher:
+    """Signatures of ``tables * bits`` random-hyperplane bits over weighted terms."""
+
+    def __init__(self, tables: int = LSH_DEFAULTS["tables"], bits: int = LSH_DEFAULTS["bits"], seed: int = LSH_DEFAULTS["seed"]):
+        if tables < 1 or not 1 <= bits <= 32:
+            raise ValueError(f"LSH needs at least one table of 1-32 bits, not {tables} x {bits}")
+        if tables * bits > 512:
+            raise ValueError(f"LSH signatures are at most 512 bits, not {tables} x {bits}")
+        self.tables = tables
+        self.bits = bits
+        self.seed = seed
+        self.num_bits = tables * bits
+        self._digest_size = (self.num_bits + 7) // 8
+        self._key = seed.to_bytes(8, "little")
+        self._term_lanes_cached = lru_cache(maxsize=1 << 16)(self._term_lanes)
+
+    def __eq__(self, other):
+        return isinstance(other, SimHasher) and self.config() == other.config()
+
+    def __repr__(self):
+        return f"SimHasher(tables={self.tables}, bits={self.bits}, seed={self.seed})"
+
+    def config(self) -> Dict:
+        return {"tables": self.tables, "bits": self.bits, "seed": self.seed}
+
+    @classmethod
+    def from_config(cls, config: Dict) -> "SimHasher":
+        return cls(**dict(LSH_DEFAULTS, **(config or {})))
+
+    def __getstate__(self) -> Dict:
+        # The memoized term lanes are a cache; workers rebuild their own.
+        return self.config()
+
+    def __setstate__(self, state: Dict) -> None:
+        self.__init__(**state)
+
+    def _term_lanes(self, term: str) -> int:
+        digest = blake2b(term.encode("utf-8"), digest_size=self._digest_size, key=self._key).digest()
+        out = 0
+        for j, byte in enumerate(digest):
+            if byte:
+                out |= _SPREAD[byte] << (_LANE * 8 * j)
+        return out
+
+    def _lanes(self, terms: Iterable[str], weights: Iterable[float]) -> Tuple[array, int]:
+        """Per hyperplane, the summed quantized weight of the terms with a + sign; and the total weight."""
+        terms, weights = list(terms), list(weights)
+        top = max(weights, default=0.0)
+        acc = total = 0
+        if top > 0:
+            lanes = self._term_lanes_cached
+            for term, weight in zip(terms, weights):
+                if weight <= 0:
+                    continue
+                q = max(1, round(255 * weight / top))
+                acc += q * lanes(term)
+                total += q
+        # The digest's bits beyond ``num_bits`` fill lanes that are ignored.
+        out = array("I", acc.to_bytes(32 * self._digest_size, "little"))
+        if sys.byteorder == "big":
+            out.byteswap()
+        return out[: self.num_bits], total
+
+    def margins(self, terms: Iterable[str], weights: Iterable[float]) -> List[int]:
+        """Per hyperplane, the quantized weighted sum of the terms' signs (positive: bit set)."""
+        lanes, total = self._lanes(terms, weights)
+        return [2 * a - total for a in lanes]
+
+    def _signature(self, lanes: array, total: int) -> int:
+        # Bit b is set when the + signs outweigh the - signs: 2 * lanes[b] > total.
+        half = total // 2
+        return int("".join(["1" if a > half else "0" for a in reversed(lanes)]), 2)
+
+    def _split(self, signature: int) -> List[int]:
+        mask = (1 << self.bits) - 1
+        return [(signature >> (t * self.bits)) & mask for t in range(self.tables)]
+
+    def signature(self, terms: Iterable[str], weights: Iterable[float]) -> int:
+        """The ``tables * bits``-bit signature; table ``t``'s key is bits ``[t * bits, (t + 1) * bits)``."""
+        return self._signature(*self._lanes(terms, weights))
+
+    def keys(self, terms: Iterable[str], weights: Iterable[float]) -> List[int]:
+        """The vector's bucket key in each table."""
+        return self._split(self.signature(terms, weights))
+
+    def probe_keys(self, terms: Iterable[str], weights: Iterable[float], probes: int = 0) -> List[List[int]]:
+        """Per table, the query's key and then ``probes`` keys with one of its least certain bits flipped."""
+        lanes, total = self._lanes(terms, weights)
+        keys = self._split(self._signature(lanes, total))
+        if not probes:
+            return [[key] for key in keys]
+        doubt = [abs(2 * a - total) for a in lanes]
+        out = []
+        for t, key in enumerate(keys):
+            table = doubt[t * self.bits : (t + 1) * self.bits]
+            # sorted() is stable, so equally uncertain bits are flipped low bit first.
+            flips = sorted(range(self.bits), key=table.__getitem__)[:probes]
+            out.append([key] + [key ^ (1 << i) for i in flips])
+        return out
+
+
+def bucket_tables(keys: Sequence[int], tables: int) -> Tuple[array, array]:
+    """Per-table (key, doc id) sorted bucket arrays from doc-major ``keys`` (``tables`` per document).
+
+    Both results hold ``tables`` consecutive blocks of one entry per document.
+    """
+    num_docs = len(keys) // tables
+    table_keys, table_docs = array("I"), array("I")
+    for t in range(tables):
+        column = keys[t::tables]
+        order = sorted(range(num_docs), key=column.__getitem__)
+        table_docs.extend(order)
+        table_keys.extend(column[d] for d in order)
+    return table_keys, table_docs
+
+
+def bucket(table_keys: Sequence[int], table_docs: Sequence[int], num_docs: int, table: int, key: int) -> Sequence[int]:
+    """Doc ids in ``table``'s bucket ``key``."""
+    start = table * num_docs
+    lo = bisect_left(table_keys, key, start, start + num_docs)
+    hi = bisect_right(table_keys, key, lo, start + num_docs)
+    return table_docs[lo:hi]
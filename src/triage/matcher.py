@@ -0,0 +1,73 @@
+from collections import deque
+from typing import Dict, Hashable, Iterable, List, Sequence, Set
+
+
+class KeywordAutomaton:
+    """Aho–Corasick automaton reporting which keyword patterns occur in a text.
+
+    Matching follows ``pattern in text`` semantics (plain substring, case-sensitive),
+    but every pattern is found in a single left-to-right pass over the text.
+    Patterns and text may also be tuples of words: the automaton is then a phrase
+    trie over whole tokens, so ``("ate",)`` matches ``("the", "ate", "editor")``
+    but not ``("translate",)``.
+    """
+
+    def __init__(self, patterns: Iterable[Sequence[Hashable]]):
+        self.patterns: List[Sequence[Hashable]] = []
+        self._always: Set[Sequence[Hashable]] = set()
+        self._goto: List[Dict[Hashable, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Set[Sequence[Hashable]]] = [set()]
+
+        seen: Set[Sequence[Hashable]] = set()
+        for pattern in patterns:
+            if pattern in seen:
+                continue
+            seen.add(pattern)
+            if not pattern:
+                # "" in text is always True.
+                self._always.add(pattern)
+                continue
+            self.patterns.append(pattern)
+            self._add(pattern)
+        self._link()
+
+    def _add(self, pattern: Sequence[Hashable]) -> None:
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(set())
+            state = nxt
+        self._out[state].add(pattern)
+
+    def _link(self) -> None:
+        goto, fail, out = self._goto, self._fail, self._out
+        # Depth-1 states fail to the root; deeper states are linked breadth-first.
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] |= out[fail[nxt]]
+
+    def find(self, text: Sequence[Hashable]) -> Set[Sequence[Hashable]]:
+        """Return the set of patterns that occur anywhere in ``text``."""
+        found = set(self._always)
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found |= out[state]
+        return found
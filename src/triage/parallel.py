@@ -0,0 +1,133 @@
+import multiprocessing
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .pipeline import Pipeline, load_default_pipeline
+from .schema import PipelineOutput
+from .timing import StageTimer
+
+# Set in the parent before the pool forks so workers inherit the loaded index
+# copy-on-write instead of receiving it pickled with every task.
+_PIPELINE: Optional[Pipeline] = None
+_DONE = object()
+
+
+def _init_worker(base_dir: Optional[Path], pipeline_kwargs: Dict) -> None:
+    global _PIPELINE
+    if _PIPELINE is None:
+        # Spawn-only platforms: load once per worker process, with the parent's settings.
+        _PIPELINE = load_default_pipeline(base_dir, **pipeline_kwargs)
+    # A forked worker starts from the parent's counts; report only its own.
+    if _PIPELINE.timer is not None:
+        _PIPELINE.timer.take()
+    if _PIPELINE.cache is not None:
+        _PIPELINE.cache.take_counters()
+
+
+def _run_chunk(texts: List[str]) -> Tuple[List[str], Optional[Dict], Optional[Dict]]:
+    """JSON lines for ``texts``, plus the stage timings and cache counters they added in this worker."""
+    timer, cache = _PIPELINE.timer, _PIPELINE.cache
+    lines = list(_json_lines((_PIPELINE.run(text) for text in texts), timer))
+    return lines, timer.take() if timer is not None else None, cache.take_counters() if cache is not None else None
+
+
+def _json_lines(outputs: Iterable[PipelineOutput], timer: Optional[StageTimer]) -> Iterator[str]:
+    """``json()`` of each output; with a timer, its cost is recorded as the ``serialize`` stage."""
+    for output in outputs:
+        if timer is None:
+            yield output.json()
+            continue
+        t0 = perf_counter()
+        line = output.json()
+        timer.record({"serialize": perf_counter() - t0})
+        yield line
+
+
+def pool_context():
+    """Prefer ``fork`` so workers inherit already-loaded read-only state."""
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+
+def imap_bounded(pool, fn: Callable[[Any], Any], items: Iterable[Any], max_pending: int) -> Iterator[Any]:
+    """Like ``pool.imap`` but with at most ``max_pending`` tasks submitted at once.
+
+    ``Pool.imap`` drains its input eagerly; this keeps input consumption (and
+    memory) proportional to the window while still yielding results in order.
+    """
+    it = iter(items)
+    pending = deque()
+    while True:
+        while len(pending) < max_pending:
+            item = next(it, _DONE)
+            if item is _DONE:
+                break
+            pending.append(pool.apply_async(fn, (item,)))
+        if not pending:
+            return
+        yield pending.popleft().get()
+
+
+def _chunks(texts: Iterable[str], chunk_size: int) -> Iterator[List[str]]:
+    it = iter(texts)
+    while True:
+        chunk = list(islice(it, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_batch_parallel(
+    texts: Iterable[str],
+    workers: int,
+    pipeline: Optional[Pipeline] = None,
+    base_dir: Optional[Path] = None,
+    chunk_size: int = 256,
+    pipeline_kwargs: Optional[Dict] = None,
+) -> Iterator[str]:
+    """Triage ``texts`` across ``workers`` processes, yielding JSON lines in input order.
+
+    ``pipeline_kwargs`` are the ``load_default_pipeline`` arguments the pipeline
+    is (or was) loaded with from ``base_dir``. With the ``fork`` start method the
+    already-loaded ``pipeline`` is shared with workers read-only; otherwise each
+    worker loads its own from ``base_dir`` and ``pipeline_kwargs`` (a cache or
+    timer among them arrives empty), so a ``pipeline`` passed without its
+    ``pipeline_kwargs`` is rejected there rather than silently replaced by a
+    default one. At most ``2 * workers`` chunks are in flight, so input is
+    consumed lazily. Each chunk's stage timings and cache counters are added to
+    the parent's timer and cache, so their summaries cover every worker (cache
+    ``size`` is each worker's own and is not summed).
+    """
+    global _PIPELINE
+    loader_kwargs = pipeline_kwargs or {}
+    if workers <= 1:
+        pipeline = pipeline or load_default_pipeline(base_dir, **loader_kwargs)
+        yield from _json_lines(pipeline.run_batch(texts, chunk_size=chunk_size), pipeline.timer)
+        return
+
+    ctx = pool_context()
+    if ctx.get_start_method() == "fork":
+        _PIPELINE = pipeline = pipeline or load_default_pipeline(base_dir, **loader_kwargs)
+    elif pipeline is not None and pipeline_kwargs is None:
+        raise ValueError(
+            f"{ctx.get_start_method()!r} workers cannot share the given pipeline; "
+            "pass the load_default_pipeline arguments it was loaded with as pipeline_kwargs"
+        )
+
+    # Worker timings and cache counters are merged into the parent's own objects.
+    timer = pipeline.timer if pipeline is not None else loader_kwargs.get("timer")
+    cache = pipeline.cache if pipeline is not None else loader_kwargs.get("cache")
+    try:
+        with ctx.Pool(workers, initializer=_init_worker, initargs=(base_dir, loader_kwargs)) as pool:
+            for lines, timings, counters in imap_bounded(pool, _run_chunk, _chunks(texts, chunk_size), 2 * workers):
+                if timer is not None and timings:
+                    timer.merge(timings)
+                if cache is not None and counters:
+                    cache.add_counters(counters)
+                yield from lines
+    finally:
+        _PIPELINE = None
@@ -1,14 +1,21 @@
 from dataclasses import dataclass
 from datetime import datetime, timezone
+from itertools import islice
 from pathlib import Path
-from typing import Dict
+from time import perf_counter
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import json
 
 from .action_plan import ActionPlanner
-from .retriever_tfidf import TfidfRetriever
-from .rule_classifier import RuleClassifier
-from .schema import PipelineOutput, Query, TriageResult, Citation, ActionPlan, Meta, Signal
+from .cache import ResultCache
+from .config_bundle import ConfigBundle, load_config
+from .rule_classifier import RuleClassifier, normalize_text
+from .schema import PipelineOutput, Query, TriageResult, Citation, ActionPlan, Meta
+from .timing import StageTimer
+
+if TYPE_CHECKING:  # the retriever (and its scoring backends) is imported only when an index is loaded
+    from .retriever_tfidf import TfidfRetriever
 
 
 @dataclass
@@ -36,28 +43,117 @@ def load_yaml(path: Path) -> Dict:
 
 
 class Pipeline:
-    def __init__(self, classifier: RuleClassifier, retriever: TfidfRetriever, planner: ActionPlanner, versions: PipelineVersions):
-        self.classifier = classifier
+    def __init__(
+        self,
+        classifier: RuleClassifier,
+        retriever: Optional["TfidfRetriever"],
+        planner: ActionPlanner,
+        versions: PipelineVersions,
+        cache: Optional[ResultCache] = None,
+        timer: Optional[StageTimer] = None,
+        partition_confidence: Optional[float] = None,
+    ):
+        # Classifier, planner, versions and the config version are swapped together
+        # as one tuple, and each run reads it once, so a request never mixes two
+        # configurations.
+        self._config = (classifier, planner, versions, versions.rules_version)
         self.retriever = retriever
-        self.planner = planner
-        self.versions = versions
+        self.cache = cache
+        self.timer = timer
+        # Triage at least this confident searches the predicted category's partition first.
+        self.partition_confidence = partition_confidence
+
+    @property
+    def classifier(self) -> RuleClassifier:
+        return self._config[0]
+
+    @property
+    def planner(self) -> ActionPlanner:
+        return self._config[1]
+
+    @property
+    def versions(self) -> PipelineVersions:
+        return self._config[2]
+
+    @versions.setter
+    def versions(self, versions: PipelineVersions) -> None:
+        self._config = (self._config[0], self._config[1], versions, self._config[3])
+
+    @property
+    def config_version(self) -> str:
+        """Version of the whole configuration (the bundle's, covering rules and playbooks)."""
+        return self._config[3]
+
+    @config_version.setter
+    def config_version(self, config_version: str) -> None:
+        self._config = self._config[:3] + (config_version,)
+
+    def swap_config(self, bundle: ConfigBundle) -> None:
+        """Atomically switch to ``bundle``'s classifier and planner; in-flight runs finish on the old ones."""
+        versions = PipelineVersions(rules_version=bundle.rules_version, index_version=self.versions.index_version)
+        self._config = (bundle.classifier, bundle.planner, versions, bundle.version)
+
+    def _search(self, query_text: str, triage: TriageResult) -> List[Citation]:
+        # Classify-only pipelines have no retriever and cite nothing.
+        if self.retriever is None:
+            return []
+        partition = None
+        if self.partition_confidence is not None and triage.confidence >= self.partition_confidence:
+            partition = ("category", triage.category)
+        return self.retriever.citations(query_text, top_k=5, partition=partition)
+
+    def _compute(
+        self, query_text: str, classifier: RuleClassifier, planner: ActionPlanner, timings: Optional[Dict[str, float]] = None
+    ) -> Tuple[TriageResult, List[Citation], ActionPlan]:
+        # Components build the schema objects themselves, so results are cached
+        # and assembled as-is; outputs from the cache share them read-only.
+        if timings is None:
+            triage = classifier.triage(query_text)
+            return triage, self._search(query_text, triage), planner.plan(triage.category, triage.confidence)
+
+        t0 = perf_counter()
+        triage = classifier.triage(query_text)
+        t1 = perf_counter()
+        citations = self._search(query_text, triage)
+        t2 = perf_counter()
+        action_plan = planner.plan(triage.category, triage.confidence)
+        t3 = perf_counter()
+        timings["classify"] = t1 - t0
+        timings["search"] = t2 - t1
+        timings["plan"] = t3 - t2
+        return triage, citations, action_plan
 
     def run(self, query_text: str) -> PipelineOutput:
-        triage_raw = self.classifier.classify(query_text)
-        citations_raw = self.retriever.search(query_text, top_k=5)
-        action_plan_raw = self.planner.generate(triage_raw.get("category"), triage_raw.get("confidence", 0.0))
-
-        signals = [Signal(**s) for s in triage_raw.get("signals", [])]
-        triage = TriageResult(category=triage_raw.get("category"), confidence=triage_raw.get("confidence", 0.0), signals=signals)
-        citations = [Citation(**c) for c in citations_raw]
-        action_plan = ActionPlan(**action_plan_raw)
+        # Timing is opt-in; with no timer attached the only cost is this check.
+        timings = None
+        if self.timer is not None:
+            timings = {}
+            start = perf_counter()
+
+        classifier, planner, versions, config_version = self._config
+        if self.cache is None:
+            triage, citations, action_plan = self._compute(query_text, classifier, planner, timings)
+        else:
+            # Classifier and retriever both normalize first, so equal normalized
+            # text under the same versions always yields the same result. The
+            # config version covers the playbooks, which rules_version does not.
+            version_key = (versions.rules_version, versions.index_version, config_version)
+            self.cache.bind_versions(version_key)
+            key = (normalize_text(query_text),) + version_key
+            cached = self.cache.get(key)
+            if cached is None:
+                cached = self._compute(query_text, classifier, planner, timings)
+                self.cache.put(key, cached)
+            triage, citations, action_plan = cached
+
+        if timings is not None:
+            assemble_start = perf_counter()
         meta = Meta(
             generated_at=now_iso8601(),
-            rules_version=self.versions.rules_version,
-            index_version=self.versions.index_version,
+            rules_version=versions.rules_version,
+            index_version=versions.index_version,
         )
-
-        return PipelineOutput(
+        output = PipelineOutput(
             query=Query(text=query_text),
             triage=triage,
             citations=citations,
@@ -65,22 +161,89 @@ class Pipeline:
             meta=meta,
         )
 
-
-def load_default_pipeline(base_dir: Path = None) -> Pipeline:
-    base_dir = base_dir or Path(__file__).resolve().parents[2]
-    rules_cfg = load_yaml(base_dir / "configs" / "rules.yaml")
-    playbooks_cfg = load_yaml(base_dir / "configs" / "playbooks.yaml")
-
-    index_path = base_dir / "artifacts" / "tfidf.joblib"
+        if timings is not None:
+            end = perf_counter()
+            timings["assemble"] = end - assemble_start
+            timings["total"] = end - start
+            self.timer.record(timings)
+            meta.timings = {f"{stage}_ms": round(seconds * 1e3, 4) for stage, seconds in timings.items()}
+        return output
+
+    def run_batch(self, texts: Iterable[str], chunk_size: int = 256) -> Iterator[PipelineOutput]:
+        """Triage ``texts`` lazily, pulling at most ``chunk_size`` queries at a time.
+
+        Outputs are yielded in input order; the input iterable is never materialized,
+        so memory stays flat for arbitrarily large streams.
+        """
+        it = iter(texts)
+        while True:
+            chunk = list(islice(it, chunk_size))
+            if not chunk:
+                return
+            for text in chunk:
+                yield self.run(text)
+
+
+def load_retriever(base_dir: Path, **kwargs) -> "TfidfRetriever":
+    """Open ``base_dir``'s index; ``kwargs`` go to ``TfidfRetriever``."""
+    from .retriever_tfidf import TfidfRetriever
+
+    index_path = base_dir / "artifacts" / "tfidf.idx"
     if not index_path.exists():
-        raise FileNotFoundError(f"Index file not found at {index_path}. Please run scripts/build_index.py first.")
-
-    classifier = RuleClassifier(rules_cfg)
-    retriever = TfidfRetriever(index_path)
-    planner = ActionPlanner(playbooks_cfg)
-
-    versions = PipelineVersions(
-        rules_version=rules_cfg.get("version", ""),
-        index_version=retriever.index_version,
+        # Fall back to an index pickled by older builds.
+        legacy_path = base_dir / "artifacts" / "tfidf.joblib"
+        if not legacy_path.exists():
+            raise FileNotFoundError(f"Index file not found at {index_path}. Please run scripts/build_index.py first.")
+        index_path = legacy_path
+    return TfidfRetriever(index_path, **kwargs)
+
+
+def load_default_pipeline(
+    base_dir: Path = None,
+    cache: Optional[ResultCache] = None,
+    timer: Optional[StageTimer] = None,
+    max_per_topic: Optional[int] = None,
+    ranking: str = "tfidf",
+    backend: str = "auto",
+    classify_only: bool = False,
+    partition_confidence: Optional[float] = None,
+    partition_floor: Optional[float] = None,
+    approximate: bool = False,
+    lsh_probes: int = 0,
+) -> Pipeline:
+    """The pipeline over ``base_dir``'s configs and index.
+
+    ``classify_only`` skips the index entirely: outputs carry no citations and an
+    empty ``index_version``. ``backend`` picks the scoring backend (see ``scoring``).
+    With ``partition_confidence``, queries triaged at least that confidently are
+    searched in their category's partition first (the index must be partitioned;
+    see ``TfidfRetriever.citations`` for ``partition_floor``); the setting is
+    part of ``index_version``. ``approximate`` searches by LSH candidates with
+    ``lsh_probes`` extra buckets per table (the index must be built with ``--lsh``).
+    """
+    base_dir = base_dir or Path(__file__).resolve().parents[2]
+    # The compiled bundle from scripts/build_config.py when it is current, else the configs themselves.
+    config = load_config(base_dir / "configs", base_dir / "artifacts" / "config.bundle")
+    retriever = None
+    index_version = ""
+    if not classify_only:
+        retriever = load_retriever(
+            base_dir,
+            max_per_topic=max_per_topic,
+            ranking=ranking,
+            backend=backend,
+            partition_floor=partition_floor,
+            approximate=approximate,
+            lsh_probes=lsh_probes,
+        )
+        index_version = retriever.index_version
+        if partition_confidence is not None:
+            if not getattr(retriever.index, "partition_names", None):
+                raise ValueError(f"{retriever.index_path} is not partitioned; rebuild it with scripts/build_index.py")
+            index_version += f"+part@{partition_confidence:g}/{retriever.partition_floor:g}"
+    versions = PipelineVersions(rules_version=config.rules_version, index_version=index_version)
+    pipeline = Pipeline(
+        config.classifier, retriever, config.planner, versions, cache=cache, timer=timer, partition_confidence=partition_confidence
     )
-    return Pipeline(classifier, retriever, planner, versions)
+    pipeline.config_version = config.version
+    return pipeline
@@ -1,9 +1,19 @@
 import math
-import pickle
+from collections import Counter
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional, Tuple
 
-from .rule_classifier import normalize_text
+from .analyzer import Analyzer
+from .dedup import topic_key
+from .index_store import open_index
+from .knn import neighbors
+from .schema import Citation
+from .scoring import complement_runs, make_lsh_scorer, make_scorer, merge_rankings
+
+# Default score floor for partitioned search, per ranking: a partition's results
+# stand only if all top-k clear it (TF-IDF scores are cosines, BM25 sums of impacts).
+PARTITION_FLOORS = {"tfidf": 0.15, "bm25": 12.0}
 
 
 def make_snippet(problem: str, solution: str, max_len: int = 240) -> str:
@@ -17,42 +27,194 @@ def make_snippet(problem: str, solution: str, max_len: int = 240) -> str:
 
 
 class TfidfRetriever:
-    def __init__(self, index_path: Path):
+    def __init__(
+        self,
+        index_path: Path,
+        max_per_topic: Optional[int] = None,
+        backend: str = "auto",
+        ranking: str = "tfidf",
+        analyzer: Optional[Analyzer] = None,
+        partition_floor: Optional[float] = None,
+        approximate: bool = False,
+        lsh_probes: int = 0,
+    ):
         self.index_path = Path(index_path)
-        with self.index_path.open("rb") as f:
-            self.index = pickle.load(f)
-        self.index_version = self.index.get("index_version", "")
+        self.index = open_index(self.index_path)
+        # Queries must be analyzed exactly like the indexed cases were.
+        self.analyzer = Analyzer.from_config(self.index.info.get("analyzer"))
+        if analyzer is not None and analyzer != self.analyzer:
+            raise ValueError(f"{self.index_path} was built with {self.analyzer!r}, not {analyzer!r}; rebuild the index")
+        self.ranking = ranking
+        # Results depend on the ranking, so it is part of the version stamped on outputs and cache keys.
+        self.index_version = self.index.index_version if ranking == "tfidf" else f"{self.index.index_version}+{ranking}"
+        self.max_per_topic = max_per_topic
+        self.backend = backend
+        # Approximate mode scores only LSH candidates (index built with --lsh); partitions stay exact.
+        self.approximate = approximate
+        if approximate:
+            self.scorer = make_lsh_scorer(self.index, ranking, lsh_probes)
+            self.index_version += f"+lsh@{lsh_probes}"
+        else:
+            self.scorer = make_scorer(self.index, backend, ranking)
+        self.partition_floor = PARTITION_FLOORS[ranking] if partition_floor is None else partition_floor
+        # (field, name) -> (partition scorer, scorer for the rest of the index), built on first use.
+        self._partition_scorers: Dict[Tuple[str, str], Tuple] = {}
+        # Partitioned searches run, and how many of them had to widen to the full corpus.
+        self.partition_searches = 0
+        self.partition_widened = 0
+        # Query vocabularies are heavily skewed; memoize query analysis and the vocabulary lookup.
+        self._analyze = lru_cache(maxsize=4096)(self.analyzer.tokens)
+        self._term_id = lru_cache(maxsize=65536)(self.index.term_id)
+
+    def query_vector(self, query_text: str) -> Tuple[Dict[int, float], float]:
+        """Weights of the query's indexed terms, keyed by term id, and their norm.
 
-    def search(self, query_text: str, top_k: int = 5) -> List[Dict]:
-        q = normalize_text(query_text)
-        q_tokens = q.split()
+        TF-IDF ranking weights terms by length-normalized TF x IDF; BM25 uses plain
+        query term counts (IDF is already folded into the stored impacts) and no norm.
+        """
+        index = self.index
+        q_tokens = self._analyze(query_text)
         tf = {}
         for t in q_tokens:
             tf[t] = tf.get(t, 0) + 1
-        idf = self.index.get("idf", {})
-        q_vec = {t: (c / len(q_tokens)) * idf.get(t, 0.0) for t, c in tf.items() if t in idf}
+        q_vec = {}
+        if self.ranking == "bm25":
+            terms = [(term_id, float(c)) for term_id, c in ((self._term_id(t), c) for t, c in tf.items()) if term_id >= 0]
+            max_impacts = index.bm25_max_impacts
+            # Highest-impact terms first, so MaxScore can stop admitting candidates early.
+            terms.sort(key=lambda x: (-x[1] * max_impacts[x[0]], x[0]))
+            return dict(terms), 1.0
+        for t, c in tf.items():
+            term_id = self._term_id(t)
+            # An IDF of 0 marks a term whose documents have all been deleted.
+            if term_id >= 0 and index.idf[term_id]:
+                q_vec[term_id] = (c / len(q_tokens)) * index.idf[term_id]
         q_norm = math.sqrt(sum(v * v for v in q_vec.values())) or 1.0
+        return q_vec, q_norm
+
+    def _topic_filter(self, cap: Optional[int], metas: Dict[int, Dict]):
+        """An ``admit(doc_id)`` predicate allowing at most ``cap`` documents per thread."""
+        if not cap:
+            return None
+        per_topic: Counter = Counter()
+
+        def admit(idx: int) -> bool:
+            m = metas[idx] = self.index.meta(idx)
+            topic = topic_key(m.get("topic_url"))
+            if per_topic[topic] >= cap:
+                return False
+            per_topic[topic] += 1
+            return True
 
-        scores = []
-        for idx, (doc_vec, doc_norm) in enumerate(zip(self.index["doc_vectors"], self.index["doc_norms"])):
-            dot = sum(q_vec.get(term, 0.0) * doc_vec.get(term, 0.0) for term in q_vec.keys())
-            score = dot / (q_norm * doc_norm)
-            scores.append((idx, score))
-
-        scores.sort(key=lambda x: x[1], reverse=True)
-        top = scores[:top_k]
-        citations: List[Dict] = []
-        for i, sc in top:
-            m = self.index["meta"][i]
+        return admit
+
+    def _citations(self, ranking, metas: Dict[int, Dict]) -> List[Citation]:
+        citations: List[Citation] = []
+        for i, sc in ranking:
+            m = metas.get(i) or self.index.meta(i)
             citations.append(
-                {
-                    "case_id": m.get("case_id"),
-                    "source": m.get("source"),
-                    "topic_url": m.get("topic_url"),
-                    "title": m.get("title", ""),
-                    "forum": m.get("forum", ""),
-                    "snippet": make_snippet(m.get("problem", ""), m.get("solution", "")),
-                    "score": float(sc),
-                }
+                Citation(
+                    case_id=m.get("case_id"),
+                    source=m.get("source"),
+                    topic_url=m.get("topic_url"),
+                    title=m.get("title", ""),
+                    forum=m.get("forum", ""),
+                    snippet=make_snippet(m.get("problem", ""), m.get("solution", "")),
+                    score=float(sc),
+                    source_urls=m.get("source_urls") or ([m["topic_url"]] if m.get("topic_url") else []),
+                )
             )
         return citations
+
+    def _partition_scorers_for(self, field: str, name: str) -> Tuple:
+        key = (field, name)
+        if key not in self._partition_scorers:
+            partition = getattr(self.index, "partition", None)
+            runs = partition(field, name) if partition is not None else None
+            if runs is None:
+                self._partition_scorers[key] = (None, None)
+            else:
+                rest = complement_runs(runs, self.index.num_docs)
+                self._partition_scorers[key] = (
+                    make_scorer(self.index, self.backend, self.ranking, runs),
+                    make_scorer(self.index, self.backend, self.ranking, rest) if rest else None,
+                )
+        return self._partition_scorers[key]
+
+    def partition_scorer(self, field: str, name: str):
+        """A scorer over one partition of the index ("category" or "forum"); None if it has no such partition."""
+        return self._partition_scorers_for(field, name)[0]
+
+    def citations(
+        self,
+        query_text: str,
+        top_k: int = 5,
+        max_per_topic: Optional[int] = None,
+        partition: Optional[Tuple[str, str]] = None,
+    ) -> List[Citation]:
+        """Top-``top_k`` cases by cosine similarity (or BM25F score with ``ranking="bm25"``).
+
+        ``max_per_topic`` (default: the retriever's setting) caps how many citations
+        may come from the same forum thread; lower-ranked cases from other threads
+        fill the freed slots. With ``partition`` (``(field, name)``, e.g.
+        ``("category", "translation")``) that partition is scored first and its
+        results are kept if all ``top_k`` clear ``partition_floor``. Otherwise
+        the search widens: the rest of the index is scored and merged in, which
+        gives exactly the unpartitioned ranking (with a topic cap the whole
+        index is searched again instead, as the cap spans both).
+        """
+        cap = max_per_topic if max_per_topic is not None else self.max_per_topic
+        q_vec, q_norm = self.query_vector(query_text)
+        scorer, rest = self._partition_scorers_for(*partition) if partition is not None else (None, None)
+        if scorer is not None:
+            self.partition_searches += 1
+            metas: Dict[int, Dict] = {}
+            ranking = scorer.rank(q_vec, q_norm, top_k, self._topic_filter(cap, metas))
+            if len(ranking) >= top_k and all(sc >= self.partition_floor for _, sc in ranking):
+                return self._citations(ranking, metas)
+            self.partition_widened += 1
+            if not cap:
+                if rest is not None:
+                    ranking = merge_rankings([ranking, rest.rank(q_vec, q_norm, top_k)], top_k)
+                return self._citations(ranking, metas)
+        metas = {}
+        ranking = self.scorer.rank(q_vec, q_norm, top_k, self._topic_filter(cap, metas))
+        return self._citations(ranking, metas)
+
+    def citations_batch(
+        self, query_texts: Iterable[str], top_k: int = 5, max_per_topic: Optional[int] = None
+    ) -> List[List[Citation]]:
+        """``citations`` for many queries at once; the NumPy backend scores them as one matrix product."""
+        cap = max_per_topic if max_per_topic is not None else self.max_per_topic
+        queries = [self.query_vector(text) for text in query_texts]
+        metas: Dict[int, Dict] = {}
+        admits = [self._topic_filter(cap, metas) for _ in queries] if cap else ()
+        rankings = self.scorer.rank_batch(queries, top_k, admits)
+        return [self._citations(ranking, metas) for ranking in rankings]
+
+    def related(self, case_id: str, k: int = 5) -> List[Citation]:
+        """The ``k`` indexed cases most similar to case ``case_id`` (TF-IDF cosine), most similar first.
+
+        Read from the related-cases graph stored at build time (``build_index.py
+        --related K``): a binary search for the case, then its first ``k``
+        stored neighbours, so no search runs. Raises ``KeyError`` for a case
+        the index does not hold and ``ValueError`` if the graph is missing or
+        stores fewer than ``k`` neighbours per case.
+        """
+        knn = self.index.info.get("knn")
+        if not knn:
+            raise ValueError(f"{self.index_path} has no related-cases graph; rebuild it with scripts/build_index.py --related K")
+        if k > knn["k"]:
+            raise ValueError(f"{self.index_path} stores {knn['k']} related cases per case, not {k}; rebuild it with --related {k}")
+        doc_id = self.index.doc_id(case_id)
+        if doc_id < 0:
+            raise KeyError(case_id)
+        return self._citations(neighbors(self.index, doc_id, k), {})
+
+    def search(self, query_text: str, top_k: int = 5, max_per_topic: Optional[int] = None) -> List[Dict]:
+        """``citations`` as dicts."""
+        return [c.dict() for c in self.citations(query_text, top_k, max_per_topic)]
+
+    def search_batch(self, query_texts: Iterable[str], top_k: int = 5, max_per_topic: Optional[int] = None) -> List[List[Dict]]:
+        """``citations_batch`` as dicts."""
+        return [[c.dict() for c in cites] for cites in self.citations_batch(query_texts, top_k, max_per_topic)]
@@ -1,7 +1,43 @@
 import re
-from typing import Dict, List, Tuple
+from typing import Dict, Hashable, List, Pattern, Tuple
 
-from .schema import Signal
+try:  # Python 3.11+; sre_parse is a deprecated alias there
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+from .matcher import KeywordAutomaton
+from .schema import Signal, TriageResult
+
+
+# A regex that opens with a plain ``\bword ...\b`` run cannot match unless that
+# literal occurs in the text, so the keyword automaton can prefilter it. A
+# top-level ``|`` lets another branch match without it, so those are not.
+_LEADING_LITERAL_RE = re.compile(r"^\\b([a-z0-9][a-z0-9 ]*)\\b")
+
+
+# Word tokens for ``match: word`` keywords; apostrophes stay inside words ("can't")
+# while hyphens and other punctuation separate them ("multi-currency").
+_WORD_RE = re.compile(r"[\w']+")
+
+MATCH_MODES = ("substring", "word")
+
+
+def words(text: str) -> Tuple[str, ...]:
+    return tuple(_WORD_RE.findall(text))
+
+
+def required_literal(pattern: str) -> str:
+    m = _LEADING_LITERAL_RE.match(pattern)
+    if not m:
+        return ""
+    try:
+        tree = sre_parse.parse(pattern, re.I)
+    except re.error:
+        return ""
+    if any(op is sre_parse.BRANCH for op, _ in tree):
+        return ""
+    return m.group(1)
 
 
 def normalize_text(s: str) -> str:
@@ -18,32 +54,103 @@ class RuleClassifier:
         self.categories = rules_cfg.get("categories", {})
         self.thresholds = rules_cfg.get("thresholds", {})
         self.rules_version = rules_cfg.get("version", "")
+        self._compiled = self._compile(self.categories)
+        keys = [key for _, keywords, _ in self._compiled for key, _, _ in keywords]
+        patterns = [key for key in keys if isinstance(key, str)]
+        patterns += [literal for _, _, regexes in self._compiled for _, literal, _, _ in regexes if literal]
+        self._automaton = KeywordAutomaton(patterns)
+        # ``match: word`` keywords are word tuples: single words are a set lookup,
+        # longer phrases are found by one pass of a phrase automaton over the tokens.
+        phrases = [key for key in keys if isinstance(key, tuple)]
+        self._words = frozenset(key[0] for key in phrases if len(key) == 1)
+        multi = [key for key in phrases if len(key) != 1]
+        self._phrases = KeywordAutomaton(multi) if multi else None
+        # Compiling here validates every regex; unpickled classifiers (config
+        # bundles) start without them and compile each on first use.
+        self._regexes: Dict[str, Pattern] = {
+            source: re.compile(source, flags=re.I) for _, _, regexes in self._compiled for source, _, _, _ in regexes
+        }
+
+    def __getstate__(self) -> Dict:
+        state = dict(self.__dict__)
+        state["_regexes"] = {}
+        return state
+
+    def _regex(self, source: str) -> Pattern:
+        rx = self._regexes.get(source)
+        if rx is None:
+            rx = self._regexes[source] = re.compile(source, flags=re.I)
+        return rx
+
+    @staticmethod
+    def _keyword_key(kw: Dict) -> Hashable:
+        """The pattern for ``match: substring`` (default) or its words for ``match: word``."""
+        mode = kw.get("match", "substring")
+        if mode not in MATCH_MODES:
+            raise ValueError(f"keyword {kw.get('id', '')!r}: unknown match mode {mode!r}")
+        pattern = kw.get("pattern", "")
+        return words(normalize_text(pattern)) if mode == "word" else pattern
+
+    @classmethod
+    def _compile(
+        cls, categories: Dict
+    ) -> List[Tuple[str, List[Tuple[Hashable, str, float]], List[Tuple[str, str, str, float]]]]:
+        compiled = []
+        for cat, rule in categories.items():
+            keywords = [
+                (cls._keyword_key(kw), kw.get("id", ""), float(kw.get("weight", 0.0)))
+                for kw in rule.get("keywords", [])
+            ]
+            regexes = [
+                (
+                    rx.get("pattern", ""),
+                    required_literal(rx.get("pattern", "")),
+                    rx.get("id", ""),
+                    float(rx.get("weight", 0.0)),
+                )
+                for rx in rule.get("regex", [])
+                if rx.get("pattern", "")
+            ]
+            compiled.append((cat, keywords, regexes))
+        return compiled
 
     def classify(self, query_text: str) -> Dict:
+        return self.triage(query_text).dict()
+
+    def triage(self, query_text: str) -> TriageResult:
+        """``classify`` as a ``TriageResult``, the form the pipeline assembles outputs from."""
         q = normalize_text(query_text)
+        found = self._automaton.find(q)
+        if self._words or self._phrases is not None:
+            tokens = words(q)
+            found.update((w,) for w in self._words.intersection(tokens))
+            if self._phrases is not None:
+                found |= self._phrases.find(tokens)
+        # Case-insensitive regexes can match non-ASCII case variants the
+        # lowercased literal would miss, so only prefilter ASCII queries.
+        prefilter = q.isascii()
 
         scored: List[Tuple[str, float, List[Signal]]] = []
-        for cat, rule in self.categories.items():
+        for cat, keywords, regexes in self._compiled:
             score = 0.0
             matched: List[Signal] = []
 
-            for kw in rule.get("keywords", []):
-                if kw.get("pattern", "") in q:
-                    weight = float(kw.get("weight", 0.0))
+            for key, signal_id, weight in keywords:
+                if key in found:
                     score += weight
-                    matched.append(Signal(id=kw.get("id", ""), weight=weight))
+                    matched.append(Signal(id=signal_id, weight=weight))
 
-            for rx in rule.get("regex", []):
-                pattern = rx.get("pattern", "")
-                if pattern and re.search(pattern, q, flags=re.I):
-                    weight = float(rx.get("weight", 0.0))
+            for source, literal, signal_id, weight in regexes:
+                if prefilter and literal and literal not in found:
+                    continue
+                if self._regex(source).search(q):
                     score += weight
-                    matched.append(Signal(id=rx.get("id", ""), weight=weight))
+                    matched.append(Signal(id=signal_id, weight=weight))
 
             scored.append((cat, score, matched))
 
         if not scored:
-            return {"category": "other", "confidence": 0.0, "signals": []}
+            return TriageResult(category="other", confidence=0.0, signals=[])
 
         scored.sort(key=lambda x: x[1], reverse=True)
         top_cat, s1, m1 = scored[0]
@@ -58,8 +165,4 @@ class RuleClassifier:
         if s1 < min_score or conf < min_confidence:
             category = "other"
 
-        return {
-            "category": category,
-            "confidence": conf,
-            "signals": [s.dict() for s in m1],
-        }
+        return TriageResult(category=category, confidence=conf, signals=m1)
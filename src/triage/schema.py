@@ -1,23 +1,96 @@
+"""Pipeline output schema.
+
+The records are plain ``__slots__`` classes rather than dataclasses: one is
+built per signal and citation of every result, and slots keep them small and
+cheap to create. ``dict()`` returns fresh JSON-ready containers.
+``PipelineOutput.json()`` encodes straight from the attributes, producing
+exactly the text of ``json.dumps(output.dict(), ensure_ascii=False,
+default=str)`` without building that dict tree first; ``write(fp)`` streams
+the same text to a file or socket one citation at a time.
+
+``SCHEMA_VERSION`` changes whenever the JSON shape does. 0.2 added
+``citations[].source_urls`` (every URL folded into the cited case) and the
+optional ``meta.timings``; 0.1 output parses with ``source_urls`` empty.
+"""
 import json
-from dataclasses import asdict, dataclass, field
 from datetime import datetime
-from typing import List, Optional
+from json.encoder import encode_basestring
+from typing import Dict, Iterator, List, Optional, TextIO
+
+SCHEMA_VERSION = "0.2"
+
+_INFINITY = float("inf")
+_dumps = json.JSONEncoder(ensure_ascii=False, default=str).encode
+
+
+def _float(value: float) -> str:
+    if value != value:
+        return "NaN"
+    if value == _INFINITY:
+        return "Infinity"
+    if value == -_INFINITY:
+        return "-Infinity"
+    return float.__repr__(value)
+
+
+def _value(value) -> str:
+    """``json.dumps(value, ensure_ascii=False, default=str)`` with fast paths for scalars."""
+    cls = value.__class__
+    if cls is str:
+        return encode_basestring(value)
+    if cls is float:
+        return _float(value)
+    if cls is int:
+        return int.__repr__(value)
+    if value is None:
+        return "null"
+    return _dumps(value)
+
+
+def _strings(values: Optional[List[str]]) -> str:
+    if values is None:
+        return "null"
+    return "[" + ", ".join([_value(v) for v in values]) + "]"
 
 
-@dataclass
-class Signal:
-    id: str
-    weight: float
+class _Record:
+    """Value equality and a dataclass-style repr over ``__slots__``."""
+
+    __slots__ = ()
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    __hash__ = None  # mutable records, like the dataclasses they replaced
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{self.__class__.__name__}({fields})"
+
+
+class Signal(_Record):
+    __slots__ = ("id", "weight")
+
+    def __init__(self, id: str, weight: float):
+        self.id = id
+        self.weight = weight
 
     def dict(self):
-        return asdict(self)
+        return {"id": self.id, "weight": self.weight}
+
+    def _json(self) -> str:
+        return '{"id": ' + _value(self.id) + ', "weight": ' + _value(self.weight) + "}"
 
 
-@dataclass
-class TriageResult:
-    category: str
-    confidence: float
-    signals: List[Signal]
+class TriageResult(_Record):
+    __slots__ = ("category", "confidence", "signals")
+
+    def __init__(self, category: str, confidence: float, signals: List[Signal]):
+        self.category = category
+        self.confidence = confidence
+        self.signals = signals
 
     def dict(self):
         formatted = []
@@ -28,60 +101,136 @@ class TriageResult:
                 formatted.append(s)
         return {"category": self.category, "confidence": self.confidence, "signals": formatted}
 
+    def _json(self) -> str:
+        signals = [s._json() if s.__class__ is Signal else _dumps(s.dict() if hasattr(s, "dict") else s) for s in self.signals]
+        return (
+            '{"category": ' + _value(self.category)
+            + ', "confidence": ' + _value(self.confidence)
+            + ', "signals": [' + ", ".join(signals) + "]}"
+        )
+
+
+class Citation(_Record):
+    __slots__ = ("case_id", "source", "topic_url", "title", "forum", "snippet", "score", "source_urls")
 
-@dataclass
-class Citation:
-    case_id: str
-    source: str
-    topic_url: str
-    title: Optional[str] = ""
-    forum: Optional[str] = ""
-    snippet: str = ""
-    score: float = 0.0
+    def __init__(
+        self,
+        case_id: str,
+        source: str,
+        topic_url: str,
+        title: Optional[str] = "",
+        forum: Optional[str] = "",
+        snippet: str = "",
+        score: float = 0.0,
+        source_urls: Optional[List[str]] = None,
+    ):
+        self.case_id = case_id
+        self.source = source
+        self.topic_url = topic_url
+        self.title = title
+        self.forum = forum
+        self.snippet = snippet
+        self.score = score
+        self.source_urls = [] if source_urls is None else source_urls
 
     def dict(self):
-        return asdict(self)
+        return {
+            "case_id": self.case_id,
+            "source": self.source,
+            "topic_url": self.topic_url,
+            "title": self.title,
+            "forum": self.forum,
+            "snippet": self.snippet,
+            "score": self.score,
+            "source_urls": list(self.source_urls),
+        }
+
+    def _json(self) -> str:
+        return (
+            '{"case_id": ' + _value(self.case_id)
+            + ', "source": ' + _value(self.source)
+            + ', "topic_url": ' + _value(self.topic_url)
+            + ', "title": ' + _value(self.title)
+            + ', "forum": ' + _value(self.forum)
+            + ', "snippet": ' + _value(self.snippet)
+            + ', "score": ' + _value(self.score)
+            + ', "source_urls": ' + _strings(self.source_urls) + "}"
+        )
+
 
+class ActionPlan(_Record):
+    __slots__ = ("next_questions", "diagnostic_steps")
 
-@dataclass
-class ActionPlan:
-    next_questions: List[str]
-    diagnostic_steps: List[str]
+    def __init__(self, next_questions: List[str], diagnostic_steps: List[str]):
+        self.next_questions = next_questions
+        self.diagnostic_steps = diagnostic_steps
 
     def dict(self):
-        return asdict(self)
+        # Copies: the lists may be the playbook's own.
+        return {"next_questions": list(self.next_questions), "diagnostic_steps": list(self.diagnostic_steps)}
+
+    def _json(self) -> str:
+        return (
+            '{"next_questions": ' + _strings(self.next_questions)
+            + ', "diagnostic_steps": ' + _strings(self.diagnostic_steps) + "}"
+        )
+
 
+class Query(_Record):
+    __slots__ = ("text",)
 
-@dataclass
-class Query:
-    text: str
+    def __init__(self, text: str):
+        self.text = text
 
     def dict(self):
-        return asdict(self)
+        return {"text": self.text}
 
+    def _json(self) -> str:
+        return '{"text": ' + _value(self.text) + "}"
 
-@dataclass
-class Meta:
-    generated_at: datetime
-    rules_version: str
-    index_version: str
+
+class Meta(_Record):
+    __slots__ = ("generated_at", "rules_version", "index_version", "timings")
+
+    def __init__(
+        self, generated_at: datetime, rules_version: str, index_version: str, timings: Optional[Dict[str, float]] = None
+    ):
+        self.generated_at = generated_at
+        self.rules_version = rules_version
+        self.index_version = index_version
+        self.timings = timings
 
     def dict(self):
-        return {
+        out = {
             "generated_at": self.generated_at.isoformat(),
             "rules_version": self.rules_version,
             "index_version": self.index_version,
         }
+        if self.timings is not None:
+            out["timings"] = dict(self.timings)
+        return out
+
+    def _json(self) -> str:
+        out = (
+            '{"generated_at": ' + _value(self.generated_at.isoformat())
+            + ', "rules_version": ' + _value(self.rules_version)
+            + ', "index_version": ' + _value(self.index_version)
+        )
+        if self.timings is not None:
+            out += ', "timings": ' + _dumps(self.timings)
+        return out + "}"
 
 
-@dataclass
-class PipelineOutput:
-    query: Query
-    triage: TriageResult
-    citations: List[Citation]
-    action_plan: ActionPlan
-    meta: Meta
-    schema_version: str = field(default="0.1", init=False)
+class PipelineOutput(_Record):
+    __slots__ = ("query", "triage", "citations", "action_plan", "meta", "schema_version")
+
+    def __init__(self, query: Query, triage: TriageResult, citations: List[Citation], action_plan: ActionPlan, meta: Meta):
+        self.query = query
+        self.triage = triage
+        self.citations = citations
+        self.action_plan = action_plan
+        self.meta = meta
+        self.schema_version = SCHEMA_VERSION
 
     def dict(self):
         return {
@@ -93,8 +242,24 @@ class PipelineOutput:
             "meta": self.meta.dict(),
         }
 
-    def json(self):
-        return json.dumps(self.dict(), ensure_ascii=False, default=str)
+    def _pieces(self) -> Iterator[str]:
+        yield (
+            '{"schema_version": ' + _value(self.schema_version)
+            + ', "query": ' + self.query._json()
+            + ', "triage": ' + self.triage._json()
+            + ', "citations": ['
+        )
+        for i, citation in enumerate(self.citations):
+            yield ", " + citation._json() if i else citation._json()
+        yield '], "action_plan": ' + self.action_plan._json() + ', "meta": ' + self.meta._json() + "}"
+
+    def json(self) -> str:
+        return "".join(self._pieces())
+
+    def write(self, fp: TextIO) -> None:
+        """Write ``json()``'s text to the text stream ``fp`` without building the whole string."""
+        for piece in self._pieces():
+            fp.write(piece)
 
     @classmethod
     def parse_obj(cls, obj):
@@ -111,7 +276,9 @@ class PipelineOutput:
                 generated_at=datetime.fromisoformat(obj.get("meta", {}).get("generated_at")),
                 rules_version=obj.get("meta", {}).get("rules_version", ""),
                 index_version=obj.get("meta", {}).get("index_version", ""),
+                timings=obj.get("meta", {}).get("timings"),
             ),
         )
         inst.schema_version = obj.get("schema_version", inst.schema_version)
         return inst
+
@@ -0,0 +1,487 @@
+"""Scoring backends for ``TfidfRetriever``.
+
+A backend turns weighted query vectors ``{term_id: weight}`` into ranked
+``(doc_id, cosine)`` lists. ``PythonScorer`` walks postings with dicts and is
+always available. ``NumpyScorer`` accumulates postings into a dense score array
+and selects the top-k with ``argpartition``; when SciPy is installed, a batch of
+queries is scored with one sparse matrix product per block against the term x
+document CSR matrix built from the index's postings (``term_offsets``,
+``post_docs``, ``post_weights``).
+
+For BM25 ranking the same scorers run over ``Bm25View``, which swaps the
+TF-IDF weights for the index's precomputed BM25F impacts (norms of 1, query
+weights = query term counts), and ``MaxScoreScorer`` adds top-k retrieval that
+stops collecting new candidates, and skips postings, once the remaining terms
+cannot lift an unseen document into the top-k.
+
+``PartitionView`` restricts any of these sources to a partition of a
+partitioned index (contiguous runs of doc ids): postings are sliced to the
+runs by binary search and documents outside them are not live.
+
+``LshScorer`` is the approximate mode for indexes built with LSH tables: only
+the documents sharing a SimHash bucket with the query (see ``triage.lsh``) are
+scored, exactly, so it can miss documents but never misorders the ones it
+finds.
+
+All backends add each query term's contribution in query order and divide by
+``q_norm * doc_norm``, so they return the same scores and the same ranking:
+descending score, ties by doc id, then zero-score live documents in doc order.
+"""
+import heapq
+import importlib
+import importlib.util
+import sys
+from array import array
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .lsh import SimHasher, bucket
+
+# NumPy and SciPy account for most of a cold start, so they are imported when a
+# NumPy scorer is first built rather than with this module; ``np`` is bound then.
+np = None
+
+QueryVector = Tuple[Dict[int, float], float]
+Ranking = List[Tuple[int, float]]
+Admit = Optional[Callable[[int], bool]]
+
+
+RANKINGS = ("tfidf", "bm25")
+
+
+@lru_cache(maxsize=None)
+def _optional(module: str):
+    """``module`` imported, or None when it is not installed."""
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        return None
+
+
+def _installed(module: str) -> bool:
+    """Whether ``module`` can be imported, without importing it."""
+    if module in sys.modules:
+        return sys.modules[module] is not None
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def available_backends(ranking: str = "tfidf") -> List[str]:
+    return ["python"] + (["maxscore"] if ranking == "bm25" else []) + (["numpy"] if _installed("numpy") else [])
+
+
+class Bm25View:
+    """An index's BM25F impacts behind the read interface the scorers use."""
+
+    def __init__(self, index):
+        if getattr(index, "bm25_impacts", None) is None:
+            raise ValueError("this index has no BM25 statistics; rebuild it with scripts/build_index.py")
+        self.index = index
+        self.num_docs = index.num_docs
+        self.num_terms = index.num_terms
+        self.live = index.live
+        self.doc_norms = array("d", [1.0]) * index.num_docs
+        self.term_offsets = index.term_offsets
+        self.post_docs = index.post_docs
+        self.post_weights = index.bm25_impacts
+        self.max_impacts = index.bm25_max_impacts
+
+    def postings(self, term_id: int):
+        return self.index.impacts(term_id)
+
+
+class PartitionView:
+    """A scorer source restricted to the ``[lo, hi)`` doc id ``runs`` of a partition.
+
+    ``span`` is the doc id range the runs fall in; the NumPy scorer sizes its
+    dense arrays to it rather than to the whole index.
+    """
+
+    def __init__(self, source, runs: Sequence[Tuple[int, int]]):
+        self.source = source
+        self.runs = sorted(runs)
+        self.num_docs = source.num_docs
+        self.num_terms = source.num_terms
+        self.doc_norms = source.doc_norms
+        self.max_impacts = getattr(source, "max_impacts", None)
+        self.span = (self.runs[0][0], self.runs[-1][1]) if self.runs else (0, 0)
+        live = bytearray(self.num_docs)
+        for lo, hi in self.runs:
+            live[lo:hi] = source.live[lo:hi] if source.live is not None else b"\1" * (hi - lo)
+        self.live = live
+
+    def postings(self, term_id: int):
+        docs, weights = self.source.postings(term_id)
+        if len(self.runs) == 1:
+            lo, hi = self.runs[0]
+            start = bisect_left(docs, lo)
+            end = bisect_left(docs, hi, start)
+            return docs[start:end], weights[start:end]
+        # Memory-mapped postings are copied run by run as raw bytes.
+        raw = isinstance(docs, memoryview)
+        out_docs, out_weights = (array(docs.format), array(weights.format)) if raw else ([], [])
+        start = 0
+        for lo, hi in self.runs:
+            start = bisect_left(docs, lo, start)
+            end = bisect_left(docs, hi, start)
+            if raw:
+                out_docs.frombytes(docs[start:end].cast("B"))
+                out_weights.frombytes(weights[start:end].cast("B"))
+            else:
+                out_docs.extend(docs[start:end])
+                out_weights.extend(weights[start:end])
+            start = end
+        return out_docs, out_weights
+
+
+def complement_runs(runs: Sequence[Tuple[int, int]], num_docs: int) -> List[Tuple[int, int]]:
+    """The doc id runs of ``[0, num_docs)`` not covered by ``runs``."""
+    out, prev = [], 0
+    for lo, hi in sorted(runs):
+        if lo > prev:
+            out.append((prev, lo))
+        prev = max(prev, hi)
+    if prev < num_docs:
+        out.append((prev, num_docs))
+    return out
+
+
+def merge_rankings(rankings: Sequence[Ranking], top_k: int) -> Ranking:
+    """Top-``top_k`` of rankings over disjoint documents, in the scorers' order (score desc, then doc id)."""
+    return heapq.nsmallest(top_k, [item for ranking in rankings for item in ranking], key=lambda x: (-x[1], x[0]))
+
+
+class PythonScorer:
+    name = "python"
+
+    def __init__(self, index):
+        self.index = index
+
+    def rank(self, q_vec: Dict[int, float], q_norm: float, top_k: int, admit: Admit = None) -> Ranking:
+        index = self.index
+        # Only documents sharing at least one query term can score above zero.
+        dots: Dict[int, float] = {}
+        for term_id, q_weight in q_vec.items():
+            docs, weights = index.postings(term_id)
+            for doc_id, weight in zip(docs, weights):
+                dots[doc_id] = dots.get(doc_id, 0.0) + q_weight * weight
+        return _rank_dots(index, dots, q_norm, top_k, admit)
+
+    def rank_batch(self, queries: Sequence[QueryVector], top_k: int, admits: Sequence[Admit] = ()) -> List[Ranking]:
+        admits = list(admits) or [None] * len(queries)
+        return [self.rank(q_vec, q_norm, top_k, admit) for (q_vec, q_norm), admit in zip(queries, admits)]
+
+
+def _rank_dots(index, dots: Dict[int, float], q_norm: float, top_k: int, admit: Admit) -> Ranking:
+    """Rank the documents with dot products ``dots``, padded with zero-score live documents in doc order."""
+    doc_norms = index.doc_norms
+    scores = [(idx, dots[idx] / (q_norm * doc_norms[idx])) for idx in sorted(dots)]
+    if admit is None:
+        top = heapq.nlargest(top_k, scores, key=lambda x: x[1])
+    else:
+        # sorted() is stable, so ties keep doc order, as nlargest does.
+        top = []
+        for idx, sc in sorted(scores, key=lambda x: x[1], reverse=True):
+            if len(top) >= top_k:
+                break
+            if admit(idx):
+                top.append((idx, sc))
+    if len(top) < top_k:
+        # Pad with zero-score documents in index order, as a full scan would.
+        live = index.live
+        for idx in range(index.num_docs):
+            if len(top) >= top_k:
+                break
+            if idx not in dots and (live is None or live[idx]) and (admit is None or admit(idx)):
+                top.append((idx, 0.0))
+    return top
+
+
+class NumpyScorer:
+    """Vectorized scoring over NumPy arrays; ``rank_batch`` uses SciPy sparse products when available."""
+
+    name = "numpy"
+
+    def __init__(self, index, block_size: int = 256):
+        global np
+        np = _optional("numpy")
+        if np is None:
+            raise ImportError("the numpy scoring backend requires NumPy")
+        self.index = index
+        self.block_size = block_size
+        # Dense arrays cover doc ids [base, base + num_docs): a partition's span, else the index.
+        lo, hi = getattr(index, "span", (0, index.num_docs))
+        self.base = lo
+        self.num_docs = hi - lo
+        self.doc_norms = np.asarray(index.doc_norms, dtype=np.float64)[lo:hi]
+        live = index.live
+        self.live = np.ones(self.num_docs, dtype=bool) if live is None else np.asarray(live, dtype=np.uint8)[lo:hi].astype(bool)
+        self._matrix = None
+
+    def _term_postings(self, term_id: int):
+        # Memory-mapped sections and array slices are viewed in place rather
+        # than copied and kept per term; only legacy list postings are converted.
+        docs, weights = self.index.postings(term_id)
+        docs = np.asarray(docs, dtype=np.intp) if isinstance(docs, list) else np.asarray(docs)
+        if self.base:
+            docs = docs - self.base
+        return docs, np.asarray(weights, dtype=np.float64)
+
+    def matrix(self):
+        """The term x document CSR matrix of posting weights (SciPy only)."""
+        if self._matrix is None:
+            index = self.index
+            if hasattr(index, "term_offsets"):
+                data = np.asarray(index.post_weights)
+                indices = np.asarray(index.post_docs)
+                indptr = np.asarray(index.term_offsets)
+            else:
+                parts = [self._term_postings(t) for t in range(index.num_terms)]
+                indptr = np.zeros(index.num_terms + 1, dtype=np.int64)
+                np.cumsum([len(d) for d, _ in parts], out=indptr[1:])
+                indices = np.concatenate([d for d, _ in parts]) if parts else np.zeros(0, dtype=np.intp)
+                data = np.concatenate([w for _, w in parts]) if parts else np.zeros(0)
+            self._matrix = _optional("scipy.sparse").csr_matrix((data, indices, indptr), shape=(index.num_terms, self.num_docs))
+        return self._matrix
+
+    def _dots(self, q_vec: Dict[int, float]):
+        dots = np.zeros(self.num_docs)
+        for term_id, q_weight in q_vec.items():
+            docs, weights = self._term_postings(term_id)
+            # A term lists each document once, so fancy-index accumulation is safe.
+            dots[docs] += q_weight * weights
+        return dots
+
+    def _select(self, touched, dots, q_norm: float, top_k: int, admit: Admit) -> Ranking:
+        """Rank documents ``touched`` (any order) with dot products ``dots``, padded as PythonScorer does."""
+        scores = dots / (q_norm * self.doc_norms[touched])
+        if admit is None and len(scores) > top_k:
+            kth = scores[np.argpartition(-scores, top_k - 1)[top_k - 1]]
+            keep = scores >= kth
+            touched, scores = touched[keep], scores[keep]
+        order = np.lexsort((touched, -scores))
+        top: Ranking = []
+        for pos in order:
+            if len(top) >= top_k:
+                break
+            idx = int(touched[pos]) + self.base
+            if admit is None or admit(idx):
+                top.append((idx, float(scores[pos])))
+        if len(top) < top_k:
+            untouched = self.live.copy()
+            untouched[touched] = False
+            for idx in np.flatnonzero(untouched) + self.base:
+                if len(top) >= top_k:
+                    break
+                if admit is None or admit(int(idx)):
+                    top.append((int(idx), 0.0))
+        return top
+
+    def rank(self, q_vec: Dict[int, float], q_norm: float, top_k: int, admit: Admit = None) -> Ranking:
+        dots = self._dots(q_vec)
+        touched = np.flatnonzero(dots)
+        return self._select(touched, dots[touched], q_norm, top_k, admit)
+
+    def rank_batch(self, queries: Sequence[QueryVector], top_k: int, admits: Sequence[Admit] = ()) -> List[Ranking]:
+        admits = list(admits) or [None] * len(queries)
+        sparse = _optional("scipy.sparse")
+        if sparse is None:
+            return [self.rank(q_vec, q_norm, top_k, admit) for (q_vec, q_norm), admit in zip(queries, admits)]
+        matrix = self.matrix()
+        out: List[Ranking] = []
+        for start in range(0, len(queries), self.block_size):
+            block = queries[start : start + self.block_size]
+            # Column indices stay in query-term order so each row sums terms in
+            # the same order as rank().
+            indptr = np.zeros(len(block) + 1, dtype=np.int64)
+            np.cumsum([len(q_vec) for q_vec, _ in block], out=indptr[1:])
+            indices = np.fromiter((t for q_vec, _ in block for t in q_vec), dtype=np.int64, count=int(indptr[-1]))
+            data = np.fromiter((w for q_vec, _ in block for w in q_vec.values()), dtype=np.float64, count=int(indptr[-1]))
+            queries_csr = sparse.csr_matrix((data, indices, indptr), shape=(len(block), matrix.shape[0]))
+            # The product stays sparse: each row holds exactly the documents a query touches.
+            dots = queries_csr @ matrix
+            for row, (_, q_norm) in enumerate(block):
+                lo, hi = dots.indptr[row], dots.indptr[row + 1]
+                touched = dots.indices[lo:hi].astype(np.intp)
+                out.append(self._select(touched, dots.data[lo:hi], q_norm, top_k, admits[start + row]))
+        return out
+
+
+class MaxScoreScorer:
+    """Term-at-a-time BM25 top-k with MaxScore pruning.
+
+    Each query term has an upper bound ``query weight * max impact``. Terms are
+    processed in query order (the retriever orders BM25 queries by descending
+    bound) with full accumulation until the bounds of the remaining terms sum to
+    no more than the current k-th partial score: from then on no unseen document
+    can reach the top-k, so remaining terms only update existing candidates,
+    probing long postings lists by binary search, and candidates whose partial
+    score plus remaining bounds cannot beat the k-th score are dropped.
+
+    Partial scores only grow (impacts are non-negative) and every surviving
+    candidate sums its terms in query order, so the result is exactly the
+    exhaustive ranking. ``postings_scored`` counts postings actually read.
+    """
+
+    name = "maxscore"
+    # Bounds are compared with this much slack so float rounding never prunes a winner.
+    _SLACK = 1 + 1e-9
+
+    def __init__(self, view: Bm25View):
+        self.view = view
+        self.exhaustive = PythonScorer(view)
+        self.postings_scored = 0
+
+    def rank(self, q_vec: Dict[int, float], q_norm: float, top_k: int, admit: Admit = None) -> Ranking:
+        if admit is not None or top_k <= 0:
+            # The topic cap changes which documents count towards the threshold.
+            return self.exhaustive.rank(q_vec, q_norm, top_k, admit)
+        view = self.view
+        terms = [(term_id, q_weight, q_weight * view.max_impacts[term_id]) for term_id, q_weight in q_vec.items()]
+        # rest[i]: the most any document can still gain from terms[i:].
+        rest = [0.0] * (len(terms) + 1)
+        for i in range(len(terms) - 1, -1, -1):
+            rest[i] = rest[i + 1] + terms[i][2]
+
+        slack = self._SLACK
+        acc: Dict[int, float] = {}
+        scored = 0
+        growing = True
+        for i, (term_id, q_weight, _) in enumerate(terms):
+            if len(acc) >= top_k:
+                threshold = heapq.nlargest(top_k, acc.values())[-1]
+                if growing and rest[i] * slack <= threshold:
+                    growing = False
+                if not growing:
+                    acc = {d: v for d, v in acc.items() if (v + rest[i]) * slack > threshold}
+            docs, weights = view.postings(term_id)
+            if growing:
+                for doc_id, weight in zip(docs, weights):
+                    acc[doc_id] = acc.get(doc_id, 0.0) + q_weight * weight
+                scored += len(docs)
+            elif len(acc) * 16 < len(docs):
+                n = len(docs)
+                for doc_id in sorted(acc):
+                    pos = bisect_left(docs, doc_id)
+                    if pos < n and docs[pos] == doc_id:
+                        acc[doc_id] += q_weight * weights[pos]
+                        scored += 1
+            else:
+                for doc_id, weight in zip(docs, weights):
+                    if doc_id in acc:
+                        acc[doc_id] += q_weight * weight
+                scored += len(docs)
+        self.postings_scored += scored
+
+        doc_norms = view.doc_norms
+        scores = [(idx, acc[idx] / (q_norm * doc_norms[idx])) for idx in sorted(acc)]
+        top = heapq.nlargest(top_k, scores, key=lambda x: x[1])
+        if len(top) < top_k:
+            # Fewer than top_k candidates means nothing was pruned: pad as a full scan would.
+            live = view.live
+            for idx in range(view.num_docs):
+                if len(top) >= top_k:
+                    break
+                if idx not in acc and (live is None or live[idx]):
+                    top.append((idx, 0.0))
+        return top
+
+    def rank_batch(self, queries: Sequence[QueryVector], top_k: int, admits: Sequence[Admit] = ()) -> List[Ranking]:
+        admits = list(admits) or [None] * len(queries)
+        return [self.rank(q_vec, q_norm, top_k, admit) for (q_vec, q_norm), admit in zip(queries, admits)]
+
+
+class LshScorer:
+    """Approximate top-k over an index's LSH bucket tables.
+
+    The query's SimHash keys, over its TF-IDF weights, pick one bucket per
+    table plus ``probes`` neighbouring buckets; only the union of their
+    documents is scored. Candidates get their exact scores (query terms summed
+    in query order, probing long postings lists by binary search), so results
+    can only differ from an exhaustive search by documents no bucket proposed.
+    ``candidates_scored`` counts the candidates.
+    """
+
+    name = "lsh"
+
+    def __init__(self, index, source, probes: int = 0):
+        if getattr(index, "lsh_table_keys", None) is None:
+            raise ValueError("this index has no LSH tables; rebuild it with scripts/build_index.py --lsh")
+        self.index = index
+        self.source = source
+        self.hasher = SimHasher.from_config(index.info["lsh"])
+        self.probes = probes
+        # BM25 query weights are term counts; signatures are over TF-IDF weights.
+        self._idf_weighted = isinstance(source, Bm25View)
+        self.candidates_scored = 0
+
+    def candidates(self, q_vec: Dict[int, float]) -> List[int]:
+        """Doc ids sharing a probed bucket with the query, in doc order."""
+        index = self.index
+        terms = [index.term(term_id) for term_id in q_vec]
+        if self._idf_weighted:
+            weights = [q_weight * index.idf[term_id] for term_id, q_weight in q_vec.items()]
+        else:
+            weights = list(q_vec.values())
+        found = set()
+        for table, keys in enumerate(self.hasher.probe_keys(terms, weights, self.probes)):
+            for key in keys:
+                found.update(bucket(index.lsh_table_keys, index.lsh_table_docs, index.num_docs, table, key))
+        return sorted(found)
+
+    def rank(self, q_vec: Dict[int, float], q_norm: float, top_k: int, admit: Admit = None) -> Ranking:
+        candidates = self.candidates(q_vec)
+        self.candidates_scored += len(candidates)
+        wanted = set(candidates)
+        dots: Dict[int, float] = {}
+        for term_id, q_weight in q_vec.items():
+            docs, weights = self.source.postings(term_id)
+            if len(candidates) * 8 < len(docs):
+                n = len(docs)
+                for doc_id in candidates:
+                    pos = bisect_left(docs, doc_id)
+                    if pos < n and docs[pos] == doc_id:
+                        dots[doc_id] = dots.get(doc_id, 0.0) + q_weight * weights[pos]
+            else:
+                for doc_id, weight in zip(docs, weights):
+                    if doc_id in wanted:
+                        dots[doc_id] = dots.get(doc_id, 0.0) + q_weight * weight
+        return _rank_dots(self.source, dots, q_norm, top_k, admit)
+
+    def rank_batch(self, queries: Sequence[QueryVector], top_k: int, admits: Sequence[Admit] = ()) -> List[Ranking]:
+        admits = list(admits) or [None] * len(queries)
+        return [self.rank(q_vec, q_norm, top_k, admit) for (q_vec, q_norm), admit in zip(queries, admits)]
+
+
+BACKENDS = {"python": PythonScorer, "numpy": NumpyScorer, "maxscore": MaxScoreScorer}
+
+
+def make_scorer(index, backend: str = "auto", ranking: str = "tfidf", runs: Optional[Sequence[Tuple[int, int]]] = None):
+    """Build the scorer for ``ranking`` ("tfidf" or "bm25").
+
+    ``auto`` picks NumPy when it is installed; otherwise the pure-Python scorer
+    for TF-IDF and the MaxScore scorer for BM25. With ``runs`` (see
+    ``CompactIndex.partition``) only that partition's documents are scored.
+    """
+    if ranking not in RANKINGS:
+        raise ValueError(f"unknown ranking {ranking!r}; expected one of {list(RANKINGS)}")
+    if backend == "auto":
+        backend = "numpy" if _installed("numpy") else ("maxscore" if ranking == "bm25" else "python")
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown scoring backend {backend!r}; expected one of {sorted(BACKENDS)}")
+    if backend not in available_backends(ranking):
+        raise ValueError(f"scoring backend {backend!r} is not available for {ranking} ranking")
+    source = Bm25View(index) if ranking == "bm25" else index
+    if runs is not None:
+        source = PartitionView(source, runs)
+    return BACKENDS[backend](source)
+
+
+def make_lsh_scorer(index, ranking: str = "tfidf", probes: int = 0) -> LshScorer:
+    """The approximate scorer for ``ranking`` over an index built with LSH tables."""
+    if ranking not in RANKINGS:
+        raise ValueError(f"unknown ranking {ranking!r}; expected one of {list(RANKINGS)}")
+    return LshScorer(index, Bm25View(index) if ranking == "bm25" else index, probes)
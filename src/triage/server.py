@@ -0,0 +1,190 @@
+import json
+import logging
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+from typing import Callable, Dict, List, TextIO, Tuple, Union
+
+from .pipeline import Pipeline
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 8 * 1024 * 1024
+# Streamed responses are sent in chunks of about this many characters.
+CHUNK_CHARS = 64 * 1024
+
+# A response body: the text itself, or a function writing it to a text stream.
+Body = Union[str, Callable[[TextIO], None]]
+
+
+class ChunkedWriter:
+    """A text stream over a socket file that sends HTTP/1.1 chunked transfer encoding.
+
+    Text is buffered up to ``CHUNK_CHARS`` per chunk, so a streamed response
+    holds at most one chunk (plus the piece being written) in memory.
+    """
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self._buffer: List[str] = []
+        self._size = 0
+
+    def write(self, text: str) -> None:
+        self._buffer.append(text)
+        self._size += len(text)
+        if self._size >= CHUNK_CHARS:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        data = "".join(self._buffer).encode("utf-8")
+        self._buffer, self._size = [], 0
+        self.wfile.write(b"%x\r\n" % len(data) + data + b"\r\n")
+
+    def close(self) -> None:
+        self.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class TriageRequestHandler(BaseHTTPRequestHandler):
+    server: "TriageServer"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            pipeline = self.server.pipeline
+            versions = pipeline.versions
+            self._send_json(
+                HTTPStatus.OK,
+                {
+                    "status": "ok",
+                    "rules_version": versions.rules_version,
+                    "index_version": versions.index_version,
+                    "config_version": pipeline.config_version,
+                },
+            )
+            return
+        if self.path == "/stats":
+            cache, timer = self.server.pipeline.cache, self.server.pipeline.timer
+            self._send_json(
+                HTTPStatus.OK,
+                {
+                    "cache": cache.stats() if cache is not None else None,
+                    "timings": timer.summary() if timer is not None else None,
+                },
+            )
+            return
+        self._send_error(HTTPStatus.NOT_FOUND, f"unknown path {self.path}")
+
+    def do_POST(self):
+        routes = {"/triage": self._triage, "/triage/batch": self._triage_batch}
+        handler = routes.get(self.path)
+        if handler is None:
+            self._send_error(HTTPStatus.NOT_FOUND, f"unknown path {self.path}")
+            return
+        try:
+            payload = self._read_json()
+            status, body = handler(payload)
+        except ValueError as e:
+            self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+        except Exception:
+            logger.exception("%s %s failed", self.command, self.path)
+            self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, "internal error")
+            return
+        if isinstance(body, str):
+            self._send_body(status, body)
+        else:
+            self._send_stream(status, body)
+
+    # Outputs are encoded straight from the schema objects (``PipelineOutput.json``
+    # and ``write``) into the response; no intermediate dicts are built.
+    def _triage(self, payload) -> Tuple[HTTPStatus, Body]:
+        text = payload.get("text") if isinstance(payload, dict) else None
+        if not isinstance(text, str):
+            raise ValueError("expected a JSON object with a string 'text' field")
+        pipeline = self.server.pipeline
+        output = pipeline.run(text)
+        if pipeline.timer is None:
+            return HTTPStatus.OK, output.json()
+        t0 = perf_counter()
+        body = output.json()
+        pipeline.timer.record({"serialize": perf_counter() - t0})
+        return HTTPStatus.OK, body
+
+    def _triage_batch(self, payload) -> Tuple[HTTPStatus, Body]:
+        texts = payload.get("texts") if isinstance(payload, dict) else None
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            raise ValueError("expected a JSON object with a 'texts' list of strings")
+
+        # Each output is written to the response as it is computed, so memory
+        # stays at one output and one chunk whatever the batch size. The first
+        # is computed before any header is sent, so a failing pipeline still
+        # gets an error status rather than a truncated 200.
+        outputs = self.server.pipeline.run_batch(texts)
+        first = next(outputs, None)
+
+        def write(out: TextIO) -> None:
+            out.write('{"results": [')
+            if first is not None:
+                first.write(out)
+                for output in outputs:
+                    out.write(", ")
+                    output.write(out)
+            out.write("]}")
+
+        return HTTPStatus.OK, write
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length > MAX_BODY_BYTES:
+            raise ValueError(f"request body exceeds {MAX_BODY_BYTES} bytes")
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw or b"null")
+        except json.JSONDecodeError as e:
+            raise ValueError(f"invalid JSON body: {e}") from e
+
+    def _send_json(self, status: HTTPStatus, body: Dict) -> None:
+        self._send_body(status, json.dumps(body, ensure_ascii=False, default=str))
+
+    def _send_body(self, status: HTTPStatus, text: str) -> None:
+        data = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, status: HTTPStatus, write: Callable[[TextIO], None]) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        out = ChunkedWriter(self.wfile)
+        try:
+            write(out)
+        except Exception:
+            # The status is already sent: drop the connection without the
+            # terminating chunk so the client sees the body as incomplete.
+            logger.exception("%s %s failed while streaming", self.command, self.path)
+            self.close_connection = True
+            return
+        out.close()
+
+    def _send_error(self, status: HTTPStatus, message: str) -> None:
+        self._send_json(status, {"error": message})
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+
+class TriageServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding one warm, read-only ``Pipeline``."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], pipeline: Pipeline):
+        self.pipeline = pipeline
+        super().__init__(address, TriageRequestHandler)
@@ -0,0 +1,124 @@
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+StageHook = Callable[[str, float], None]
+
+
+class LatencyHistogram:
+    """Fixed-size log-bucketed histogram of durations in seconds.
+
+    Buckets grow by ``2 ** (1 / 16)`` (~4.4% relative error) from 1 µs, so memory
+    is constant and histograms from different workers can be merged by addition.
+    """
+
+    BASE = 1e-6
+    STEPS_PER_DOUBLING = 16
+    NUM_BUCKETS = 16 * 40  # 1 µs .. ~12 days
+
+    def __init__(self):
+        self.counts: List[int] = [0] * self.NUM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def _bucket(self, seconds: float) -> int:
+        if seconds <= self.BASE:
+            return 0
+        b = int(math.log2(seconds / self.BASE) * self.STEPS_PER_DOUBLING) + 1
+        return min(b, self.NUM_BUCKETS - 1)
+
+    def _upper(self, bucket: int) -> float:
+        return self.BASE * 2 ** (bucket / self.STEPS_PER_DOUBLING)
+
+    def add(self, seconds: float) -> None:
+        self.counts[self._bucket(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        for i, c in enumerate(other.counts):
+            self.counts[i] += c
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, p: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * p / 100.0))
+        seen = 0
+        for bucket, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min(self._upper(bucket), self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1e3, 4) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50) * 1e3, 4),
+            "p95_ms": round(self.percentile(95) * 1e3, 4),
+            "p99_ms": round(self.percentile(99) * 1e3, 4),
+            "max_ms": round(self.max * 1e3, 4),
+        }
+
+
+class StageTimer:
+    """Aggregates per-stage latencies from ``Pipeline.run`` and forwards them to hooks.
+
+    Hooks are called as ``hook(stage, seconds)`` for every recorded stage, which
+    is the attachment point for external profilers or metrics exporters.
+    """
+
+    def __init__(self, hooks: Iterable[StageHook] = ()):
+        self.hooks: List[StageHook] = list(hooks)
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        # A copy sent to another process starts empty; hooks stay with the original.
+        return type(self), ()
+
+    def add_hook(self, hook: StageHook) -> None:
+        self.hooks.append(hook)
+
+    def record(self, timings: Dict[str, float]) -> None:
+        with self._lock:
+            for stage, seconds in timings.items():
+                hist = self._histograms.get(stage)
+                if hist is None:
+                    hist = self._histograms[stage] = LatencyHistogram()
+                hist.add(seconds)
+        for hook in self.hooks:
+            for stage, seconds in timings.items():
+                hook(stage, seconds)
+
+    def histogram(self, stage: str) -> Optional[LatencyHistogram]:
+        return self._histograms.get(stage)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {stage: hist.summary() for stage, hist in self._histograms.items()}
+
+    def take(self) -> Dict[str, LatencyHistogram]:
+        """The histograms recorded so far, leaving the timer empty (to ship a worker's timings to its parent)."""
+        with self._lock:
+            histograms, self._histograms = self._histograms, {}
+        return histograms
+
+    def merge(self, histograms: Dict[str, LatencyHistogram]) -> None:
+        """Add histograms taken from another timer, e.g. a worker process's; hooks are not called."""
+        with self._lock:
+            for stage, other in histograms.items():
+                hist = self._histograms.get(stage)
+                if hist is None:
+                    hist = self._histograms[stage] = LatencyHistogram()
+                hist.merge(other)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
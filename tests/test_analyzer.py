@@ -0,0 +1,87 @@
+import json
+import pickle
+import sys
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from scripts.build_index import build_index, load_jsonl, update_index
+from triage.analyzer import Analyzer, WhitespaceAnalyzer, light_stem
+from triage.index_store import CompactIndex
+from triage.retriever_tfidf import TfidfRetriever
+
+CASES_PATH = BASE_DIR / "data" / "cases.cleaned.jsonl"
+CASES = list(load_jsonl(CASES_PATH))
+
+
+def test_tokenizer_stopwords_and_stemming():
+    tokens = Analyzer().tokens("The Translation Editor, doesn't open for WPML's products (v4.6.2) in wp-config.php!")
+    assert tokens == ["translation", "editor", "doesn't", "open", "wpml", "product", "v4.6.2", "wp-config.php"]
+    assert len({light_stem(w) for w in ("update", "updates", "updated", "updating")}) == 1
+    assert light_stem("settings") == light_stem("setting") and light_stem("string") == "string"
+    assert Analyzer(stopwords=False, stem=False).tokens("Not the editor.") == ["not", "the", "editor"]
+    assert Analyzer(bigrams=True).tokens("string translations missing") == [
+        "string", "translation", "string translation", "miss", "translation miss",
+    ]
+
+
+def test_title_terms_are_a_prefix_of_case_terms():
+    for analyzer in (Analyzer(), Analyzer(bigrams=True), WhitespaceAnalyzer()):
+        for case in CASES:
+            title = analyzer.tokens(case["title"])
+            assert analyzer.tokens(case["analysis_text"])[: len(title)] == title
+
+
+def test_index_records_analyzer_and_queries_use_it(tmp_path):
+    index_path = tmp_path / "tfidf.idx"
+    build_index(CASES_PATH, index_path, analyzer=Analyzer(bigrams=True))
+    index = CompactIndex(index_path)
+    assert index.info["analyzer"] == Analyzer(bigrams=True).config()
+    assert "a1-stop-stem-bi" in index.index_version
+    assert index.term_id("string translation") >= 0 and index.term_id("the") == -1
+    index.close()
+
+    retriever = TfidfRetriever(index_path)
+    assert retriever.analyzer == Analyzer(bigrams=True)
+    assert retriever.search("WooCommerce products") == retriever.search("woocommerce product.")
+    with pytest.raises(ValueError):
+        TfidfRetriever(index_path, analyzer=Analyzer())
+
+    # Appended cases are tokenized with the analyzer the index was built with.
+    extra = tmp_path / "extra.jsonl"
+    extra.write_text(json.dumps({"case_id": "x1", "analysis_text": "Zebra gateways failing"}) + "\n", encoding="utf-8")
+    update_index(index_path, append_path=extra)
+    index = CompactIndex(index_path)
+    assert index.term_id("zebra gateway") >= 0 and index.info["analyzer"]["bigrams"]
+    index.close()
+
+
+def test_stopwords_cut_postings_scanned(tmp_path):
+    queries = [c["title"] for c in CASES[:200] if c["title"]]
+    scanned = {}
+    for name, analyzer in (("keep", Analyzer(stopwords=False)), ("drop", Analyzer())):
+        index_path = tmp_path / f"{name}.idx"
+        build_index(CASES_PATH, index_path, analyzer=analyzer)
+        retriever = TfidfRetriever(index_path)
+        offsets = retriever.index.term_offsets
+        scanned[name] = sum(offsets[t + 1] - offsets[t] for q in queries for t in retriever.query_vector(q)[0])
+    assert scanned["drop"] < 0.7 * scanned["keep"]
+
+
+def test_legacy_indexes_keep_whitespace_tokenization(tmp_path):
+    pickle_path = tmp_path / "tfidf.joblib"
+    build_index(CASES_PATH, pickle_path, fmt="pickle", analyzer=WhitespaceAnalyzer())
+    with pickle_path.open("rb") as f:
+        index = pickle.load(f)
+    del index["analyzer"]
+    with pickle_path.open("wb") as f:
+        pickle.dump(index, f)
+    retriever = TfidfRetriever(pickle_path)
+    assert isinstance(retriever.analyzer, WhitespaceAnalyzer)
+    assert retriever.index_version == index["index_version"]
+    assert retriever.analyzer.tokens("The products, page") == ["the", "products,", "page"]
+    assert retriever.search("products")[0]["score"] > 0.0
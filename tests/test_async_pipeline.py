@@ -0,0 +1,127 @@
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from test_pipeline_smoke import ensure_index
+from triage.async_pipeline import AsyncPipeline
+from triage.pipeline import load_default_pipeline
+
+TEXTS = [json.loads(line)["analysis_text"] for line in (BASE_DIR / "data" / "cases.cleaned.jsonl").open(encoding="utf-8")][:60]
+
+
+def comparable(output):
+    d = output.dict()
+    d["meta"].pop("generated_at")
+    return d
+
+
+def load_pipeline():
+    ensure_index()
+    return load_default_pipeline(BASE_DIR)
+
+
+def test_run_many_matches_sync_run_in_order():
+    pipeline = load_pipeline()
+    expected = [comparable(pipeline.run(text)) for text in TEXTS]
+
+    async def from_async_source():
+        for text in TEXTS:
+            await asyncio.sleep(0)
+            yield text
+
+    async def main():
+        apipe = AsyncPipeline(pipeline, max_concurrency=4)
+        return await apipe.run_many(TEXTS), await apipe.run_many(from_async_source())
+
+    from_list, from_async = asyncio.run(main())
+    assert [comparable(o) for o in from_list] == expected
+    assert [comparable(o) for o in from_async] == expected
+
+
+def test_load_generator_coalesces_and_bounds_concurrency():
+    pipeline = load_pipeline()
+    run, active, peak, lock = pipeline.run, [0], [0], threading.Lock()
+
+    def tracked_run(text):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        try:
+            time.sleep(0.005)  # long enough for runs to overlap
+            return run(text)
+        finally:
+            with lock:
+                active[0] -= 1
+
+    pipeline.run = tracked_run
+    distinct = TEXTS[:20]
+    rng = random.Random(7)
+    burst = [rng.choice(distinct) for _ in range(400)]
+
+    async def main(pool):
+        apipe = AsyncPipeline(pipeline, executor=pool, max_concurrency=3)
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.001)
+
+        beat = asyncio.get_running_loop().create_task(heartbeat())
+        # Every client is started before any run can finish, so duplicates join in-flight runs.
+        outputs = await asyncio.gather(*(apipe.run(text) for text in burst))
+        beat.cancel()
+        return apipe, outputs, ticks
+
+    with ThreadPoolExecutor(16) as pool:
+        apipe, outputs, ticks = asyncio.run(main(pool))
+    assert [o.query.text for o in outputs] == burst
+    assert apipe.computed == len(set(burst)) and apipe.coalesced == len(burst) - len(set(burst))
+    assert apipe.stats()["in_flight"] == 0
+    assert peak[0] == 3
+    assert ticks > 5  # the loop kept running while runs executed in the pool
+
+
+def test_errors_reach_every_waiter_and_cancellation_spares_others():
+    pipeline = load_pipeline()
+    run = pipeline.run
+
+    def flaky_run(text):
+        time.sleep(0.02)
+        if text == "boom":
+            raise RuntimeError("boom")
+        return run(text)
+
+    pipeline.run = flaky_run
+
+    async def main():
+        apipe = AsyncPipeline(pipeline, max_concurrency=2)
+        results = await asyncio.gather(apipe.run("boom"), apipe.run("boom"), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results) and apipe.computed == 1
+
+        first = asyncio.get_running_loop().create_task(apipe.run("Sitemap returns 404"))
+        second = asyncio.get_running_loop().create_task(apipe.run("Sitemap returns 404"))
+        await asyncio.sleep(0.005)
+        first.cancel()
+        output = await second
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return apipe, output
+
+    apipe, output = asyncio.run(main())
+    assert output.query.text == "Sitemap returns 404" and apipe.computed == 2
+    assert not apipe.stats()["in_flight"]
+    with pytest.raises(ValueError):
+        AsyncPipeline(pipeline, max_concurrency=0)
@@ -0,0 +1,102 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from test_pipeline_smoke import ensure_index
+import pytest
+
+from triage import parallel
+from triage.cache import ResultCache
+from triage.parallel import run_batch_parallel
+from triage.pipeline import load_default_pipeline
+from triage.timing import StageTimer
+
+QUERIES = [
+    "Translation editor does not open for WooCommerce products",
+    "Sitemap shows 404 for translated pages",
+    "I was charged twice for my subscription",
+    "",
+]
+
+
+def strip_generated_at(obj):
+    obj["meta"].pop("generated_at")
+    return obj
+
+
+def test_run_batch_matches_run_and_is_lazy():
+    ensure_index()
+    pipeline = load_default_pipeline(BASE_DIR)
+    pulled = []
+
+    def source():
+        for q in QUERIES * 3:
+            pulled.append(q)
+            yield q
+
+    outputs = pipeline.run_batch(source(), chunk_size=2)
+    first = next(outputs)
+    assert len(pulled) == 2
+    batch = [first] + list(outputs)
+    assert [o.query.text for o in batch] == QUERIES * 3
+    for out, q in zip(batch, QUERIES * 3):
+        assert strip_generated_at(out.dict()) == strip_generated_at(pipeline.run(q).dict())
+
+
+def test_cli_jsonl_mode(tmp_path):
+    ensure_index()
+    input_path = tmp_path / "queries.jsonl"
+    output_path = tmp_path / "results.jsonl"
+    with input_path.open("w", encoding="utf-8") as f:
+        for q in QUERIES:
+            f.write(json.dumps({"text": q}) + "\n")
+        f.write("\n")
+        f.write(json.dumps("Language switcher missing with Elementor") + "\n")
+
+    subprocess.run(
+        [sys.executable, str(BASE_DIR / "src" / "cli.py"), "--input", str(input_path), "--output", str(output_path), "--chunk-size", "2", "--workers", "2"],
+        check=True,
+        capture_output=True,
+    )
+    with output_path.open("r", encoding="utf-8") as f:
+        results = [json.loads(line) for line in f]
+    assert [r["query"]["text"] for r in results] == QUERIES + ["Language switcher missing with Elementor"]
+    assert all(r["action_plan"]["next_questions"] for r in results)
+
+
+def test_run_batch_parallel_preserves_order():
+    ensure_index()
+    pipeline = load_default_pipeline(BASE_DIR)
+    texts = [f"{q} #{i}" for i in range(5) for q in QUERIES]
+    lines = list(run_batch_parallel(iter(texts), workers=2, pipeline=pipeline, chunk_size=3))
+    results = [strip_generated_at(json.loads(line)) for line in lines]
+    assert [r["query"]["text"] for r in results] == texts
+    assert results == [strip_generated_at(pipeline.run(t).dict()) for t in texts]
+
+
+def test_spawned_workers_load_the_pipeline_with_its_settings(monkeypatch):
+    ensure_index()
+    options = dict(ranking="bm25", max_per_topic=1, cache=ResultCache(8), timer=StageTimer())
+    pipeline = load_default_pipeline(BASE_DIR, **options)
+    texts = [f"{q} #{i}" for i in range(3) for q in QUERIES]
+    monkeypatch.setattr(parallel, "pool_context", lambda: parallel.multiprocessing.get_context("spawn"))
+    # Without the loader settings a spawned worker could only load a default pipeline.
+    with pytest.raises(ValueError, match="pipeline_kwargs"):
+        next(run_batch_parallel(iter(texts), workers=2, pipeline=pipeline, base_dir=BASE_DIR))
+
+    lines = run_batch_parallel(iter(texts), workers=2, pipeline=pipeline, base_dir=BASE_DIR, chunk_size=4, pipeline_kwargs=options)
+    results = [strip_generated_at(json.loads(line)) for line in lines]
+    for result in results:
+        assert set(result["meta"].pop("timings")) >= {"classify_ms", "search_ms", "total_ms"}
+    expected = []
+    for text in texts:
+        output = strip_generated_at(pipeline.run(text).dict())
+        output["meta"].pop("timings")
+        expected.append(output)
+    assert results == expected
+    assert all(r["meta"]["index_version"].endswith("+bm25") for r in results)
@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from benchmarks.run import compare
+from benchmarks.synth import synthesize_cases
+
+
+def test_regression_gate_flags_only_slowdowns_beyond_threshold():
+    baseline = {"cases/load_ms": 1.0, "cases/cases/search/p50_us": 100.0, "gone/metric": 5.0}
+    current = {"cases/load_ms": 1.2, "cases/cases/search/p50_us": 131.0}
+    regressions = compare(current, baseline, threshold=0.25)
+    assert len(regressions) == 1 and regressions[0].startswith("cases/cases/search/p50_us")
+
+
+def test_synthetic_corpus_is_deterministic():
+    first = list(synthesize_cases(20, seed=3))
+    assert first == list(synthesize_cases(20, seed=3))
+    assert len({c["case_id"] for c in first}) == 20
+    assert all(c["analysis_text"] for c in first)
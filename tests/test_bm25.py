@@ -0,0 +1,94 @@
+import json
+import math
+import sys
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from scripts.build_index import build_index, load_jsonl, update_index
+from triage.index_store import CompactIndex
+from triage.retriever_tfidf import TfidfRetriever
+from triage.scoring import MaxScoreScorer, available_backends
+
+CASES_PATH = BASE_DIR / "data" / "cases.cleaned.jsonl"
+CASES = list(load_jsonl(CASES_PATH))
+QUERIES = [c["title"] for c in CASES[:400:4] if c["title"]] + [
+    CASES[7]["analysis_text"],
+    "Translation editor does not open for WooCommerce products",
+    "the the the",
+    "zzzz-unknown-term",
+    "",
+]
+
+
+def results(retriever, top_k=5):
+    return [[(c["case_id"], c["score"]) for c in retriever.search(q, top_k=top_k)] for q in QUERIES]
+
+
+def test_impacts_match_bm25f_formula(tmp_path):
+    index_path = tmp_path / "tfidf.idx"
+    build_index(CASES_PATH, index_path, dedup=False)
+    index = CompactIndex(index_path)
+    p = index.info["bm25"]
+    term_id = index.term_id("footer")
+    docs, impacts = index.impacts(term_id)
+    assert index.bm25_max_impacts[term_id] == max(impacts)
+    doc_id = docs[0]
+    start, end = index.doc_offsets[doc_id], index.doc_offsets[doc_id + 1]
+    pos = list(index.doc_terms[start:end]).index(term_id) + start
+    count, title_count = index.doc_counts[pos], index.doc_title_counts[pos]
+    title_len = index.doc_title_lengths[doc_id]
+    problem_len = index.doc_lengths[doc_id] - title_len
+    tf = p["w_title"] * title_count / (1 - p["b_title"] + p["b_title"] * title_len / p["avg_title_len"]) + p[
+        "w_problem"
+    ] * (count - title_count) / (1 - p["b_problem"] + p["b_problem"] * problem_len / p["avg_problem_len"])
+    df = index.df[term_id]
+    idf = math.log(1 + (index.num_docs - df + 0.5) / (df + 0.5))
+    assert math.isclose(impacts[0], idf * tf * (p["k1"] + 1) / (p["k1"] + tf), rel_tol=1e-12)
+    index.close()
+
+
+def test_maxscore_matches_exhaustive_bm25(tmp_path):
+    index_path = tmp_path / "tfidf.idx"
+    build_index(CASES_PATH, index_path, dedup=False)
+    exhaustive = TfidfRetriever(index_path, backend="python", ranking="bm25")
+    for backend in available_backends("bm25"):
+        retriever = TfidfRetriever(index_path, backend=backend, ranking="bm25")
+        for top_k in (1, 5, 20):
+            assert results(retriever, top_k) == results(exhaustive, top_k)
+        assert retriever.search_batch(QUERIES, max_per_topic=1) == [exhaustive.search(q, max_per_topic=1) for q in QUERIES]
+    maxscore = TfidfRetriever(index_path, backend="maxscore", ranking="bm25")
+    assert isinstance(maxscore.scorer, MaxScoreScorer)
+    results(maxscore)
+    read_all = sum(len(maxscore.index.impacts(t)[0]) for q in QUERIES for t in maxscore.query_vector(q)[0])
+    assert 0 < maxscore.scorer.postings_scored < read_all
+    assert maxscore.index_version.endswith("+bm25")
+    assert results(maxscore) != results(TfidfRetriever(index_path, backend="python"))
+
+
+def test_bm25_after_incremental_update_matches_fresh_build(tmp_path):
+    def write_cases(path, cases):
+        path.write_text("".join(json.dumps(c, ensure_ascii=False) + "\n" for c in cases), encoding="utf-8")
+        return path
+
+    index_path = tmp_path / "tfidf.idx"
+    build_index(write_cases(tmp_path / "base.jsonl", CASES[:1200]), index_path, dedup=False, bm25={"w_title": 3.0})
+    update_index(index_path, append_path=write_cases(tmp_path / "extra.jsonl", CASES[1200:1400]), delete_ids=[CASES[3]["case_id"]])
+    fresh_path = tmp_path / "fresh.idx"
+    survivors = [c for c in CASES[:1400] if c["case_id"] != CASES[3]["case_id"]]
+    build_index(write_cases(tmp_path / "fresh.jsonl", survivors), fresh_path, dedup=False, bm25={"w_title": 3.0})
+    for backend in ("python", "maxscore"):
+        assert results(TfidfRetriever(index_path, backend=backend, ranking="bm25")) == results(
+            TfidfRetriever(fresh_path, backend=backend, ranking="bm25")
+        )
+
+
+def test_bm25_needs_field_statistics(tmp_path):
+    pickle_path = tmp_path / "tfidf.joblib"
+    build_index(CASES_PATH, pickle_path, fmt="pickle")
+    with pytest.raises(ValueError):
+        TfidfRetriever(pickle_path, ranking="bm25")
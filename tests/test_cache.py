@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from test_pipeline_smoke import ensure_index
+from triage.cache import ResultCache
+from triage.pipeline import PipelineVersions, load_default_pipeline
+
+
+def test_lru_eviction_and_ttl():
+    now = [0.0]
+    cache = ResultCache(max_size=2, ttl=10.0, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    now[0] = 11.0
+    assert cache.get("a") is None
+    assert cache.stats() == {
+        "size": 1,
+        "max_size": 2,
+        "hits": 3,
+        "misses": 2,
+        "evictions": 1,
+        "expirations": 1,
+        "invalidations": 0,
+    }
+
+
+def test_pipeline_cache_hits_on_normalized_text_and_tracks_versions():
+    ensure_index()
+    cache = ResultCache(max_size=16)
+    pipeline = load_default_pipeline(BASE_DIR, cache=cache)
+    first = pipeline.run("Translation editor does not open")
+    second = pipeline.run("  translation   EDITOR does not open ")
+    assert cache.hits == 1 and cache.misses == 1
+    assert second.query.text == "  translation   EDITOR does not open "
+    assert second.triage.dict() == first.triage.dict()
+    assert [c.dict() for c in second.citations] == [c.dict() for c in first.citations]
+    assert second.meta.generated_at >= first.meta.generated_at
+
+    pipeline.versions = PipelineVersions(rules_version="rules@next", index_version=pipeline.versions.index_version)
+    third = pipeline.run("translation editor does not open")
+    assert cache.invalidations == 1 and cache.misses == 2
+    assert third.meta.rules_version == "rules@next"
@@ -0,0 +1,159 @@
+import collections
+import json
+import random
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "data" / "tools"))
+
+import clean_cases  # noqa: E402
+from clean_cases import Reservoir, SpaceSaving  # noqa: E402
+
+CASES_PATH = BASE_DIR / "data" / "cases.cleaned.jsonl"
+
+
+def write_raw(path: Path, limit=None):
+    """Raw crawl-shaped records, one per case id: forum suffixes, time-stamp titles and unnormalized whitespace."""
+    cases = list({case["case_id"]: case for case in map(json.loads, CASES_PATH.open(encoding="utf-8"))}.values())
+    with path.open("w", encoding="utf-8") as f:
+        for i, case in enumerate(cases[:limit]):
+            case["forum"] = (case["forum"] or "English Support") + " Quick solution available 3 replies"
+            case["title"] = f"{i % 7 + 1} days ago" if i % 11 == 0 else case["title"] + "  …"
+            case["problem"] = "  " + case["problem"].replace(" ", "\n ", 3)
+            f.write(json.dumps(case, ensure_ascii=False) + "\n")
+    return path
+
+
+def reference(in_path: Path):
+    """The previous cleaner: every row in memory and exact Counters."""
+    rows, forums, tok, bi, time_titles = [], collections.Counter(), collections.Counter(), collections.Counter(), 0
+    for line in in_path.open(encoding="utf-8"):
+        clean, time_title = clean_cases.clean_record(json.loads(line))
+        time_titles += time_title
+        rows.append(clean)
+        if clean["forum"]:
+            forums[clean["forum"]] += 1
+        tokens = clean_cases.tokenize(clean["analysis_text"])
+        tok.update(tokens)
+        bi.update(clean_cases.bigrams(tokens))
+    return rows, time_titles, {"forums": forums, "tokens": tok, "bigrams": bi}
+
+
+def run(tmp_path: Path, in_path: Path, **kwargs):
+    outputs = {name: tmp_path / f"{name}.json" for name in ("out_stats", "out_state")}
+    outputs.update(out_clean=tmp_path / "cases.cleaned.jsonl", out_sample=tmp_path / "samples.jsonl")
+    result = clean_cases.main(in_path=in_path, log=lambda msg: None, **outputs, **kwargs)
+    files = {name: path.read_text(encoding="utf-8") for name, path in outputs.items() if name != "out_state"}
+    return result, files
+
+
+def exact_top(counter, n):
+    return [[k, counter[k]] for k in sorted(counter, key=lambda k: (-counter[k], k))[:n]]
+
+
+def test_streaming_clean_matches_reference_rows_and_stats(tmp_path):
+    raw = write_raw(tmp_path / "cases.jsonl")
+    rows, time_titles, counters = reference(raw)
+    result, files = run(tmp_path, raw, chunk_size=300)
+    assert result["written"] == len(rows) and result["known"] == 0
+    assert files["out_clean"] == "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows)
+
+    stats = json.loads(files["out_stats"])
+    assert stats["total"] == len(rows) and stats["time_title_rows"] == time_titles > 0
+    for key, name, n in (("forums_top10", "forums", 10), ("tokens_top30", "tokens", 30), ("bigrams_top30", "bigrams", 30)):
+        floor = stats["sketch_floor"][name]
+        # Counts are upper bounds that over-count by at most the sketch floor.
+        for item, count in stats[key]:
+            assert counters[name][item] <= count <= counters[name][item] + floor
+        if floor == 0:
+            assert stats[key] == exact_top(counters[name], n)
+        else:
+            assert [k for k, _ in stats[key][:10]] == [k for k, _ in exact_top(counters[name], 10)]
+
+    sample = [json.loads(line) for line in files["out_sample"].splitlines()]
+    by_id = {r["case_id"]: r for r in rows}
+    assert len(sample) == 200 == len({s["case_id"] for s in sample})
+    for s in sample:
+        r = by_id[s["case_id"]]
+        assert s == {"case_id": r["case_id"], "topic_url": r["topic_url"], "text": r["analysis_text"], "solution": r["solution"]}
+
+
+def test_parallel_and_incremental_runs_match_one_full_run(tmp_path):
+    raw = write_raw(tmp_path / "cases.jsonl")
+    (tmp_path / "full").mkdir()
+    _, full = run(tmp_path / "full", raw, chunk_size=250)
+
+    (tmp_path / "parallel").mkdir()
+    _, parallel = run(tmp_path / "parallel", raw, chunk_size=250, workers=2)
+    assert parallel == full
+
+    # Clean a first crawl, then the grown crawl: only the new cases are cleaned and appended.
+    # With chunks aligned to the first crawl, the merged sketches are identical too.
+    (tmp_path / "inc").mkdir()
+    first = write_raw(tmp_path / "inc" / "first.jsonl", limit=1000)
+    result, _ = run(tmp_path / "inc", first, chunk_size=250)
+    assert result["written"] == 1000
+    result, incremental = run(tmp_path / "inc", raw, chunk_size=250)
+    total = len(full["out_clean"].splitlines())
+    assert result["written"] == total - 1000 and result["known"] == 1000
+    assert incremental == full
+
+    result, again = run(tmp_path / "inc", raw)
+    assert result["written"] == 0 and again == incremental
+
+
+def test_stale_state_triggers_a_full_clean(tmp_path):
+    raw = write_raw(tmp_path / "cases.jsonl", limit=300)
+    _, before = run(tmp_path, raw, chunk_size=100)
+    # A run that died mid-way leaves more rows than the state records.
+    with (tmp_path / "cases.cleaned.jsonl").open("a", encoding="utf-8") as f:
+        f.write(before["out_clean"].splitlines()[0] + "\n")
+    result, after = run(tmp_path, raw, chunk_size=100)
+    assert result["known"] == 0 and result["written"] == 300 and after == before
+    # Changing the sample parameters also re-cleans rather than mixing samples.
+    result, _ = run(tmp_path, raw, sample_n=50)
+    assert result["known"] == 0
+
+
+def test_space_saving_merges_within_error_bounds():
+    rng = random.Random(7)
+    stream = [f"t{min(int(rng.paretovariate(1.1)), 5000)}" for _ in range(50000)]
+    exact = collections.Counter(stream)
+    merged = SpaceSaving(100)
+    for start in range(0, len(stream), 1000):
+        merged = merged.merge(SpaceSaving.from_counter(collections.Counter(stream[start : start + 1000]), 100))
+    assert len(merged.counts) <= 100
+    for item, count in merged.counts.items():
+        assert count - merged.errors.get(item, 0) <= exact[item] <= count
+    # Anything frequent enough is monitored, and unmonitored items stay under the floor.
+    assert merged.floor <= len(stream) / 10
+    for item, true in exact.items():
+        if item not in merged.counts:
+            assert true <= merged.floor
+    assert [k for k, _ in merged.most_common(5)] == [k for k, _ in exact_top(exact, 5)]
+    assert SpaceSaving.from_json(json.loads(json.dumps(merged.to_json()))).most_common(100) == merged.most_common(100)
+
+
+def test_reservoir_is_uniform_and_resumable():
+    hits = collections.Counter()
+    for seed in range(1000):
+        reservoir = Reservoir(5, seed)
+        for i in range(50):
+            reservoir.offer(lambda i=i: i)
+        hits.update(reservoir.items)
+    # Each of the 50 items is kept with probability 5/50: 100 times on average.
+    assert all(60 <= hits[i] <= 140 for i in range(50))
+
+    whole, loads = Reservoir(5, 1), []
+    for i in range(50):
+        whole.offer(lambda i=i: loads.append(i) or i)
+    assert len(loads) < 50  # items that are not kept are never decoded
+    part = Reservoir(5, 1)
+    for i in range(20):
+        part.offer(lambda i=i: i)
+    resumed = Reservoir(5, 1, part.items, part.seen)
+    for i in range(20, 50):
+        resumed.offer(lambda i=i: i)
+    assert resumed.items == whole.items
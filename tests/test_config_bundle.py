@@ -0,0 +1,158 @@
+import json
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from test_pipeline_smoke import ensure_index
+from triage.action_plan import ActionPlanner
+from triage.cache import ResultCache
+from triage.config_bundle import BundleWatcher, compile_config, load_bundle, load_config, write_bundle
+from triage.pipeline import load_default_pipeline, load_yaml
+from triage.rule_classifier import RuleClassifier
+
+CASES = [json.loads(line)["analysis_text"] for line in (BASE_DIR / "data" / "cases.cleaned.jsonl").open(encoding="utf-8")]
+
+
+def copy_configs(tmp_path):
+    configs = tmp_path / "configs"
+    shutil.copytree(BASE_DIR / "configs", configs)
+    return configs
+
+
+def rewrite(configs, name, edit):
+    """Apply ``edit`` to a config and write it back as both JSON and YAML-compatible JSON."""
+    cfg = load_yaml(configs / f"{name}.yaml")
+    edit(cfg)
+    for suffix in (".yaml", ".json"):
+        (configs / f"{name}{suffix}").write_text(json.dumps(cfg, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def test_bundle_round_trip_matches_configs(tmp_path):
+    bundle_path = tmp_path / "config.bundle"
+    write_bundle(compile_config(BASE_DIR / "configs"), bundle_path)
+    bundle = load_bundle(bundle_path)
+    assert bundle.rules_version == load_yaml(BASE_DIR / "configs" / "rules.yaml")["version"]
+    assert bundle.version.startswith(bundle.rules_version + "+")
+    assert not bundle.classifier._regexes  # compiled on first use, not on load
+
+    fresh = RuleClassifier(load_yaml(BASE_DIR / "configs" / "rules.yaml"))
+    for text in CASES[:300] + ["", "Cannot open translation editor after update"]:
+        assert bundle.classifier.classify(text) == fresh.classify(text)
+    planner = ActionPlanner(load_yaml(BASE_DIR / "configs" / "playbooks.yaml"))
+    for category, confidence in (("seo", 0.9), ("billing", 0.1), ("other", 1.0)):
+        assert bundle.planner.generate(category, confidence) == planner.generate(category, confidence)
+
+
+def test_validation_reports_every_problem(tmp_path):
+    configs = copy_configs(tmp_path)
+    rewrite(configs, "rules", lambda c: c["categories"]["seo"]["regex"].append({"id": "re:bad", "pattern": "(", "weight": 1}))
+    rewrite(configs, "playbooks", lambda c: c["by_category"].update({"shipping": {"next_questions": ["?"]}}))
+    (configs / "taxonomy.json").write_text(json.dumps({"version": "taxonomy@drifted", "categories": []}), encoding="utf-8")
+    with pytest.raises(ValueError) as e:
+        compile_config(configs)
+    message = str(e.value)
+    assert "re:bad" in message and "'shipping' is not in the taxonomy" in message
+    assert "taxonomy.json differs from taxonomy.yaml" in message
+
+
+def test_stale_bundle_is_recompiled(tmp_path):
+    configs = copy_configs(tmp_path)
+    bundle_path = tmp_path / "config.bundle"
+    write_bundle(compile_config(configs), bundle_path)
+    assert load_config(configs, bundle_path).sources == load_bundle(bundle_path).sources
+
+    rewrite(configs, "rules", lambda c: c.update(version="rules@edited"))
+    assert load_config(configs, bundle_path).rules_version == "rules@edited"
+
+
+def test_watcher_hot_swaps_without_dropping_requests(tmp_path):
+    ensure_index()
+    pipeline = load_default_pipeline(BASE_DIR)
+    old_version = pipeline.versions.rules_version
+    bundle_path = tmp_path / "config.bundle"
+    watcher = BundleWatcher(bundle_path, pipeline.swap_config, pipeline.config_version)
+    assert not watcher.check()  # no bundle yet
+
+    configs = copy_configs(tmp_path)
+
+    def retarget(cfg):
+        cfg["version"] = "rules@swapped"
+        cfg["categories"]["billing"]["keywords"].append({"id": "kw:editor", "pattern": "editor", "weight": 50.0})
+
+    rewrite(configs, "rules", retarget)
+    new_bundle = compile_config(configs)
+
+    query = "Translation editor does not open"
+    expected = {old_version: pipeline.run(query).triage.category, "rules@swapped": "billing"}
+    assert expected[old_version] != "billing"
+    per_thread, errors, stop = [[] for _ in range(4)], [], threading.Event()
+
+    def hammer(outputs):
+        while not stop.is_set():
+            try:
+                outputs.append(pipeline.run(query))
+            except Exception as e:  # pragma: no cover - a failure here is the bug under test
+                errors.append(e)
+
+    threads = [threading.Thread(target=hammer, args=(outputs,)) for outputs in per_thread]
+    for t in threads:
+        t.start()
+    while not all(per_thread):
+        time.sleep(0.001)
+    write_bundle(new_bundle, bundle_path)
+    assert watcher.check()
+    assert not watcher.check()  # unchanged file
+    swapped_at = [len(outputs) for outputs in per_thread]
+    while any(len(outputs) < n + 5 for outputs, n in zip(per_thread, swapped_at)):
+        time.sleep(0.001)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    assert pipeline.config_version == new_bundle.version
+    for outputs in per_thread:
+        versions = [o.meta.rules_version for o in outputs]
+        # Every request completes under exactly one configuration, and each
+        # thread switches over once and for all.
+        assert all(o.triage.category == expected[o.meta.rules_version] for o in outputs)
+        assert versions[0] == old_version and versions[-1] == "rules@swapped"
+        assert versions == sorted(versions, key=lambda v: v == "rules@swapped")
+
+    # A bundle that fails to load leaves the current configuration in place.
+    bundle_path.write_bytes(b"not a bundle")
+    assert not watcher.check()
+    assert pipeline.versions.rules_version == "rules@swapped"
+
+
+def test_playbook_only_swap_invalidates_cached_plans(tmp_path):
+    ensure_index()
+    cache = ResultCache(max_size=16)
+    pipeline = load_default_pipeline(BASE_DIR, cache=cache)
+    query = "Translation editor does not open"
+    before = pipeline.run(query)
+    assert pipeline.run(query).action_plan.next_questions == before.action_plan.next_questions
+    assert cache.hits == 1
+
+    configs = copy_configs(tmp_path)
+
+    def reword(cfg):
+        cfg["version"] = "playbooks@reworded"
+        for playbook in [cfg["default"]] + list(cfg["by_category"].values()):
+            playbook["next_questions"] = ["Which page shows the problem?"]
+
+    rewrite(configs, "playbooks", reword)
+    bundle = compile_config(configs)
+    assert bundle.rules_version == pipeline.versions.rules_version and bundle.version != pipeline.config_version
+    pipeline.swap_config(bundle)
+    after = pipeline.run(query)
+    assert after.action_plan.next_questions[0] == "Which page shows the problem?"
+    assert cache.invalidations == 1 and cache.hits == 1
@@ -0,0 +1,63 @@
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from scripts.build_index import build_index, load_jsonl
+from triage.dedup import MinHasher, collapse_cases, estimate_jaccard, topic_key
+from triage.retriever_tfidf import TfidfRetriever
+
+CASES_PATH = BASE_DIR / "data" / "cases.cleaned.jsonl"
+TEXT = (
+    "The client is experiencing an issue where the footer does not switch to the English version "
+    "when changing the site language on the frontend, despite the footer being set as translatable."
+)
+
+
+def test_minhash_estimates_similarity():
+    hasher = MinHasher(num_perm=64)
+    sig = hasher.signature(TEXT)
+    assert sig == MinHasher(num_perm=64).signature(TEXT)
+    assert estimate_jaccard(sig, hasher.signature(TEXT + " Thanks!")) >= 0.8
+    assert estimate_jaccard(sig, hasher.signature("Checkout page shows prices in the wrong currency")) < 0.2
+    assert hasher.signature("") == ()
+
+
+def test_collapse_folds_variants_into_canonical_case():
+    cases = [
+        {"case_id": "a", "topic_url": "https://x/topic/footer/#post-1", "title": "", "problem": TEXT},
+        {"case_id": "b", "topic_url": "https://x/topic/other/", "title": "Other", "problem": "Prices in the wrong currency."},
+        {"case_id": "c", "topic_url": "https://x/topic/footer/", "title": "Footer", "problem": TEXT.upper()},
+        {"case_id": "d", "topic_url": "https://x/topic/footer/?paged=2", "title": "2", "problem": TEXT + " Thanks!"},
+    ]
+    folded = collapse_cases(cases)
+    assert [c["case_id"] for c in folded] == ["b", "c"]
+    assert folded[1]["source_urls"] == [
+        "https://x/topic/footer/",
+        "https://x/topic/footer/#post-1",
+        "https://x/topic/footer/?paged=2",
+    ]
+    assert topic_key(cases[3]["topic_url"]) == topic_key(cases[0]["topic_url"]) == "https://x/topic/footer/"
+
+
+def test_dedup_index_and_topic_cap(tmp_path):
+    cases = list(load_jsonl(CASES_PATH))
+    dedup_path, full_path = tmp_path / "dedup.idx", tmp_path / "full.idx"
+    build_index(CASES_PATH, dedup_path)
+    build_index(CASES_PATH, full_path, dedup=False)
+
+    deduped = TfidfRetriever(dedup_path)
+    assert deduped.index.num_docs == len({c["problem"] for c in cases}) < len(cases)
+    urls = [u for i in range(deduped.index.num_docs) for u in deduped.index.meta(i)["source_urls"]]
+    assert set(urls) == {c["topic_url"] for c in cases}
+
+    full = TfidfRetriever(full_path)
+    for query in (c["title"] for c in cases[:200:7] if c["title"]):
+        citations = full.search(query, top_k=5, max_per_topic=1)
+        topics = [topic_key(c["topic_url"]) for c in citations]
+        assert len(citations) == 5 and len(set(topics)) == 5
+        assert [c["score"] for c in citations] == sorted((c["score"] for c in citations), reverse=True)
+        for c in deduped.search(query):
+            assert c["topic_url"] in c["source_urls"]
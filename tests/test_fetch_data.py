@@ -0,0 +1,269 @@
+import asyncio
+import hashlib
+import html
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "data" / "tools"))
+
+import fetch_data  # noqa: E402
+from fetch_data import HTTPStatusError, PermanentHTTPError, crawl, parse_page  # noqa: E402
+
+CASES = [json.loads(line) for line in (BASE_DIR / "data" / "cases.cleaned.jsonl").open(encoding="utf-8")]
+PER_PAGE = 5
+
+
+def listing_page(cases):
+    """A listing page shaped like WPML's: a topic link, forum line and Problem/Solution per entry."""
+    items = []
+    for case in cases:
+        items.append(
+            f"""<article class="topic"><div class="head"><h3><a href="{html.escape(case['topic_url'])}">{html.escape(case['title'] or 'Untitled')}</a></h3>
+<p class="meta">Started by: someone in: <span>{html.escape(case['forum'] or 'English Support')}</span> Quick solution available</p></div>
+<div class="body"><p><strong>Problem:</strong> {html.escape(case['problem'])}</p><br>
+<p><strong>Solution:</strong><br/> {html.escape(case['solution'])}</p>
+<p>If this solution does not look relevant, please open a new support ticket.</p></div></article>"""
+        )
+    return (
+        "<!DOCTYPE html><html><head><script>var x = 'Problem: Solution: <a href=\"/forums/topic/js/\">';</script>"
+        "<style>p { color: red }</style></head><body>"
+        '<header><a href="https://wpml.org/forums/topic/pinned/">Pinned</a><ul><li>Unclosed item</ul></header>'
+        '<main id="primary"><div class="list">' + "\n".join(items) + "</div></main>"
+        '<footer><a href="https://wpml.org/forums/topic/footer/">Footer</a></footer></body></html>'
+    )
+
+
+class ListingSite:
+    """A local stand-in for the listing: serves pages with ETags, answers 304s and redirects, and logs every request."""
+
+    def __init__(self, cases, delay=0.01):
+        self.delay = delay
+        self.fail_page = None
+        self.redirects = {}
+        self.log = []
+        self.connections = 0
+        self.in_flight = self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.publish(cases)
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with site.lock:
+                    site.connections += 1
+
+            def do_GET(self):
+                arrived = time.monotonic()
+                with site.lock:
+                    site.in_flight += 1
+                    site.max_in_flight = max(site.max_in_flight, site.in_flight)
+                try:
+                    time.sleep(site.delay)
+                    site.respond(self, arrived)
+                finally:
+                    with site.lock:
+                        site.in_flight -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}/forums/available-solutions/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def publish(self, cases):
+        self.pages = {}
+        for start in range(0, len(cases), PER_PAGE):
+            page = start // PER_PAGE + 1
+            path = "/forums/available-solutions/" + ("" if page == 1 else f"page/{page}/")
+            self.pages[path] = (page, listing_page(cases[start : start + PER_PAGE]).encode("utf-8"))
+
+    def respond(self, handler, arrived):
+        if handler.path in self.redirects:
+            self.log.append((handler.path, 301, arrived))
+            handler.send_response(301)
+            handler.send_header("Location", self.redirects[handler.path])
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+            return
+        page, body = self.pages.get(handler.path, (None, b"not found"))
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if page is None:
+            status = 404
+        elif page == self.fail_page:
+            status = 500
+        elif handler.headers.get("If-None-Match") == etag:
+            status = 304
+        else:
+            status = 200
+        self.log.append((page, status, arrived))
+        handler.send_response(status)
+        if status == 200:
+            handler.send_header("ETag", etag)
+            handler.send_header("Content-Type", "text/html; charset=utf-8")
+            handler.send_header("Content-Length", str(len(body)))
+            handler.end_headers()
+            handler.wfile.write(body)
+        else:
+            handler.send_header("Content-Length", "0")
+            handler.end_headers()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def captured(path):
+    return [json.loads(line) for line in path.open(encoding="utf-8")]
+
+
+def test_single_pass_parse_extracts_each_listed_case():
+    cases = CASES[:PER_PAGE]
+    records = parse_page(listing_page(cases))
+    # Links outside <main> (header, footer, script text) are not cases.
+    assert [r["topic_url"] for r in records] == [c["topic_url"] for c in cases]
+    for record, case in zip(records, cases):
+        assert record["case_id"] == hashlib.sha1(case["topic_url"].encode("utf-8")).hexdigest()[:16]
+        assert record["title"] == fetch_data.normalize_ws(case["title"] or "Untitled")
+        assert record["problem"] == fetch_data.normalize_ws(case["problem"])
+        assert record["solution"] == fetch_data.normalize_ws(case["solution"])
+        assert record["forum"].startswith(case["forum"] or "English Support")
+    assert parse_page("<html><body><p>No topics</p></body></html>") == []
+
+
+def test_single_pass_parse_matches_beautifulsoup_reference():
+    bs4 = pytest.importorskip("bs4")
+
+    def reference(page):
+        # The previous parser: select_one per link and a parent walk calling get_text at every level.
+        main = bs4.BeautifulSoup(page, "html.parser")
+        main = main.find("main") or main.find(id="primary") or main.body
+        urls = list(dict.fromkeys(a.get("href") for a in main.select('a[href*="/forums/topic/"]') if a.get("href")))
+        out = []
+        for url in urls:
+            a = main.select_one(f'a[href="{url}"]')
+            container = a
+            for _ in range(6):
+                if not container:
+                    break
+                text = container.get_text(" ", strip=True)
+                if "Problem:" in text and "Solution:" in text:
+                    break
+                container = container.parent
+            out.append((url, fetch_data.normalize_ws(a.get_text(" ", strip=True)), fetch_data.normalize_ws(container.get_text("\n", strip=True))))
+        return out
+
+    for start in range(0, 200, PER_PAGE):
+        page = listing_page(CASES[start : start + PER_PAGE])
+        parser = fetch_data.ListingParser()
+        parser.feed(page)
+        parser.close()
+        got = [
+            (l["href"], fetch_data.normalize_ws(parser.text(l["start"], l["end"], " ")), fetch_data.normalize_ws(parser.text(*l["container"], "\n")))
+            for l in parser.topic_links()
+        ]
+        assert got == reference(page)
+
+
+def test_crawl_resumes_revalidates_and_stops_at_captured_cases(tmp_path):
+    cases = CASES[: PER_PAGE * 6]
+    site = ListingSite(cases)
+    out, cache = tmp_path / "cases.jsonl", tmp_path / "cache"
+    options = dict(base=site.base, concurrency=2, delay=0.03, cache_dir=cache, retries=1, log=lambda msg: None)
+    try:
+        # Page 4 keeps failing: pages 1-3 are kept and the checkpoint points at page 4.
+        site.fail_page = 4
+        with pytest.raises(HTTPStatusError):
+            crawl(6, out, **options)
+        assert [r["topic_url"] for r in captured(out)] == [c["topic_url"] for c in cases[:15]]
+        assert json.loads((tmp_path / "cases.jsonl.checkpoint").read_text())["next_page"] == 4
+
+        site.fail_page = None
+        site.log.clear()
+        stats = crawl(6, out, **options)
+        assert stats["start_page"] == 4 and stats["written"] == 15 and stats["stopped_at"] is None
+        assert sorted({page for page, _, _ in site.log}) == [4, 5, 6]
+        assert [r["topic_url"] for r in captured(out)] == [c["topic_url"] for c in cases]
+        assert not (tmp_path / "cases.jsonl.checkpoint").exists()
+        # Bounded concurrency, per-host spacing and pooled keep-alive connections.
+        assert site.max_in_flight <= 2
+        starts = sorted(t for _, _, t in site.log)
+        assert all(b - a >= 0.025 for a, b in zip(starts, starts[1:]))
+        assert site.connections < len(site.log) + 6
+
+        # A new case pushes the listing down: page 1 is new, page 2 holds only captured cases.
+        newest = dict(CASES[PER_PAGE * 6], topic_url="https://wpml.org/forums/topic/brand-new-case/")
+        site.publish([newest] + cases)
+        stats = crawl(6, out, **options)
+        assert stats["written"] == 1 and stats["stopped_at"] == 2
+        assert captured(out)[-1]["topic_url"] == newest["topic_url"]
+
+        # Nothing changed: the cached page is revalidated (304) and the crawl stops at once.
+        site.log.clear()
+        stats = crawl(6, out, **options)
+        assert stats["written"] == 0 and stats["stopped_at"] == 1 and stats["not_modified"] == 1
+        assert (1, 304) in [(page, status) for page, status, _ in site.log]
+        assert len(captured(out)) == len(cases) + 1
+    finally:
+        site.close()
+
+
+def test_redirects_are_followed_and_client_errors_are_not_retried(tmp_path):
+    cases = CASES[: PER_PAGE * 2]
+    site = ListingSite(cases, delay=0)
+    options = dict(concurrency=1, delay=0, retries=3, backoff=5.0, log=lambda msg: None)
+    try:
+        # The listing moved: the old path and the old page 2 both redirect, page 2 relatively.
+        site.redirects = {"/old/": site.base, "/old/page/2/": "/forums/available-solutions/page/2/"}
+        stats = crawl(2, tmp_path / "moved.jsonl", base=site.base.replace("/forums/available-solutions/", "/old/"), **options)
+        assert stats["written"] == 10
+        assert [r["topic_url"] for r in captured(tmp_path / "moved.jsonl")] == [c["topic_url"] for c in cases]
+        assert [status for _, status, _ in site.log] == [301, 200, 301, 200]
+
+        # A 404 fails at once instead of backing off for 5 + 10 seconds.
+        site.log.clear()
+        started = time.monotonic()
+        with pytest.raises(PermanentHTTPError):
+            crawl(3, tmp_path / "missing.jsonl", base=site.base, **options)
+        assert time.monotonic() - started < 2
+        assert [(page, status) for page, status, _ in site.log] == [(1, 200), (2, 200), (None, 404)]
+
+        # A redirect loop is cut off after MAX_REDIRECTS hops, also without retrying.
+        site.log.clear()
+        site.redirects = {"/a/": "/b/", "/b/": "/a/"}
+        with pytest.raises(PermanentHTTPError):
+            crawl(1, tmp_path / "loop.jsonl", base=site.base.replace("/forums/available-solutions/", "/a/"), **options)
+        assert len(site.log) == fetch_data.MAX_REDIRECTS + 1
+    finally:
+        site.close()
+
+
+def test_rate_limiter_spaces_requests_per_host():
+    async def run():
+        limiter = fetch_data.RateLimiter(0.05)
+        loop = asyncio.get_running_loop()
+        starts = {"a": [], "b": []}
+
+        async def hit(host):
+            await limiter.wait(host)
+            starts[host].append(loop.time())
+
+        await asyncio.gather(*(hit(host) for host in ["a", "b"] * 4))
+        return starts
+
+    starts = asyncio.run(run())
+    for times in starts.values():
+        assert all(b - a >= 0.04 for a, b in zip(times, times[1:]))
+    # Hosts are limited independently: b's first request does not wait behind a's.
+    assert starts["b"][0] < starts["a"][1]
@@ -0,0 +1,184 @@
+import pickle
+import sys
+from hashlib import blake2b
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from scripts.build_index import (
+    add_related_graph,
+    build_index,
+    case_meta,
+    case_partition,
+    case_title_len,
+    case_tokens,
+    default_classifier,
+    index_version_for,
+    load_jsonl,
+)
+from triage.analyzer import DEFAULT_ANALYZER
+from triage.dedup import MinHasher, collapse_cases, fingerprint, pack_fingerprint
+from triage.index_store import CompactIndex, ForwardIndex, IndexWriter, MetaWriter, meta_path_for, write_index
+from triage.knn import NO_NEIGHBOR, CosineView
+from triage.lsh import SimHasher
+from triage.scoring import PythonScorer, available_backends
+
+CASES_PATH = BASE_DIR / "data" / "cases.cleaned.jsonl"
+
+
+def in_memory_build(path, classifier=None, lsh=None):
+    cases = list(load_jsonl(CASES_PATH))
+    docs = collapse_cases(cases)
+    fwd = ForwardIndex(partitioned=classifier is not None)
+    if classifier is not None:
+        keyed = [(case_partition(case, classifier), case) for case in docs]
+        docs = [case for _, case in sorted(keyed, key=lambda kc: kc[0])]
+    meta = MetaWriter(meta_path_for(path))
+    for case in docs:
+        tokens = case_tokens(case)
+        partition = case_partition(case, classifier) if classifier is not None else ("", "")
+        fwd.add(case.get("case_id") or "", tokens, case_title_len(case, tokens), partition)
+        meta.add(case_meta(case))
+    meta.close()
+    info = {
+        "dedup": {"threshold": 0.8, "input_docs": len(cases), "num_perm": 32},
+        "index_version": index_version_for(fwd.num_docs, DEFAULT_ANALYZER),
+        "revision": 0,
+        "analyzer": DEFAULT_ANALYZER.config(),
+    }
+    if classifier is not None:
+        info["partitions"] = {"rules_version": classifier.rules_version}
+    if lsh is not None:
+        info["lsh"] = lsh.config()
+    write_index(path, fwd, meta.offsets, info)
+    writer, info = IndexWriter.reopen(path)
+    hasher = MinHasher()
+    writer.add_array("dedup_fingerprints", "Q", (v for case in docs for v in pack_fingerprint(*fingerprint(case, hasher)[:2], 32)))
+    writer.close(info)
+
+
+def assert_builds_match(tmp_path, classifier=None, lsh=None):
+    expected_path = tmp_path / "expected.idx"
+    in_memory_build(expected_path, classifier, lsh)
+    serial_path = tmp_path / "serial.idx"
+    parallel_path = tmp_path / "parallel.idx"
+    build_index(CASES_PATH, serial_path, classifier=classifier, lsh=lsh)
+    build_index(CASES_PATH, parallel_path, workers=2, chunk_size=97, classifier=classifier, lsh=lsh)
+
+    expected = CompactIndex(expected_path)
+    for path in (serial_path, parallel_path):
+        index = CompactIndex(path)
+        assert index.info == expected.info
+        assert sorted(index.sections) == sorted(expected.sections)
+        for name in expected.sections:
+            assert bytes(index.section(name)) == bytes(expected.section(name)), name
+        assert meta_path_for(path).read_bytes() == meta_path_for(expected_path).read_bytes()
+        index.close()
+    expected.close()
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_streaming_parallel_build_matches_in_memory_build(tmp_path):
+    assert_builds_match(tmp_path)
+
+
+def test_partitioned_build_groups_documents_by_category(tmp_path):
+    classifier = default_classifier()
+    assert_builds_match(tmp_path, classifier)
+
+    index = CompactIndex(tmp_path / "serial.idx")
+    names = index.partition_names["category"]
+    assert index.info["partitions"]["rules_version"] == classifier.rules_version
+    assert len(names) > 2 and "forum" in index.partition_names
+    covered = []
+    for name in names:
+        runs = index.partition("category", name)
+        assert len(runs) == 1  # one contiguous run per category
+        lo, hi = runs[0]
+        covered.append((lo, hi))
+        for doc_id in (lo, hi - 1):
+            case_id = index.case_ids()[doc_id]
+            case = next(c for c in load_jsonl(CASES_PATH) if c.get("case_id") == case_id)
+            assert case_partition(case, classifier)[0] == name
+    assert sorted(covered)[0][0] == 0 and sorted(covered)[-1][1] == index.num_docs
+    assert sum(hi - lo for lo, hi in covered) == index.num_docs
+    assert index.partition("category", "no-such-category") is None
+    index.close()
+
+
+def test_lsh_build_stores_bucket_tables(tmp_path):
+    lsh = SimHasher(tables=4, bits=5)
+    assert_builds_match(tmp_path, lsh=lsh)
+
+    index = CompactIndex(tmp_path / "serial.idx")
+    assert index.info["lsh"] == lsh.config()
+    n = index.num_docs
+    keys, table_keys, table_docs = index.lsh_keys, index.lsh_table_keys, index.lsh_table_docs
+    assert len(keys) == len(table_keys) == len(table_docs) == 4 * n
+    for t in range(4):
+        block = table_keys[t * n : (t + 1) * n]
+        docs = table_docs[t * n : (t + 1) * n]
+        assert list(block) == sorted(block) and sorted(docs) == list(range(n))
+        assert all(keys[d * 4 + t] == key for d, key in zip(docs, block))
+    # A document's keys come from its TF-IDF weights.
+    doc_id = 7
+    start, end = index.doc_offsets[doc_id], index.doc_offsets[doc_id + 1]
+    terms = [index.term(t) for t in index.doc_terms[start:end]]
+    weights = [c / index.doc_lengths[doc_id] * index.idf[t] for t, c in zip(index.doc_terms[start:end], index.doc_counts[start:end])]
+    assert list(keys[doc_id * 4 : doc_id * 4 + 4]) == lsh.keys(terms, weights)
+    index.close()
+
+    # The bit-sliced sums equal a per-term, per-hyperplane sum of signed weights.
+    top = max(weights)
+    naive = [0] * lsh.num_bits
+    for term, weight in zip(terms, weights):
+        q = max(1, round(255 * weight / top))
+        digest = blake2b(term.encode("utf-8"), digest_size=3, key=bytes(8)).digest()
+        for b in range(lsh.num_bits):
+            naive[b] += q if digest[b // 8] >> (b % 8) & 1 else -q
+    assert lsh.margins(terms, weights) == naive
+    assert pickle.loads(pickle.dumps(lsh)).margins(terms, weights) == naive
+
+
+def test_related_graph_is_the_exact_top_k(tmp_path):
+    index_path = tmp_path / "related.idx"
+    build_index(CASES_PATH, index_path, related=6, related_backend="maxscore")
+    index = CompactIndex(index_path)
+    assert index.info["knn"] == {"k": 6}
+    assert len(index.knn_docs) == len(index.knn_scores) == 6 * index.num_docs
+    view = CosineView(index)
+    exhaustive = PythonScorer(view)
+    for doc_id in range(index.num_docs):
+        row = list(zip(index.knn_docs[doc_id * 6 : doc_id * 6 + 6], index.knn_scores[doc_id * 6 : doc_id * 6 + 6]))
+        expected = [(d, s) for d, s in exhaustive.rank(view.query(doc_id), 1.0, 7) if d != doc_id and s > 0][:6]
+        assert row == expected + [(NO_NEIGHBOR, 0.0)] * (6 - len(expected))
+    # Scores are plain cosines between the cases' TF-IDF vectors.
+    vectors = []
+    for doc_id in range(index.num_docs):
+        start, end = index.doc_offsets[doc_id], index.doc_offsets[doc_id + 1]
+        vectors.append({t: w for t, w in zip(index.doc_terms[start:end], (c / index.doc_lengths[doc_id] for c in index.doc_counts[start:end]))})
+    for doc_id in range(0, index.num_docs, 50):
+        a = {t: w * index.idf[t] for t, w in vectors[doc_id].items()}
+        for other, score in zip(index.knn_docs[doc_id * 6 : doc_id * 6 + 6], index.knn_scores[doc_id * 6 : doc_id * 6 + 6]):
+            b = {t: w * index.idf[t] for t, w in vectors[other].items()}
+            dot = sum(w * b.get(t, 0.0) for t, w in a.items())
+            assert abs(score - dot / (index.doc_norms[doc_id] * index.doc_norms[other])) < 1e-12
+    # Case ids resolve through the sorted lookup to live documents.
+    case_ids = index.case_ids()
+    assert [case_ids[d] for d in index.case_id_order] == sorted(case_ids, key=lambda c: c.encode("utf-8"))
+    assert all(index.doc_id(case_id) == doc_id for doc_id, case_id in enumerate(case_ids))
+    assert index.doc_id("no-such-case") == -1
+    sections = {name: bytes(index.section(name)) for name in index.sections}
+    index.close()
+
+    # Blocks over worker processes, and the NumPy backend, give the same graph byte for byte.
+    backends = ["maxscore"] + (["numpy"] if "numpy" in available_backends() else [])
+    for backend in backends:
+        other_path = tmp_path / f"related-{backend}.idx"
+        build_index(CASES_PATH, other_path)
+        add_related_graph(other_path, 6, workers=2, block_size=97, backend=backend)
+        other = CompactIndex(other_path)
+        assert {name: bytes(other.section(name)) for name in other.sections} == sections, backend
+        other.close()
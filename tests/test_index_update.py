@@ -0,0 +1,197 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+import scripts.build_index as build_index_module
+from scripts.build_index import PartitionSpill, build_index, default_classifier, index_version_for, load_jsonl, update_index
+from triage.analyzer import DEFAULT_ANALYZER
+from triage.index_store import CompactIndex, ForwardIndex, MetaWriter, meta_path_for, write_index
+from triage.lsh import SimHasher
+from triage.retriever_tfidf import TfidfRetriever
+
+CASES = list(load_jsonl(BASE_DIR / "data" / "cases.cleaned.jsonl"))
+QUERIES = [
+    "Translation editor does not open for WooCommerce products",
+    "String translation missing after update",
+    "hreflang tags wrong on translated pages",
+    "zzzz-unknown-term",
+    "",
+]
+
+
+def write_cases(path, cases):
+    with path.open("w", encoding="utf-8") as f:
+        for c in cases:
+            f.write(json.dumps(c, ensure_ascii=False) + "\n")
+    return path
+
+
+def results(index_path):
+    retriever = TfidfRetriever(index_path)
+    return [[(c["case_id"], c["score"]) for c in retriever.search(q, top_k=10)] for q in QUERIES]
+
+
+def test_append_delete_compact_match_fresh_build(tmp_path):
+    base, extra = CASES[:1500], CASES[1500:1700]
+    deleted = [CASES[10]["case_id"], CASES[1600]["case_id"], CASES[1200]["case_id"]]
+    index_path = tmp_path / "tfidf.idx"
+    build_index(write_cases(tmp_path / "base.jsonl", base), index_path, dedup=False)
+
+    stats = update_index(index_path, append_path=write_cases(tmp_path / "extra.jsonl", extra), delete_ids=deleted[:1])
+    assert stats["appended"] == len(extra) and stats["deleted"] == 1
+    stats = update_index(index_path, delete_ids=deleted[1:])
+    assert stats["deleted"] == 2
+    assert stats["index_version"] != index_version_for(stats["live"], DEFAULT_ANALYZER)
+
+    survivors = [c for c in base + extra if c["case_id"] not in deleted]
+    fresh_path = tmp_path / "fresh.idx"
+    build_index(write_cases(tmp_path / "fresh.jsonl", survivors), fresh_path, dedup=False)
+    expected = results(fresh_path)
+    assert results(index_path) == expected
+
+    stats = update_index(index_path, compact=True)
+    assert stats["docs"] == stats["live"] == len(survivors)
+    assert results(index_path) == expected
+
+
+def test_updates_publish_index_and_metadata_together(tmp_path):
+    index_path = tmp_path / "tfidf.idx"
+    build_index(write_cases(tmp_path / "base.jsonl", CASES[:300]), index_path, dedup=False)
+    first = CompactIndex(index_path)
+    assert first.meta_path == meta_path_for(index_path)
+
+    update_index(index_path, append_path=write_cases(tmp_path / "extra.jsonl", CASES[300:320]))
+    second = CompactIndex(index_path)
+    # The new index names its own metadata file; the old pair stays intact for open readers.
+    assert second.meta_path.name == "tfidf.idx.1.meta" and second.info["meta_file"] == "tfidf.idx.1.meta"
+    assert first.meta(299) == second.meta(299) and second.meta(319)["case_id"] == CASES[319]["case_id"]
+    assert first.meta_path.exists()
+
+    update_index(index_path, delete_ids=[CASES[0]["case_id"]])
+    third = CompactIndex(index_path)
+    assert third.meta_path.name == "tfidf.idx.2.meta" and third.meta(319) == second.meta(319)
+    # Metadata files older than the previous update are removed.
+    assert not first.meta_path.exists() and second.meta_path.exists()
+    update_index(index_path, compact=True)
+    assert sorted(p.name for p in tmp_path.glob("tfidf.idx*")) == ["tfidf.idx", "tfidf.idx.1.meta", "tfidf.idx.2.meta"]
+    for index in (first, second, third):
+        index.close()
+
+
+def test_appended_duplicates_are_folded_into_stored_cases(tmp_path, monkeypatch):
+    base, extra = CASES[:900], CASES[900:]
+    index_path = tmp_path / "tfidf.idx"
+    build_index(write_cases(tmp_path / "base.jsonl", base), index_path)
+    index = CompactIndex(index_path)
+    assert index.info["dedup"]["input_docs"] == len(base)
+    index.close()
+
+    # Stored cases are matched by their stored fingerprints: only documents
+    # that absorb a duplicate have their metadata decoded.
+    decoded = []
+    meta = CompactIndex.meta
+    monkeypatch.setattr(CompactIndex, "meta", lambda self, doc_id: decoded.append(doc_id) or meta(self, doc_id))
+    stats = update_index(index_path, append_path=write_cases(tmp_path / "extra.jsonl", extra))
+    monkeypatch.undo()
+    assert stats["folded"] > 0 and stats["appended"] + stats["folded"] == len(extra)
+    assert len(decoded) <= stats["folded"]
+    index = CompactIndex(index_path)
+    assert index.info["dedup"]["input_docs"] == len(CASES)
+    # Every appended URL is cited: by its own document or by the one it was folded into.
+    urls = set()
+    for doc_id in range(index.num_docs):
+        urls.update(index.meta(doc_id)["source_urls"])
+    assert {c["topic_url"] for c in extra if c["topic_url"]} <= urls
+    # No two live documents share a problem text.
+    problems = [index.meta(doc_id)["problem"].strip().lower() for doc_id in range(index.num_docs)]
+    assert len(set(problems)) == len(problems)
+    index.close()
+
+    # Appended documents' fingerprints are stored too: appending the same cases again folds them all.
+    stats = update_index(index_path, append_path=tmp_path / "extra.jsonl")
+    assert stats["appended"] == 0 and stats["folded"] == len(extra)
+
+
+def test_updates_keep_partitions_grouped_and_derived_tables_current(tmp_path, monkeypatch):
+    classifier = default_classifier()
+    base, extra = CASES[:600], CASES[600:800]
+    deleted = [CASES[5]["case_id"], CASES[300]["case_id"]]
+    index_path = tmp_path / "tfidf.idx"
+    lsh = SimHasher(tables=4, bits=6)
+    build_index(write_cases(tmp_path / "base.jsonl", base), index_path, dedup=False, classifier=classifier, lsh=lsh, related=5)
+    update_index(index_path, append_path=write_cases(tmp_path / "extra.jsonl", extra), delete_ids=deleted, classifier=classifier, workers=2)
+
+    index = CompactIndex(index_path)
+    # Appended cases join their category's run instead of trailing the index.
+    assert all(len(index.partition("category", name)) == 1 for name in index.partition_names["category"])
+    index.close()
+
+    survivors = [c for c in base + extra if c["case_id"] not in deleted]
+    fresh_path = tmp_path / "fresh.idx"
+    build_index(write_cases(tmp_path / "fresh.jsonl", survivors), fresh_path, dedup=False, classifier=classifier, lsh=lsh, related=5)
+    expected = results(fresh_path)
+    assert results(index_path) == expected
+    # The related-cases graph is recomputed too, and never lists a deleted case.
+    updated, fresh = TfidfRetriever(index_path), TfidfRetriever(fresh_path)
+    for case in survivors:
+        assert updated.related(case["case_id"]) == fresh.related(case["case_id"])
+    for case_id in deleted:
+        with pytest.raises(KeyError):
+            updated.related(case_id)
+
+    # LSH keys and the graph are recomputed with the updated IDFs, so compaction also matches a fresh build.
+    # Compaction keeps the live cases and their weights: graph rows are renumbered, not recomputed.
+    monkeypatch.setattr(build_index_module, "add_related_graph", lambda *args, **kwargs: pytest.fail("graph recomputed"))
+    update_index(index_path, compact=True)
+    compacted, fresh = CompactIndex(index_path), CompactIndex(fresh_path)
+    assert compacted.partition_names == fresh.partition_names
+    for name in fresh.sections:
+        assert bytes(compacted.section(name)) == bytes(fresh.section(name)), name
+    assert compacted.meta_path.read_bytes() == fresh.meta_path.read_bytes()
+    compacted.close()
+    fresh.close()
+
+
+def test_partition_codes_widen_past_16_bits(tmp_path):
+    forums = 0x10000 + 5
+    fwd = ForwardIndex(partitioned=True)
+    meta = MetaWriter(meta_path_for(tmp_path / "tfidf.idx"))
+    for i in range(forums):
+        fwd.add(f"c{i}", ["editor", f"w{i % 7}"], 1, ("translation", f"Forum {i:06d}"))
+        meta.add({"case_id": f"c{i}"})
+    meta.close()
+    write_index(tmp_path / "tfidf.idx", fwd, meta.offsets, {"partitions": {"rules_version": "r"}})
+    index = CompactIndex(tmp_path / "tfidf.idx")
+    assert index.sections["doc_forum"][1] == "I" and index.sections["doc_category"][1] == "H"
+    assert len(index.partition_names["forum"]) == forums
+    assert index.partition("forum", f"Forum {forums - 1:06d}") == [(forums - 1, forums)]
+    index.close()
+
+
+def test_partition_spill_bounds_open_files(tmp_path):
+    spill = PartitionSpill(tmp_path / "tfidf.idx", max_open=2)
+    keys = [("c", f"f{i % 5}") for i in range(20)]
+    spill.add([f"line {i}" for i in range(20)], keys)
+    assert len(spill._open) == 2
+    assert list(spill.lines()) == [f"line {i}" for i in sorted(range(20), key=lambda i: (keys[i], i))]
+    spill.close()
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_append_rejects_changed_rules(tmp_path):
+    index_path = tmp_path / "tfidf.idx"
+    build_index(write_cases(tmp_path / "base.jsonl", CASES[:200]), index_path, dedup=False, classifier=default_classifier())
+    before = index_path.read_bytes()
+    changed = default_classifier()
+    changed.rules_version = "changed"
+    with pytest.raises(ValueError, match="rules version"):
+        update_index(index_path, append_path=write_cases(tmp_path / "extra.jsonl", CASES[200:210]), classifier=changed)
+    assert index_path.read_bytes() == before
+    # Deletes classify nothing and still apply.
+    assert update_index(index_path, delete_ids=[CASES[0]["case_id"]], classifier=changed)["deleted"] == 1
@@ -1,4 +1,6 @@
 import json
+import shutil
+import subprocess
 import sys
 from pathlib import Path
 
@@ -12,7 +14,7 @@ from triage.schema import PipelineOutput
 
 
 def ensure_index():
-    index_path = BASE_DIR / "artifacts" / "tfidf.joblib"
+    index_path = BASE_DIR / "artifacts" / "tfidf.idx"
     if not index_path.exists():
         cases_path = BASE_DIR / "data" / "cases.cleaned.jsonl"
         build_index(cases_path, index_path)
@@ -33,3 +35,41 @@ def test_pipeline_smoke():
     assert parsed.citations, "citations should not be empty"
     assert parsed.meta.rules_version, "rules_version should be set"
     assert parsed.meta.index_version, "index_version should be set"
+
+
+def test_classify_only_never_opens_the_index(tmp_path):
+    # No artifacts at all: a classify-only pipeline must not need them.
+    shutil.copytree(BASE_DIR / "configs", tmp_path / "configs")
+    pipeline = load_default_pipeline(tmp_path, classify_only=True)
+    query = "Translation editor does not open for WooCommerce products"
+    output = pipeline.run(query)
+    assert output.citations == [] and output.meta.index_version == ""
+
+    ensure_index()
+    full = load_default_pipeline(BASE_DIR).run(query)
+    assert output.triage == full.triage and output.action_plan == full.action_plan
+
+
+def loaded_modules(*cli_args):
+    """Run the CLI once in a fresh interpreter; the heavy modules it imported, and its stdout."""
+    probe = (
+        "import runpy, sys; sys.argv = ['cli.py'] + sys.argv[1:]; "
+        f"sys.path.insert(0, {str(BASE_DIR / 'src')!r}); "
+        f"runpy.run_path({str(BASE_DIR / 'src' / 'cli.py')!r}, run_name='__main__'); "
+        "heavy = ('numpy', 'scipy', 'multiprocessing', 'triage.index_store', 'triage.scoring'); "
+        "print('imported:' + ','.join(m for m in heavy if m in sys.modules), file=sys.stderr)"
+    )
+    proc = subprocess.run([sys.executable, "-c", probe, *cli_args], capture_output=True, text=True, check=True)
+    imported = proc.stderr.strip().splitlines()[-1].split(":", 1)[1]
+    return set(filter(None, imported.split(","))), json.loads(proc.stdout)
+
+
+def test_one_shot_cli_defers_heavy_imports():
+    ensure_index()
+    query = "Translation editor does not open"
+    modules, output = loaded_modules("--classify-only", query)
+    assert not modules and output["citations"] == []
+
+    for ranking in ("tfidf", "bm25"):
+        modules, output = loaded_modules("--ranking", ranking, query)
+        assert modules == {"triage.index_store", "triage.scoring"} and output["citations"]
@@ -0,0 +1,200 @@
+import math
+import pickle
+import sys
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from scripts.build_index import build_index, default_classifier, load_jsonl
+from triage.config_bundle import load_config
+from triage.index_store import CompactIndex
+from triage.lsh import SimHasher
+from triage.pipeline import Pipeline, PipelineVersions
+from triage.retriever_tfidf import TfidfRetriever
+from triage.analyzer import DEFAULT_ANALYZER
+from triage.scoring import RANKINGS, available_backends
+
+CASES_PATH = BASE_DIR / "data" / "cases.cleaned.jsonl"
+
+
+def full_scan(index, query_text, top_k):
+    q_tokens = DEFAULT_ANALYZER.tokens(query_text)
+    tf = {}
+    for t in q_tokens:
+        tf[t] = tf.get(t, 0) + 1
+    idf = index["idf"]
+    q_vec = {t: (c / len(q_tokens)) * idf.get(t, 0.0) for t, c in tf.items() if t in idf}
+    q_norm = math.sqrt(sum(v * v for v in q_vec.values())) or 1.0
+    scores = []
+    for idx, (doc_vec, doc_norm) in enumerate(zip(index["doc_vectors"], index["doc_norms"])):
+        dot = sum(q_vec.get(term, 0.0) * doc_vec.get(term, 0.0) for term in q_vec.keys())
+        scores.append((idx, dot / (q_norm * doc_norm)))
+    scores.sort(key=lambda x: x[1], reverse=True)
+    return [(index["meta"][i]["case_id"], sc) for i, sc in scores[:top_k]]
+
+
+def build_both(tmp_path):
+    pickle_path = tmp_path / "tfidf.joblib"
+    compact_path = tmp_path / "tfidf.idx"
+    build_index(CASES_PATH, pickle_path, fmt="pickle")
+    build_index(CASES_PATH, compact_path)
+    with pickle_path.open("rb") as f:
+        return pickle.load(f), pickle_path, compact_path
+
+
+def test_postings_search_matches_full_scan(tmp_path):
+    index, _, compact_path = build_both(tmp_path)
+    retriever = TfidfRetriever(compact_path)
+    assert isinstance(retriever.index, CompactIndex)
+    assert retriever.index_version == index["index_version"]
+
+    queries = [c.get("title", "") for c in list(load_jsonl(CASES_PATH))[:60]]
+    queries += ["", "zzzz-unknown-term", "Translation editor does not open for WooCommerce products"]
+    for query in queries:
+        for top_k in (1, 5, 20):
+            got = [(c["case_id"], c["score"]) for c in retriever.search(query, top_k=top_k)]
+            assert got == full_scan(index, query, top_k), query
+
+
+def test_legacy_pickle_matches_compact(tmp_path):
+    index, pickle_path, compact_path = build_both(tmp_path)
+    del index["postings"]
+    legacy_path = tmp_path / "legacy.joblib"
+    with legacy_path.open("wb") as f:
+        pickle.dump(index, f)
+
+    query = "String translation missing after update"
+    expected = TfidfRetriever(compact_path).search(query)
+    assert TfidfRetriever(pickle_path).search(query) == expected
+    assert TfidfRetriever(legacy_path).search(query) == expected
+
+
+def test_compact_index_lookups(tmp_path):
+    index, _, compact_path = build_both(tmp_path)
+    compact = CompactIndex(compact_path)
+    assert compact.num_docs == len(index["doc_norms"])
+    assert compact.num_terms == len(index["idf"])
+    for term, idf in list(index["idf"].items())[:200]:
+        assert compact.idf[compact.term_id(term)] == idf
+    assert compact.term_id("zzzz-unknown-term") == -1
+    assert compact.meta(3) == index["meta"][3]
+
+
+def test_partition_search_matches_filtered_full_search(tmp_path):
+    index_path = tmp_path / "tfidf.idx"
+    # Without dedup some cases have no forum, so forum partitions span several runs.
+    build_index(CASES_PATH, index_path, dedup=False, classifier=default_classifier())
+    assert len(CompactIndex(index_path).partition("forum", "English Support")) > 1
+    queries = [c.get("title", "") for c in list(load_jsonl(CASES_PATH))[:40]] + ["", "zzzz-unknown-term"]
+    for ranking in RANKINGS:
+        for backend in available_backends(ranking):
+            retriever = TfidfRetriever(index_path, backend=backend, ranking=ranking)
+            index = retriever.index
+            partitions = [("category", name) for name in index.partition_names["category"]]
+            partitions += [("forum", name) for name in index.partition_names["forum"]]
+            for field, name in partitions:
+                runs = index.partition(field, name)
+                scorer = retriever.partition_scorer(field, name)
+                for query in queries:
+                    q_vec, q_norm = retriever.query_vector(query)
+                    expected = retriever.scorer.rank(q_vec, q_norm, 5, lambda d: any(lo <= d < hi for lo, hi in runs))
+                    assert scorer.rank(q_vec, q_norm, 5) == expected, (ranking, backend, name, query)
+            assert retriever.partition_scorer("category", "no-such-category") is None
+
+
+def test_partitioned_citations_widen_below_the_floor(tmp_path):
+    index_path = tmp_path / "tfidf.idx"
+    build_index(CASES_PATH, index_path, classifier=default_classifier())
+    query = "Translation editor does not open for WooCommerce products"
+    full = TfidfRetriever(index_path).citations(query)
+
+    strict = TfidfRetriever(index_path, partition_floor=0.0)
+    lo, hi = strict.index.partition("category", "seo")[0]
+    seo_ids = set(strict.index.case_ids()[lo:hi])
+    assert {c.case_id for c in strict.citations(query, partition=("category", "seo"))} <= seo_ids
+    assert strict.partition_searches == 1 and strict.partition_widened == 0
+
+    # Widening merges in the rest of the index: exactly the unpartitioned ranking.
+    queries = [c.get("title", "") for c in list(load_jsonl(CASES_PATH))[:30]] + [query, "", "zzzz-unknown-term"]
+    for ranking in RANKINGS:
+        for backend in available_backends(ranking):
+            unpartitioned = TfidfRetriever(index_path, backend=backend, ranking=ranking)
+            picky = TfidfRetriever(index_path, backend=backend, ranking=ranking, partition_floor=float("inf"))
+            for text in queries:
+                for name in picky.index.partition_names["category"]:
+                    assert picky.citations(text, partition=("category", name)) == unpartitioned.citations(text)
+                capped = picky.citations(text, max_per_topic=1, partition=("category", "seo"))
+                assert capped == unpartitioned.citations(text, max_per_topic=1)
+            assert picky.partition_widened == picky.partition_searches
+    assert strict.citations(query, partition=("category", "no-such-category")) == full
+
+    config = load_config(BASE_DIR / "configs")
+    pipeline = Pipeline(config.classifier, strict, config.planner, PipelineVersions("", ""), partition_confidence=0.5)
+    output = pipeline.run(query)
+    assert output.triage.category == "translation" and strict.partition_searches == 2
+    lo, hi = strict.index.partition("category", "translation")[0]
+    assert {c.case_id for c in output.citations} <= set(strict.index.case_ids()[lo:hi])
+
+
+def test_approximate_search_rescores_lsh_candidates(tmp_path):
+    index_path = tmp_path / "tfidf.idx"
+    build_index(CASES_PATH, index_path, lsh=SimHasher(tables=8, bits=6))
+    queries = [c.get("title", "") for c in list(load_jsonl(CASES_PATH))[:40]] + ["", "zzzz-unknown-term"]
+    for ranking in RANKINGS:
+        exact = TfidfRetriever(index_path, backend="python", ranking=ranking)
+        approx = TfidfRetriever(index_path, ranking=ranking, approximate=True, lsh_probes=1)
+        assert approx.index_version == exact.index_version + "+lsh@1"
+        for query in queries:
+            q_vec, q_norm = approx.query_vector(query)
+            candidates = set(approx.scorer.candidates(q_vec))
+            assert len(candidates) < exact.index.num_docs or not q_vec
+            # The exhaustive ranking of just the candidates (zero-score padding aside).
+            expected = exact.scorer.rank(q_vec, q_norm, 5, candidates.__contains__)
+            got = approx.scorer.rank(q_vec, q_norm, 5)
+            assert [r for r in got if r[1]] == [r for r in expected if r[1]], (ranking, query)
+            assert len(got) == 5
+
+    # One table of one bit, probed both ways, proposes every document.
+    everything_path = tmp_path / "everything.idx"
+    build_index(CASES_PATH, everything_path, lsh=SimHasher(tables=1, bits=1))
+    for ranking in RANKINGS:
+        exact = TfidfRetriever(everything_path, backend="python", ranking=ranking)
+        approx = TfidfRetriever(everything_path, ranking=ranking, approximate=True, lsh_probes=1)
+        for query in queries:
+            assert approx.citations(query) == exact.citations(query)
+            assert approx.citations(query, max_per_topic=1) == exact.citations(query, max_per_topic=1)
+        assert approx.citations_batch(queries[:5]) == exact.citations_batch(queries[:5])
+
+    plain_path = tmp_path / "plain.idx"
+    build_index(CASES_PATH, plain_path)
+    with pytest.raises(ValueError, match="--lsh"):
+        TfidfRetriever(plain_path, approximate=True)
+
+
+def test_related_cases_come_from_the_stored_graph(tmp_path):
+    index_path = tmp_path / "tfidf.idx"
+    build_index(CASES_PATH, index_path, related=5)
+    retriever = TfidfRetriever(index_path)
+    cases = {}
+    for case in load_jsonl(CASES_PATH):
+        cases.setdefault(case["case_id"], case)  # the index keeps the first of duplicated ids
+    for case_id in retriever.index.case_ids():
+        related = retriever.related(case_id)
+        # The same cases a search with the case's own text finds, itself aside.
+        searched = [c for c in retriever.citations(cases[case_id]["analysis_text"], 6) if c.case_id != case_id][:5]
+        assert [c.case_id for c in related] == [c.case_id for c in searched]
+        assert [c.score for c in related] == pytest.approx([c.score for c in searched], abs=1e-12)
+        assert retriever.related(case_id, 2) == related[:2]
+    with pytest.raises(KeyError):
+        retriever.related("no-such-case")
+    with pytest.raises(ValueError, match="--related 6"):
+        retriever.related(case_id, 6)
+
+    plain_path = tmp_path / "plain.idx"
+    build_index(CASES_PATH, plain_path)
+    with pytest.raises(ValueError, match="--related"):
+        TfidfRetriever(plain_path).related(case_id)
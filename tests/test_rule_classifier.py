@@ -0,0 +1,109 @@
+import json
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR / "src"))
+
+from triage.matcher import KeywordAutomaton
+from triage.pipeline import load_yaml
+from triage.rule_classifier import RuleClassifier, normalize_text
+
+
+def padded_words(text):
+    return " " + " ".join(re.findall(r"[\w']+", text)) + " "
+
+
+def keyword_hit(kw, q):
+    if kw.get("match") == "word":
+        return padded_words(normalize_text(kw.get("pattern", ""))) in padded_words(q)
+    return kw.get("pattern", "") in q
+
+
+def naive_classify(rules_cfg, query_text):
+    q = normalize_text(query_text)
+    scored = []
+    for cat, rule in rules_cfg.get("categories", {}).items():
+        score = 0.0
+        matched = []
+        for kw in rule.get("keywords", []):
+            if keyword_hit(kw, q):
+                score += float(kw.get("weight", 0.0))
+                matched.append({"id": kw.get("id", ""), "weight": float(kw.get("weight", 0.0))})
+        for rx in rule.get("regex", []):
+            pattern = rx.get("pattern", "")
+            if pattern and re.search(pattern, q, flags=re.I):
+                score += float(rx.get("weight", 0.0))
+                matched.append({"id": rx.get("id", ""), "weight": float(rx.get("weight", 0.0))})
+        scored.append((cat, score, matched))
+    scored.sort(key=lambda x: x[1], reverse=True)
+    top_cat, s1, m1 = scored[0]
+    s2 = scored[1][1] if len(scored) > 1 else 0.0
+    conf = max(0.0, min(1.0, 0.0 if s1 <= 0 else (s1 - s2) / (s1 + 1e-6)))
+    thresholds = rules_cfg.get("thresholds", {})
+    category = top_cat
+    if s1 < float(thresholds.get("min_score", 0.0)) or conf < float(thresholds.get("min_confidence", 0.0)):
+        category = "other"
+    return {"category": category, "confidence": conf, "signals": m1}
+
+
+def test_automaton_finds_overlapping_patterns():
+    automaton = KeywordAutomaton(["he", "she", "his", "hers", "translation editor", "ate", ""])
+    assert automaton.find("ushers") == {"he", "she", "hers", ""}
+    assert automaton.find("advanced translation editor; update") == {"translation editor", "ate", ""}
+    assert automaton.find("") == {""}
+
+
+def test_compiled_classifier_matches_naive_scan():
+    rules_cfg = load_yaml(BASE_DIR / "configs" / "rules.yaml")
+    classifier = RuleClassifier(rules_cfg)
+    with (BASE_DIR / "data" / "cases.cleaned.jsonl").open("r", encoding="utf-8") as f:
+        texts = [json.loads(line).get("analysis_text", "") for line in f if line.strip()]
+    texts += ["", "Translation editor does not open for WooCommerce products"]
+    for text in texts:
+        assert classifier.classify(text) == naive_classify(rules_cfg, text), text
+
+
+def test_word_match_respects_word_boundaries():
+    automaton = KeywordAutomaton([("ate",), ("multi", "currency"), ("wpml", "st")])
+    assert automaton.find(("translate", "update", "activate")) == set()
+    assert automaton.find(("the", "ate", "multi", "currency", "wpml", "st")) == {("ate",), ("multi", "currency"), ("wpml", "st")}
+
+    rules_cfg = {
+        "categories": {
+            "translation": {
+                "keywords": [
+                    {"id": "kw:ate", "pattern": "ate", "weight": 1.0, "match": "word"},
+                    {"id": "kw:ate substring", "pattern": "ate", "weight": 0.5},
+                    {"id": "kw:multicurrency", "pattern": "Multi Currency", "weight": 2.0, "match": "word"},
+                ]
+            }
+        }
+    }
+    classifier = RuleClassifier(rules_cfg)
+    assert [s["id"] for s in classifier.classify("Please update and translate")["signals"]] == ["kw:ate substring"]
+    signals = classifier.classify("ATE: multi-currency prices (ate)")["signals"]
+    assert [s["id"] for s in signals] == ["kw:ate", "kw:ate substring", "kw:multicurrency"]
+    with pytest.raises(ValueError):
+        RuleClassifier({"categories": {"x": {"keywords": [{"id": "k", "pattern": "a", "match": "prefix"}]}}})
+
+
+def test_regex_prefilter_keeps_alternations():
+    rules_cfg = {
+        "categories": {
+            "x": {
+                "regex": [
+                    {"id": "rx:alternation", "pattern": r"\bab\b|xyz", "weight": 1.0},
+                    {"id": "rx:grouped", "pattern": r"\bcd\b (?:ef|gh)", "weight": 0.5},
+                    {"id": "rx:both", "pattern": r"\bab\b|\bcd\b", "weight": 0.25},
+                ]
+            }
+        }
+    }
+    classifier = RuleClassifier(rules_cfg)
+    for text in ["hello xyz", "ab here", "cd gh", "cd", "nothing", "ÀB xyz"]:
+        assert classifier.classify(text) == naive_classify(rules_cfg, text), text
+    assert [s["id"] for s in classifier.classify("hello xyz")["signals"]] == ["rx:alternation"]
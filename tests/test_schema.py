@@ -0,0 +1,75 @@
+import io
+import json
+import pickle
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from test_pipeline_smoke import ensure_index
+from triage.pipeline import load_default_pipeline
+from triage.schema import SCHEMA_VERSION, ActionPlan, Citation, Meta, PipelineOutput, Query, Signal, TriageResult
+from triage.timing import StageTimer
+
+TEXTS = [json.loads(line)["analysis_text"] for line in (BASE_DIR / "data" / "cases.cleaned.jsonl").open(encoding="utf-8")]
+
+
+def reference_json(output):
+    return json.dumps(output.dict(), ensure_ascii=False, default=str)
+
+
+def test_json_is_byte_identical_to_dumping_the_dict():
+    ensure_index()
+    pipeline = load_default_pipeline(BASE_DIR, timer=StageTimer())
+    for text in TEXTS + ["", "Café “quotes” \\ \"x\" \t naïve 日本語 \U0001f600"]:
+        output = pipeline.run(text)
+        assert output.json() == reference_json(output)
+        stream = io.StringIO()
+        output.write(stream)
+        assert stream.getvalue() == output.json()
+
+    odd = PipelineOutput(
+        query=Query(text=" \x00</script>"),
+        triage=TriageResult(category=None, confidence=float("nan"), signals=[Signal(id="kw", weight=1), {"id": "raw", "weight": True}]),
+        citations=[Citation(case_id=None, source="s", topic_url=None, title=None, score=float("-inf"), source_urls=["u", "ü"])],
+        action_plan=ActionPlan(next_questions=[], diagnostic_steps=["x"]),
+        meta=Meta(generated_at=datetime(2026, 1, 2, tzinfo=timezone.utc), rules_version="r", index_version="", timings={"total_ms": 0.5}),
+    )
+    assert odd.json() == reference_json(odd)
+
+
+def test_components_return_slotted_records():
+    ensure_index()
+    pipeline = load_default_pipeline(BASE_DIR)
+    output = pipeline.run("Translation editor does not open for WooCommerce products")
+    records = [output, output.query, output.triage, output.action_plan, output.meta] + output.citations + output.triage.signals
+    assert all(not hasattr(r, "__dict__") for r in records)
+    assert all(isinstance(s, Signal) for s in output.triage.signals)
+    assert output.citations and all(isinstance(c, Citation) for c in output.citations)
+
+    # dict() hands out fresh containers; the playbook's lists are never exposed.
+    d = output.dict()
+    d["action_plan"]["next_questions"].append("mutated")
+    d["citations"][0]["source_urls"].append("mutated")
+    assert output.dict() != d and "mutated" not in pipeline.planner.plan(output.triage.category, 1.0).next_questions
+
+    assert pickle.loads(pickle.dumps(output)) == output
+    assert PipelineOutput.parse_obj(json.loads(output.json())) == output
+
+
+def test_schema_version_tracks_the_citation_shape():
+    ensure_index()
+    output = load_default_pipeline(BASE_DIR).run("Translation editor does not open for WooCommerce products")
+    obj = json.loads(output.json())
+    assert obj["schema_version"] == SCHEMA_VERSION == "0.2"
+    assert all("source_urls" in c for c in obj["citations"])
+
+    # 0.1 output had no source_urls; it still parses and keeps its version.
+    obj["schema_version"] = "0.1"
+    for c in obj["citations"]:
+        del c["source_urls"]
+    old = PipelineOutput.parse_obj(obj)
+    assert old.schema_version == "0.1" and all(c.source_urls == [] for c in old.citations)
@@ -0,0 +1,64 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from scripts.build_index import build_index, load_jsonl
+from triage.retriever_tfidf import TfidfRetriever
+from triage.scoring import PythonScorer, available_backends, make_scorer
+
+CASES_PATH = BASE_DIR / "data" / "cases.cleaned.jsonl"
+QUERIES = [c["analysis_text"] for c in list(load_jsonl(CASES_PATH))[:300:3]] + [
+    "Translation editor does not open for WooCommerce products",
+    "zzzz-unknown-term",
+    "",
+]
+
+
+def test_backend_selection(tmp_path):
+    index_path = tmp_path / "tfidf.idx"
+    build_index(CASES_PATH, index_path)
+    retriever = TfidfRetriever(index_path, backend="python")
+    assert isinstance(retriever.scorer, PythonScorer)
+    assert make_scorer(retriever.index).name == available_backends()[-1]
+    with pytest.raises(ValueError):
+        make_scorer(retriever.index, "gpu")
+
+
+def test_search_batch_matches_search(tmp_path):
+    index_path = tmp_path / "tfidf.idx"
+    build_index(CASES_PATH, index_path, dedup=False)
+    python = TfidfRetriever(index_path, backend="python")
+    expected = [python.search(q, top_k=7) for q in QUERIES]
+    for backend in available_backends():
+        retriever = TfidfRetriever(index_path, backend=backend)
+        assert [retriever.search(q, top_k=7) for q in QUERIES] == expected
+        assert retriever.search_batch(QUERIES, top_k=7) == expected
+        assert retriever.search_batch(QUERIES, max_per_topic=1) == [python.search(q, max_per_topic=1) for q in QUERIES]
+
+
+def test_numpy_backend_on_legacy_pickle(tmp_path):
+    pytest.importorskip("numpy")
+    pickle_path = tmp_path / "tfidf.joblib"
+    build_index(CASES_PATH, pickle_path, fmt="pickle")
+    python = TfidfRetriever(pickle_path, backend="python")
+    vectorized = TfidfRetriever(pickle_path, backend="numpy")
+    assert vectorized.search_batch(QUERIES) == [python.search(q) for q in QUERIES]
+
+
+def test_numpy_postings_are_views_of_the_mapped_index(tmp_path):
+    np = pytest.importorskip("numpy")
+    index_path = tmp_path / "tfidf.idx"
+    build_index(CASES_PATH, index_path)
+    retriever = TfidfRetriever(index_path, backend="numpy")
+    index, scorer = retriever.index, retriever.scorer
+    term_id = max(range(index.num_terms), key=lambda t: index.term_offsets[t + 1] - index.term_offsets[t])
+    docs, weights = scorer._term_postings(term_id)
+    # Nothing is copied or kept per term: the arrays read the memory-mapped sections.
+    assert np.shares_memory(docs, np.asarray(index.post_docs))
+    assert np.shares_memory(weights, np.asarray(index.post_weights))
+    assert not hasattr(scorer, "_postings")
@@ -0,0 +1,99 @@
+import http.client
+import json
+import sys
+import threading
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from test_pipeline_smoke import ensure_index
+from triage.pipeline import load_default_pipeline
+from triage.schema import PipelineOutput
+from triage.server import TriageServer
+
+
+def post(url, body):
+    req = urllib.request.Request(url, data=json.dumps(body).encode("utf-8"), headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=10) as resp:
+        return resp.status, json.loads(resp.read())
+
+
+def test_triage_endpoints_on_localhost():
+    ensure_index()
+    server = TriageServer(("127.0.0.1", 0), load_default_pipeline(BASE_DIR))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        status, body = post(f"{base}/triage", {"text": "Translation editor does not open for WooCommerce products"})
+        assert status == 200
+        parsed = PipelineOutput.parse_obj(body)
+        assert parsed.citations and parsed.meta.index_version
+
+        texts = ["Sitemap shows 404 for translated pages", "I was charged twice"]
+        status, body = post(f"{base}/triage/batch", {"texts": texts})
+        assert status == 200
+        assert [r["query"]["text"] for r in body["results"]] == texts
+
+        # Large batches are streamed in chunks as each output is encoded.
+        many = [f"Translation editor does not open #{i}" for i in range(300)]
+        req = urllib.request.Request(f"{base}/triage/batch", data=json.dumps({"texts": many}).encode("utf-8"))
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            assert resp.headers["Transfer-Encoding"] == "chunked"
+            results = json.loads(resp.read())["results"]
+        assert [r["query"]["text"] for r in results] == many
+        # The connection is kept alive after a streamed response.
+        status, body = post(f"{base}/triage/batch", {"texts": []})
+        assert status == 200 and body == {"results": []}
+
+        try:
+            post(f"{base}/triage", {"query": "missing text field"})
+            raise AssertionError("expected HTTP 400")
+        except urllib.error.HTTPError as e:
+            assert e.code == 400
+            assert "error" in json.loads(e.read())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_batch_failures_are_never_sent_as_complete_responses():
+    ensure_index()
+    pipeline = load_default_pipeline(BASE_DIR)
+    run = pipeline.run
+
+    def flaky_run(text):
+        if text == "boom":
+            raise RuntimeError("pipeline failed")
+        return run(text)
+
+    pipeline.run = flaky_run
+    server = TriageServer(("127.0.0.1", 0), pipeline)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        # Failing on the first output: nothing has been sent yet, so the status says so.
+        with pytest.raises(urllib.error.HTTPError) as e:
+            post(f"{base}/triage/batch", {"texts": ["boom", "I was charged twice"]})
+        assert e.value.code == 500 and "error" in json.loads(e.value.read())
+
+        # Failing part-way: the 200 is out, so the body ends without its last chunk.
+        texts = [f"Translation editor does not open #{i}" for i in range(100)] + ["boom"]
+        req = urllib.request.Request(f"{base}/triage/batch", data=json.dumps({"texts": texts}).encode("utf-8"))
+        with urllib.request.urlopen(req, timeout=30) as resp:
+            assert resp.status == 200 and resp.headers["Transfer-Encoding"] == "chunked"
+            with pytest.raises(http.client.IncompleteRead):
+                resp.read()
+
+        status, body = post(f"{base}/triage/batch", {"texts": ["I was charged twice"]})
+        assert status == 200 and len(body["results"]) == 1
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,58 @@
+import json
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BASE_DIR))
+sys.path.append(str(BASE_DIR / "src"))
+
+from test_pipeline_smoke import ensure_index
+from triage.cache import ResultCache
+from triage.parallel import run_batch_parallel
+from triage.pipeline import load_default_pipeline
+from triage.schema import PipelineOutput
+from triage.timing import LatencyHistogram, StageTimer
+
+
+def test_histogram_percentiles_are_within_bucket_error():
+    hist = LatencyHistogram()
+    for i in range(1, 1001):
+        hist.add(i * 1e-4)  # 0.1 ms .. 100 ms
+    assert abs(hist.percentile(50) - 0.05) / 0.05 < 0.05
+    assert abs(hist.percentile(99) - 0.099) / 0.099 < 0.05
+    other = LatencyHistogram()
+    other.add(1.0)
+    hist.merge(other)
+    assert hist.count == 1001 and hist.percentile(100) == 1.0
+
+
+def test_pipeline_timings_and_hooks():
+    ensure_index()
+    seen = []
+    timer = StageTimer(hooks=[lambda stage, seconds: seen.append(stage)])
+    pipeline = load_default_pipeline(BASE_DIR, timer=timer)
+    output = pipeline.run("Translation editor does not open")
+    parsed = PipelineOutput.parse_obj(json.loads(output.json()))
+    assert set(parsed.meta.timings) == {"classify_ms", "search_ms", "plan_ms", "assemble_ms", "total_ms"}
+    assert seen == ["classify", "search", "plan", "assemble", "total"]
+    assert timer.summary()["total"]["count"] == 1
+
+    pipeline.timer = None
+    assert "timings" not in pipeline.run("Translation editor does not open").dict()["meta"]
+
+
+def test_worker_timings_and_cache_counts_reach_the_parent():
+    ensure_index()
+    timer, cache = StageTimer(), ResultCache(64)
+    pipeline = load_default_pipeline(BASE_DIR, timer=timer, cache=cache)
+    pipeline.run("warm-up query")  # counted before the fork; workers must not report it again
+    texts = ["Translation editor does not open", "Sitemap shows 404", "Charged twice"] * 8
+    lines = list(run_batch_parallel(iter(texts), workers=2, pipeline=pipeline, chunk_size=4))
+    assert len(lines) == len(texts)
+    summary = timer.summary()
+    assert summary["total"]["count"] == len(texts) + 1
+    assert summary["serialize"]["count"] == len(texts)
+    stats = cache.stats()
+    assert stats["hits"] + stats["misses"] == len(texts) + 1
+    # Each of the two workers computes each distinct text at most once.
+    assert stats["misses"] <= 1 + 2 * 3